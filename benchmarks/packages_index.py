@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+# SPDX-License-Identifier: BSD-3-Clause
+# Copyright <2026> <Uri Herrera <uri_herrera@nxos.org>>
+
+"""Compare the legacy line-by-line Packages scan with the indexed parser."""
+
+import argparse
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from nx_apphub_cli.downloader import parse_packages_index  # noqa: E402
+
+# <---
+# --->
+def generate_packages_text(count, seed=0):
+    """Generate a synthetic Packages index with the given number of stanzas."""
+    rng = random.Random(seed)
+    stanzas = []
+
+    for i in range(count):
+        name = f"lib-synthetic-{i}"
+        stanzas.append(
+            f"Package: {name}\n"
+            "Architecture: amd64\n"
+            f"Version: {rng.randint(1, 9)}.{rng.randint(0, 99)}-{rng.randint(1, 5)}\n"
+            "Priority: optional\n"
+            "Section: libs\n"
+            "Maintainer: Synthetic Maintainer <synthetic@example.org>\n"
+            f"Installed-Size: {rng.randint(10, 90000)}\n"
+            "Depends: libc6 (>= 2.34), libstdc++6 (>= 13)\n"
+            f"Filename: pool/main/l/{name}/{name}_1.0_amd64.deb\n"
+            f"Size: {rng.randint(1000, 9000000)}\n"
+            f"SHA256: {rng.getrandbits(256):064x}\n"
+            "Description: synthetic package used for benchmarking\n"
+            " A longer description line that the parser has to skip.\n"
+        )
+
+    return "\n".join(stanzas)
+
+
+def legacy_lookup(lines, pkg_name):
+    """The original per-dependency scan over the raw line list."""
+    current_package = None
+    filename = None
+    version = None
+
+    for line in lines:
+        line = line.strip()
+
+        if line.startswith("Package: "):
+            current_package = line.split("Package: ")[1]
+            filename = None
+            version = None
+
+        elif line.startswith("Version: ") and current_package == pkg_name:
+            version = line.split("Version: ")[1]
+
+        elif line.startswith("Filename: ") and current_package == pkg_name:
+            filename = line.split("Filename: ")[1]
+
+        if current_package == pkg_name and filename and version:
+            return filename, version
+
+    return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--packages", type=int, default=60000, help="Stanzas in the synthetic index (default: 60000)")
+    parser.add_argument("--deps", type=int, default=60, help="Dependencies to look up (default: 60)")
+    parser.add_argument("--components", type=int, default=2, help="Components probed per dependency (default: 2)")
+    args = parser.parse_args()
+
+    text = generate_packages_text(args.packages)
+    rng = random.Random(1)
+    deps = [f"lib-synthetic-{rng.randrange(args.packages)}" for _ in range(args.deps)]
+
+    # -- Legacy: keep the raw lines and scan them for every dependency × component.
+
+    start = time.perf_counter()
+    lines = text.splitlines(keepends=True)
+    legacy_results = []
+    for dep in deps:
+        for _ in range(args.components):
+            legacy_results.append(legacy_lookup(lines, dep))
+    legacy_time = time.perf_counter() - start
+
+    # -- Indexed: parse once per component, then serve lookups from the map.
+
+    start = time.perf_counter()
+    indexes = [parse_packages_index(text) for _ in range(args.components)]
+    parse_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    indexed_results = []
+    for dep in deps:
+        for index in indexes:
+            record = index.get(dep)
+            indexed_results.append((record.filename, record.version) if record else None)
+    lookup_time = time.perf_counter() - start
+
+    if legacy_results != indexed_results:
+        print("❌ Results differ between the legacy scan and the indexed parser.")
+        sys.exit(1)
+
+    indexed_time = parse_time + lookup_time
+
+    print(f"📑 Index: {args.packages} packages, {args.deps} deps × {args.components} components")
+    print(f"🐢 Legacy scan:    {legacy_time:8.3f} s")
+    print(f"⚡ Indexed parse:  {parse_time:8.3f} s")
+    print(f"⚡ Indexed lookup: {lookup_time * 1000:8.3f} ms")
+    print(f"🏁 Speedup:        {legacy_time / indexed_time:8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+# SPDX-License-Identifier: BSD-3-Clause
+# Copyright <2026> <Uri Herrera <uri_herrera@nxos.org>>
+
+"""Compare start-up of a bundled binary with the old LD_LIBRARY_PATH layout, the default minimal RPATH and the soname farm."""
+
+import argparse
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from nx_apphub_cli.rpath import arch_map, patch_appdir_rpaths  # noqa: E402
+from nx_apphub_cli.utils import get_architecture  # noqa: E402
+
+# <---
+# --->
+def get_layout_dirs():
+    """The library directories the AppRun LD_LIBRARY_PATH has always listed, in its order."""
+    triplet = arch_map[get_architecture()]
+    return [
+        "usr/lib",
+        f"usr/lib/{triplet}",
+        "usr/lib64",
+        "lib",
+        "lib64",
+        f"lib/{triplet}",
+        f"lib64/{triplet}",
+    ]
+
+
+def host_libraries(binary):
+    """Return the shared objects the host loader resolves for a binary, without libc and the loader."""
+    output = subprocess.run(["ldd", str(binary)], check=True, capture_output=True, text=True).stdout
+    libraries = []
+
+    for line in output.splitlines():
+        if "=>" not in line:
+            continue
+        target = line.split("=>", 1)[1].split("(")[0].strip()
+        name = Path(target).name
+        if target and not name.startswith(("libc.so", "ld-linux", "libdl.so", "libpthread.so", "libm.so")):
+            libraries.append(Path(target))
+
+    return libraries
+
+
+def populate_appdir(app_dir, binary, libraries, layout_dirs):
+    """Copy the binary and spread its libraries over the layout directories, as packages would."""
+    (app_dir / "usr/bin").mkdir(parents=True)
+    shutil.copy2(binary, app_dir / "usr/bin" / binary.name)
+
+    for directory in layout_dirs:
+        (app_dir / directory).mkdir(parents=True, exist_ok=True)
+
+    # -- Most libraries land in the multiarch directory, the rest go to the later directories.
+
+    for index, library in enumerate(sorted(libraries)):
+        directory = layout_dirs[1] if index % 3 else layout_dirs[(index // 3) % len(layout_dirs)]
+        shutil.copy2(library, app_dir / directory / library.name)
+
+    return app_dir / "usr/bin" / binary.name
+
+
+def drop_caches():
+    subprocess.run(["sync"], check=True)
+    with open("/proc/sys/vm/drop_caches", "w", encoding="utf-8") as f:
+        f.write("3\n")
+
+
+def time_runs(command, env, runs, cold=False):
+    """Return the wall time of every run of a command, in seconds."""
+    times = []
+    for _ in range(runs):
+        if cold:
+            drop_caches()
+        start = time.perf_counter()
+        subprocess.run(command, env=env, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        times.append(time.perf_counter() - start)
+    return times
+
+
+def count_probes(command, env):
+    """Return how many files the dynamic loader tried to open for a run of a command."""
+    result = subprocess.run(command, env=dict(env, LD_DEBUG="libs"), check=True, capture_output=True, text=True)
+    return result.stderr.count("trying file=")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--binary", default="/usr/bin/curl", help="Host binary to bundle (default: /usr/bin/curl)")
+    parser.add_argument("--args", default="--version", help="Arguments it is run with (default: --version)")
+    parser.add_argument("--runs", type=int, default=200, help="Runs per layout (default: 200)")
+    parser.add_argument("--cold", action="store_true", help="Drop the page cache before every run (needs root)")
+    args = parser.parse_args()
+
+    if not shutil.which("patchelf"):
+        print("❌ patchelf is required.")
+        sys.exit(1)
+
+    binary = Path(args.binary).resolve()
+    libraries = host_libraries(binary)
+    layout_dirs = get_layout_dirs()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+
+        # -- Current layout: the original binary, found libraries through a seven-directory LD_LIBRARY_PATH.
+
+        legacy_binary = populate_appdir(tmp / "legacy", binary, libraries, layout_dirs)
+        legacy_env = {"PATH": os.environ.get("PATH", ""), "LD_LIBRARY_PATH": ":".join(str(tmp / "legacy" / d) for d in layout_dirs)}
+
+        # -- Default layout: every ELF patched to its minimal $ORIGIN RPATH, no LD_LIBRARY_PATH.
+
+        rpath_binary = populate_appdir(tmp / "rpath", binary, libraries, layout_dirs)
+        patch_appdir_rpaths(tmp / "rpath", {"apprunconf": {}}, rpath_binary)
+        rpath_env = {"PATH": os.environ.get("PATH", "")}
+
+        # -- Soname farm: every ELF patched to the farm, no LD_LIBRARY_PATH.
+
+        farm_binary = populate_appdir(tmp / "farm", binary, libraries, layout_dirs)
+        config = {"apprunconf": {"soname-farm": True}}
+        patch_appdir_rpaths(tmp / "farm", config, farm_binary)
+        farm_env = {"PATH": os.environ.get("PATH", "")}
+
+        results = {}
+        for label, command, env in (
+            ("LD_LIBRARY_PATH", [str(legacy_binary), *args.args.split()], legacy_env),
+            ("minimal RPATH", [str(rpath_binary), *args.args.split()], rpath_env),
+            ("soname farm", [str(farm_binary), *args.args.split()], farm_env),
+        ):
+            time_runs(command, env, 3)
+            results[label] = (count_probes(command, env), time_runs(command, env, args.runs, cold=args.cold))
+
+    print()
+    print(f"📦 {binary.name} with {len(libraries)} bundled libraries, {args.runs} {'cold' if args.cold else 'warm'} runs per layout")
+    for label, (probes, times) in results.items():
+        print(
+            f"⏱  {label:16} {probes:5} loader probes, "
+            f"median {statistics.median(times) * 1000:7.2f} ms, "
+            f"mean {statistics.mean(times) * 1000:7.2f} ms"
+        )
+
+    farm_median = statistics.median(results["soname farm"][1])
+    for label in ("LD_LIBRARY_PATH", "minimal RPATH"):
+        print(f"🏁 Farm vs {label + ':':16} {statistics.median(results[label][1]) / farm_median:6.2f}x")
+
+
+if __name__ == "__main__":
+    main()
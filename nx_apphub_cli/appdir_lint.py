@@ -11,11 +11,12 @@ from io import BytesIO
 from pathlib import Path
 import re
 
-import requests
 import yaml
 from elftools.elf.elffile import ELFFile
 
 from .exceptions import BuildError
+from .manifest import file_owners, load_manifest
+from .transfer import check_status, fetch
 
 # <---
 # --->
@@ -47,8 +48,13 @@ def library_exists_in_appdir(libname, appdir):
     return False
 
 
-def find_missing_libs(appdir):
-    """Scan ELF files in the AppDir and return a mapping of missing libraries to the binaries requiring them."""
+def find_missing_libs(appdir, known_files=None):
+    """
+    Scan ELF files in the AppDir and return a mapping of missing libraries to the binaries requiring them.
+
+    known_files, the paths recorded in an AppDir manifest, are checked before walking the tree.
+    """
+    known_names = {Path(path).name for path in known_files or ()}
     missing = {}
     for root, _, files in os.walk(appdir):
         for file in files:
@@ -64,12 +70,34 @@ def find_missing_libs(appdir):
             for line in result.splitlines():
                 if '=> not found' in line:
                     lib = line.split('=>')[0].strip()
+                    if any(name == lib or name.startswith(lib + ".") for name in known_names):
+                        continue
                     if library_exists_in_appdir(lib, appdir):
                         continue
                     missing.setdefault(lib, []).append(str(full_path))
     return missing
 
 
+def find_duplicate_libs(manifest):
+    """Return {library name: [(path, package)]} for shared libraries shipped at more than one path."""
+    locations = {}
+    for record in manifest.get("files", []):
+        name = Path(record["path"]).name
+        if record["kind"] == "file" and ".so" in name:
+            locations.setdefault(name, []).append((record["path"], record["package"]))
+    return {name: paths for name, paths in locations.items() if len(paths) > 1}
+
+
+def describe_source(path, appdir, owners):
+    """Return a path inside the AppDir, followed by the package that shipped it when known."""
+    try:
+        rel_path = Path(path).resolve().relative_to(Path(appdir).resolve()).as_posix()
+    except ValueError:
+        return str(path)
+    package = owners.get(rel_path)
+    return f"{path} ({package})" if package else str(path)
+
+
 def is_valid_appdir(appdir_path):
     """Return True if the given path appears to be a minimally valid AppDir."""
     if not appdir_path.is_dir():
@@ -160,8 +188,7 @@ def suggest_providing_packages(missing_libs, repos, quiet=True):
                     print(f"📥 Downloading: {url}")
 
                 try:
-                    response = requests.get(url, timeout=20)
-                    response.raise_for_status()
+                    response = check_status(fetch(url))
 
                     if not quiet:
                         print(f"📑 Parsing: {url}\n")
@@ -325,6 +352,7 @@ def run_linter(args=None):
     if args is None:
         parser = argparse.ArgumentParser(description="Check missing shared libraries in an AppDir.")
         parser.add_argument("appdir", type=str, help="Path to the AppDir directory")
+        parser.add_argument("--manifest", type=str, help="AppDir manifest written by 'build --manifest'")
         args = parser.parse_args()
 
     appdir_path = detect_appdir(args.appdir)
@@ -339,9 +367,28 @@ def run_linter(args=None):
     if not is_valid_appdir(appdir_path):
         raise BuildError(f"Invalid or incomplete AppDir: {appdir_path}")
 
+    # -- A build manifest maps every file back to its package without rescanning the tree.
+
+    manifest = None
+    manifest_path = getattr(args, "manifest", None)
+    if manifest_path:
+        manifest = load_manifest(manifest_path)
+        if manifest is None:
+            print(f"⚠️ Ignoring unreadable manifest: {manifest_path}")
+    owners = file_owners(manifest) if manifest else {}
+
     print()
     print(f"🔍 Scanning AppDir: {appdir_path}\n")
-    missing = find_missing_libs(appdir_path)
+    missing = find_missing_libs(appdir_path, known_files=owners)
+
+    duplicates = find_duplicate_libs(manifest) if manifest else {}
+    if duplicates:
+        print("📚 Libraries shipped at more than one path:\n")
+        for lib, locations in sorted(duplicates.items()):
+            print(f"{lib}:")
+            for path, package in locations:
+                print(f"  ↪ {path} ({package})")
+            print()
 
     details = run_elf_checks(appdir_path)
     any_missing = [d for d in details if d["missing"]]
@@ -357,7 +404,7 @@ def run_linter(args=None):
     for lib, sources in sorted(missing.items()):
         print(f"{lib} — required by:")
         for src in sorted(set(sources)):
-            print(f"  ↪ {src}")
+            print(f"  ↪ {describe_source(src, appdir_path, owners)}")
         print()
 
     # -- Load YAML config to retrieve repositories.
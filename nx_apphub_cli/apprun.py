@@ -11,8 +11,14 @@ from .sandbox import get_sandbox_exec_block
 
 # <---
 # --->
-def generate_apprun(app_dir, config):
-    """Generate the AppRun script dynamically inside the AppDir."""
+def generate_apprun(app_dir, config, runtime_cache_exports=None, unpatched_elfs=None):
+    """
+    Generate the AppRun script dynamically inside the AppDir.
+
+    runtime_cache_exports are the lines pointing at caches generated at build time (see runtimecaches).
+    unpatched_elfs are the ELFs whose RPATH could not be patched; any makes AppRun export the
+    bundled LD_LIBRARY_PATH.
+    """
     apprun_path = app_dir / "AppRun"
 
     # -- Fetch and validate settings from YAML.
@@ -32,7 +38,15 @@ def generate_apprun(app_dir, config):
         else:
             extra_ld = str(yaml_ld_value).strip()
         if extra_ld:
-            ld_append_line = f'\nexport LD_LIBRARY_PATH="$LD_LIBRARY_PATH:{extra_ld}"'
+            ld_append_line = f'\nexport LD_LIBRARY_PATH="${{LD_LIBRARY_PATH:+$LD_LIBRARY_PATH:}}{extra_ld}"'
+
+    # -- Every bundled ELF carries an $ORIGIN-relative RPATH (see rpath), so the library directories
+    # -- only go into LD_LIBRARY_PATH when asked or when an ELF could not be patched; otherwise they
+    # -- would leak into host programs the app starts.
+
+    bundle_ld_library_path = bool(unpatched_elfs) or get_apprunconf_value(
+        config, "bundle-ld-library-path", default=False, expected_type=bool
+    )
 
     # -- Generate environment variable exports dynamically.
 
@@ -75,6 +89,19 @@ def generate_apprun(app_dir, config):
         raise BuildError(f"Unsupported architecture '{arch}' for AppRun generation.")
 
 
+    ld_export_line = ld_append_line.lstrip("\n")
+    if bundle_ld_library_path and get_apprunconf_value(config, "soname-farm", default=False, expected_type=bool):
+        ld_export_line = f'export LD_LIBRARY_PATH="$APPDIR/usr/lib/.sonames"{ld_append_line}'
+    elif bundle_ld_library_path:
+        ld_export_line = (
+            f'export LD_LIBRARY_PATH="$APPDIR{setlibpath}:$APPDIR{setlibpath}/{multiarch_triplet}:$APPDIR{setlibpath}64:'
+            f'$APPDIR/lib:$APPDIR/lib64:$APPDIR/lib/{multiarch_triplet}:$APPDIR/lib64/{multiarch_triplet}"{ld_append_line}'
+        )
+
+    runtime_cache_block = ""
+    if runtime_cache_exports:
+        runtime_cache_block = "\n# -- Runtime caches generated at build time.\n\n" + "\n".join(runtime_cache_exports) + "\n\n"
+
     # -- Construct the script.
 
     current_year = datetime.now().year
@@ -141,10 +168,10 @@ if [ -z "${{XDG_DATA_DIRS+x}}" ]; then export XDG_DATA_DIRS=""; fi
 # -- Set environment variables for proper execution.
 
 export PATH="$APPDIR{setpath}:$APPDIR/usr/sbin:$PATH"
-export LD_LIBRARY_PATH="$APPDIR{setlibpath}:$APPDIR{setlibpath}/{multiarch_triplet}:$APPDIR{setlibpath}64:$APPDIR/lib:$APPDIR/lib64:$APPDIR/lib/{multiarch_triplet}:$APPDIR/lib64/{multiarch_triplet}"{ld_append_line}
+{ld_export_line}
 export XDG_DATA_DIRS="$APPDIR/usr/share:$XDG_DATA_DIRS"
 
-
+{runtime_cache_block}
 # -- Additional environment variables from YAML.
 
 {env_exports}
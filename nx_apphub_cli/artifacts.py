@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+# SPDX-License-Identifier: BSD-3-Clause
+# Copyright <2026> <Uri Herrera <uri_herrera@nxos.org>>
+
+import hashlib
+import json
+import os
+from pathlib import Path
+from threading import Lock
+
+from .manifest import hash_file
+from .treecache import TreeLinker
+from .utils import evict_least_recently_used, parse_size
+
+# <---
+# --->
+# -- Packaged bundles, keyed by a hash of the final AppDir tree and the packaging command.
+# -- Packaging compresses the whole AppDir (zstd level 22 for uruntime), so an AppDir whose files,
+# -- modes and symlinks did not change, packaged with the same tool and flags, reuses the bundle.
+
+cache_dir = Path.home() / ".cache/nx-apphub-cli"
+artifacts_dir = cache_dir / "artifacts"
+
+artifact_format = 1
+default_artifact_limit = "5G"
+
+artifact_lock = Lock()
+
+
+def get_artifact_limit():
+    """Return the artifact cache size cap in bytes (NX_APPHUB_ARTIFACTS_MAX_SIZE, default 5G)."""
+    return parse_size(os.environ.get("NX_APPHUB_ARTIFACTS_MAX_SIZE", default_artifact_limit))
+
+
+def get_artifact_path(key):
+    """Return the cache location of the bundle packaged for an artifact key."""
+    return artifacts_dir / key[:2] / key
+
+
+def hash_tree(tree):
+    """
+    Return the tree hash of an AppDir from its scan_tree records.
+
+    Every directory, file and symlink contributes its relative path, type and permission bits;
+    files add the SHA256 of their content and symlinks their target.
+    """
+    records = [
+        [record["path"], record["kind"], record["mode"], record.get("sha256", record.get("target"))]
+        for record in tree
+    ]
+    data = json.dumps(records, separators=(",", ":"))
+    return hashlib.sha256(data.encode("utf-8")).hexdigest()
+
+
+def compute_artifact_key(tree_hash, runtime, flags, tool_path, extra=None):
+    """Return the artifact key of an AppDir tree packaged by a tool with the given flags."""
+    data = json.dumps({
+        "format": artifact_format,
+        "tree": tree_hash,
+        "runtime": runtime,
+        "flags": list(flags),
+        "tool": hash_file(tool_path),
+        "extra": extra,
+    }, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(data.encode("utf-8")).hexdigest()
+
+
+def lookup_artifact(key):
+    """Return the cached bundle for an artifact key and mark it as recently used, or None."""
+    path = get_artifact_path(key)
+    try:
+        os.utime(path)
+    except FileNotFoundError:
+        return None
+    return path
+
+
+def restore_artifact(key, output_file):
+    """Place the cached bundle for an artifact key at output_file. Returns False on a cache miss."""
+    path = lookup_artifact(key)
+    if path is None:
+        return False
+
+    output_file = Path(output_file)
+    tmp_path = output_file.with_name(f".{output_file.name}.{os.getpid()}.tmp")
+
+    # -- Bundles are reflinked or copied, never hardlinked, so chmod or edits on the output stay local.
+
+    TreeLinker(hardlinks=False).place(path, tmp_path)
+    tmp_path.chmod(0o755)
+    os.replace(tmp_path, output_file)
+    return True
+
+
+def store_artifact(key, output_file):
+    """Add a freshly packaged bundle to the artifact cache and enforce its size cap."""
+    path = get_artifact_path(key)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(f".{key}.{os.getpid()}.tmp")
+
+    TreeLinker(hardlinks=False).place(output_file, tmp_path)
+    os.replace(tmp_path, path)
+
+    enforce_artifact_limit()
+
+
+def enforce_artifact_limit(limit=None):
+    """Evict least recently used bundles until the artifact cache fits its size cap. Returns bytes freed."""
+    limit = get_artifact_limit() if limit is None else limit
+
+    with artifact_lock:
+        return evict_least_recently_used(
+            (path for path in artifacts_dir.glob("*/*") if not path.name.startswith(".")), limit
+        )
@@ -11,9 +11,16 @@ from pathlib import Path
 from datetime import datetime
 
 from .exceptions import BuildError
-from .config import get_apprunconf_value
-from .utils import cleanup_cache, get_appimagetool, get_go_appimagetool, get_uruntime, get_architecture
+from .utils import cleanup_cache, get_appimagetool, get_go_appimagetool, get_uruntime
 from .apprun import generate_apprun
+from .iconindex import icon_exts, lookup_icon
+from .rpath import patch_appdir_rpaths
+from .runtimecaches import generate_runtime_caches
+from .governor import get_limit_flags, packaging_slot
+from .profiles import get_packaging_flags, get_packaging_settings, get_profile_name
+from .artifacts import compute_artifact_key, hash_tree, restore_artifact, store_artifact
+from .treecache import unshare_file
+from .manifest import build_bundle_manifest, get_appdir_manifest_path, load_manifest, scan_tree, write_manifest
 from .console import print_success, print_error, print_info, print_blank
 
 # <---
@@ -38,6 +45,7 @@ def setup_appimage_directories(app_name, binary_path):
 
 
 # -- Get an icon from the default icon themes. Search in /usr/share/icons and use /usr/share/pixmaps as a fallback.
+# -- Each theme is walked once into an index (see iconindex), so every lookup is a dictionary hit.
 
 icon_themes = ["breeze-dark", "breeze", "Adwaita", "Luv", "hicolor"]
 
@@ -45,24 +53,17 @@ icon_themes = ["breeze-dark", "breeze", "Adwaita", "Luv", "hicolor"]
 def find_system_icon(icon_name, app_dir, preferred_theme=None):
     """Search for the system icon in the specified or standard themes, preferring exact matches."""
     search_themes = [preferred_theme] + icon_themes if preferred_theme else icon_themes
-    icon_exts = [".png", ".svg", ".xpm"]
 
     for ext in icon_exts:
         for theme in search_themes:
-            theme_path = app_dir / f"usr/share/icons/{theme}"
-            if theme_path.exists():
-                exact_match = theme_path / f"{icon_name}{ext}"
-                if exact_match.exists():
-                    return exact_match
-                for icon_file in theme_path.rglob(f"{icon_name}{ext}"):
-                    return icon_file
+            icon_file = lookup_icon(app_dir / f"usr/share/icons/{theme}", icon_name, ext)
+            if icon_file:
+                return icon_file
 
     pixmaps_path = app_dir / "usr/share/pixmaps"
     for ext in icon_exts:
-        exact_match = pixmaps_path / f"{icon_name}{ext}"
-        if exact_match.exists():
-            return exact_match
-        for icon_file in pixmaps_path.glob(f"{icon_name}{ext}"):
+        icon_file = lookup_icon(pixmaps_path, icon_name, ext, recursive=False)
+        if icon_file:
             return icon_file
 
     return None
@@ -87,6 +88,7 @@ def copy_system_icon(app_name, app_dir, config, icon_path, quiet=True):
         icon_path = Path(icon_path)
         if icon_path.exists():
             icon_dest = app_dir / f"{icon_name}{icon_path.suffix}"
+            unshare_file(icon_dest)
             shutil.copy(icon_path, icon_dest)
             if not quiet:
                 print_success(f"Using provided icon: {icon_dest.name}", prefix="✔️")
@@ -104,6 +106,7 @@ def copy_system_icon(app_name, app_dir, config, icon_path, quiet=True):
 
     if system_icon:
         icon_dest = app_dir / f"{icon_name}{system_icon.suffix}"
+        unshare_file(icon_dest)
         shutil.copy(system_icon, icon_dest)
         if not quiet:
             print_success(f"Using icon from AppDir: {icon_dest.name}", prefix="✔️")
@@ -172,7 +175,10 @@ def fix_desktop_entry(app_name, app_dir, binary_path, hide_from_menu=False, pref
 
         # -- Copy to top-level AppDir.
 
+        # -- Packaged files may be hardlinked from the tree cache; never write through them.
+
         target_path = app_dir / desktop_file_path.name
+        unshare_file(target_path)
         if desktop_file_path != target_path:
             shutil.copy(desktop_file_path, target_path)
         desktop_file_path = target_path
@@ -237,6 +243,7 @@ def prepare_window_manager_launcher(app_dir, preferred_launcher=""):
             launcher_path = session_dir / preferred_launcher
             if launcher_path.is_file():
                 target_path = app_dir / launcher_path.name
+                unshare_file(target_path)
                 shutil.copy(launcher_path, target_path)
 
                 with target_path.open("r", encoding="utf-8") as f:
@@ -281,6 +288,7 @@ def prepare_window_manager_launcher(app_dir, preferred_launcher=""):
                 launcher_path = matches[0]
                 target_path = app_dir / launcher_path.name
 
+                unshare_file(target_path)
                 shutil.copy(launcher_path, target_path)
 
                 with target_path.open("r", encoding="utf-8") as f:
@@ -316,88 +324,17 @@ def prepare_window_manager_launcher(app_dir, preferred_launcher=""):
     return None
 
 
-def patch_binary_rpath(binary_path, config):
-    """Patch the RPATH of the application binary to use $ORIGIN with the correct paths."""
-
-    # -- Fetch settings from YAML.
-
-    setlibpath = get_apprunconf_value(config, "setlibpath", default="/usr/lib", expected_type=str)
-
-    # -- Determine multiarch triplet dynamically.
-
-    arch_map = {
-        "x86_64": "x86_64-linux-gnu",
-        "aarch64": "aarch64-linux-gnu",
-        "arm64": "aarch64-linux-gnu",
-    }
-
-    arch = get_architecture()
-    multiarch_triplet = arch_map.get(arch)
-
-    if not multiarch_triplet:
-        raise BuildError(f"Unsupported architecture detected: {arch}. Aborting.")
-
-    # -- Patch the RPATH of the executable; the paths are relative to the path of the binary.
-
-    try:
-        rpath_parts = [
-
-            # -- Prefer AppDir/usr first.
-
-            f"$ORIGIN/../..{setlibpath}",
-            f"$ORIGIN/../..{setlibpath}/{multiarch_triplet}",
-            f"$ORIGIN/../..{setlibpath}64",
-
-            # -- Qt-specific plugin locations under /usr.
-
-            f"$ORIGIN/../../..{setlibpath}/{multiarch_triplet}/qt5/qml",
-            f"$ORIGIN/../../..{setlibpath}/{multiarch_triplet}/qt6/qml",
-            f"$ORIGIN/../../..{setlibpath}/{multiarch_triplet}/qt5/plugins",
-            f"$ORIGIN/../../..{setlibpath}/{multiarch_triplet}/qt6/plugins",
-            f"$ORIGIN/../../..{setlibpath}/qt5/libexec",
-            f"$ORIGIN/../../..{setlibpath}/qt5/bin",
-            f"$ORIGIN/../../..{setlibpath}/qt6/libexec",
-            f"$ORIGIN/../../..{setlibpath}/qt6/bin",
-
-            # -- /lib multiarch.
-
-            f"$ORIGIN/../../lib/{multiarch_triplet}",
-            f"$ORIGIN/../../lib64/{multiarch_triplet}",
-
-            # -- /lib non-multiarch (add these).
-
-            f"$ORIGIN/../../lib",
-            f"$ORIGIN/../../lib64",
-        ]
-        extras = config.get("apprunconf", {}).get("extra-rpaths", [])
-        if isinstance(extras, str):
-            extras = [extras]
-        elif isinstance(extras, tuple):
-            extras = list(extras)
-        extras = [p for p in extras if isinstance(p, str) and p.strip()]
-        ordered = []
-        seen = set()
-        for p in rpath_parts + extras:
-            if p not in seen:
-                ordered.append(p)
-                seen.add(p)
-
-        rpath_value = ":".join(ordered)
-
-        subprocess.run(
-            ["patchelf", "--set-rpath", rpath_value, "--force-rpath", str(binary_path)],
-            check=True
-        )
-        print_success(f"Patched RPATH for: {binary_path}", prefix="🩹")
-    except subprocess.CalledProcessError as e:
-        raise BuildError(f"Failed to patch RPATH for {binary_path}: {e}") from e
-
+def package_appdir(app_name, app_dir, output_file, appimagetool_binary, runtime, config, quiet=True, tree=None):
+    """
+    Package the AppDir.
 
-def package_appdir(app_name, app_dir, output_file, appimagetool_binary, runtime, config, quiet=True):
-    """Package the AppDir."""
+    The bundle is looked up in the artifact cache by the tree hash of the AppDir and the
+    packaging command first, so an unchanged payload is not compressed again. tree is the
+    AppDir's scan_tree records when the caller already has them; otherwise it is scanned here.
+    """
     if not quiet:
         print_blank()
-        print_info(f"Packaging AppDir: {output_file} ...", prefix="🛠")
+        print_info(f"Packaging AppDir ({get_profile_name(config)} profile): {output_file} ...", prefix="🛠")
 
     try:
         env = os.environ.copy()
@@ -415,19 +352,39 @@ def package_appdir(app_name, app_dir, output_file, appimagetool_binary, runtime,
                 "--set-group", "0",
                 "--no-history",
                 "--no-create-timestamp",
-                "--compression", "zstd:level=22",
-                "-S22",
-                "-B6",
+                *get_packaging_flags(config, runtime),
                 "--header", str(appimagetool_binary),
                 "-i", str(app_dir),
                 "-o", str(output_file)
             ]
         else:
-            cmd = [str(appimagetool_binary), str(app_dir), str(output_file)]
+            cmd = [str(appimagetool_binary), *get_packaging_flags(config, runtime), str(app_dir), str(output_file)]
+
+        # -- The version only reaches the bundle through go-appimagetool's VERSION; elsewhere it is just the filename.
+
+        artifact_key = compute_artifact_key(
+            hash_tree(tree if tree is not None else scan_tree(app_dir)),
+            runtime,
+            [arg for arg in cmd[1:] if arg not in (str(app_dir), str(output_file), str(appimagetool_binary))],
+            appimagetool_binary,
+            extra=env.get("VERSION") if runtime == "go" else None
+        )
+
+        if restore_artifact(artifact_key, output_file):
+            if not quiet:
+                print_info(f"Reused the bundle packaged from an identical AppDir: {output_file.name}", prefix="♻️")
+                print_blank()
+            cleanup_cache(app_name)
+            return
+
+        # -- Wait for a packaging slot on this host and keep the tool within its share of cores and memory.
+
+        with packaging_slot() as limits, open(os.devnull, 'w') as devnull:
+            position = 2 if runtime == "uruntime" else 1
+            limit_flags = get_limit_flags(runtime, limits, get_packaging_settings(config, runtime))
 
-        with open(os.devnull, 'w') as devnull:
             subprocess.run(
-                cmd,
+                cmd[:position] + limit_flags + cmd[position:],
                 check=True,
                 stdout=sys.stdout if not quiet else devnull,
                 stderr=sys.stderr if not quiet else devnull,
@@ -453,6 +410,8 @@ def package_appdir(app_name, app_dir, output_file, appimagetool_binary, runtime,
             cleanup_cache(app_name)
             raise BuildError(f"Expected file not found: {output_file}")
 
+        store_artifact(artifact_key, output_file)
+
         if not quiet:
             print_success(f"Built successfully: {output_file}")
 
@@ -463,8 +422,25 @@ def package_appdir(app_name, app_dir, output_file, appimagetool_binary, runtime,
         raise BuildError(f"Build failed! {e}") from e
 
 
-def prepare_appimage(config, install_mode=False, quiet=True, yaml_dir=None):
-    """Prepare and build with the version in the filename."""
+def get_output_file(config, install_mode=False):
+    """Return the path of the bundle built from a config, with the version in the filename."""
+    app_name = config["buildinfo"]["name"]
+    version = config["buildinfo"].get("version", "unknown")
+
+    output_dir = Path.home() / ".local/bin/nx-apphub" if install_mode else Path.cwd()
+    file_ext = "AppBox" if install_mode else "AppImage"
+    return output_dir / f"{app_name}-{version}-{platform.machine().lower()}.{file_ext}"
+
+
+def prepare_appimage(config, install_mode=False, quiet=True, yaml_dir=None, skip_prebuild=False, on_prebuild_done=None,
+                     manifest_path=None):
+    """
+    Prepare and build with the version in the filename. Returns the bundle path.
+
+    skip_prebuild leaves out the scripts/ copy and prebuild commands for an AppDir restored
+    after them; on_prebuild_done, if given, is called with the AppDir once they have run.
+    manifest_path, if given, gets the manifest of the AppDir as it is packaged.
+    """
 
     app_name = config["buildinfo"]["name"]
     version = config["buildinfo"].get("version", "unknown")
@@ -480,7 +456,7 @@ def prepare_appimage(config, install_mode=False, quiet=True, yaml_dir=None):
 
     # -- Automatically copy scripts from scripts/ directory if it exists.
 
-    if yaml_dir:
+    if yaml_dir and not skip_prebuild:
         scripts_dir = yaml_dir / "scripts"
         if scripts_dir.exists() and scripts_dir.is_dir():
             dest_bin_dir = app_dir / "usr" / "bin"
@@ -493,6 +469,7 @@ def prepare_appimage(config, install_mode=False, quiet=True, yaml_dir=None):
 
                 for script_file in script_files:
                     dest_file = dest_bin_dir / script_file.name
+                    unshare_file(dest_file)
                     shutil.copy(script_file, dest_file)
                     dest_file.chmod(0o755)
                     if not quiet:
@@ -508,7 +485,7 @@ def prepare_appimage(config, install_mode=False, quiet=True, yaml_dir=None):
     # -- Run prebuild commands inside the AppDir.
 
     prebuild_commands = config.get("apprunconf", {}).get("prebuild-commands", [])
-    if prebuild_commands:
+    if prebuild_commands and not skip_prebuild:
         print_info(f"Running prebuild commands for {app_name} inside {app_dir}...", prefix="🔧")
         print_blank()
         env = os.environ.copy()
@@ -536,6 +513,8 @@ def prepare_appimage(config, install_mode=False, quiet=True, yaml_dir=None):
                     f"Output: {err_output}"
                 ) from e
 
+    if on_prebuild_done and not skip_prebuild:
+        on_prebuild_done(app_dir)
 
     # -- Select runtime tool based on runtime.
 
@@ -561,11 +540,21 @@ def prepare_appimage(config, install_mode=False, quiet=True, yaml_dir=None):
         if not quiet:
             print_info(f"Moved binary: {extracted_binary_path} → {new_binary_path}", prefix="📂")
 
+    # -- Patch the RPATH of every ELF before generating AppRun, so none depends on LD_LIBRARY_PATH;
+    # -- AppRun falls back to it if any could not be patched.
+
+    unpatched_elfs = patch_appdir_rpaths(app_dir, config, new_binary_path)
+
     # -- Generate metadata & AppRun.
 
     print_info(f"Generating AppRun and metadata for: {app_name}...", prefix="🧳")
     print_blank()
-    generate_apprun(app_dir, config)
+    generate_apprun(
+        app_dir,
+        config,
+        runtime_cache_exports=generate_runtime_caches(app_dir, config),
+        unpatched_elfs=unpatched_elfs
+    )
 
     integration = config.get("integration", {})
     integration_type = integration.get("type", "gui")
@@ -604,23 +593,25 @@ def prepare_appimage(config, install_mode=False, quiet=True, yaml_dir=None):
         cleanup_cache(app_name)
         raise BuildError(str(e)) from e
 
-    # -- Determine the final file location.
+    # -- Determine the final file location, with a versioned filename for tracking updates.
 
-    output_dir = Path.home() / ".local/bin/nx-apphub" if install_mode else Path.cwd()
-    output_dir.mkdir(parents=True, exist_ok=True)
-
-    # -- Use versioned filename for tracking updates.
+    output_file = get_output_file(config, install_mode=install_mode)
+    output_file.parent.mkdir(parents=True, exist_ok=True)
 
-    file_ext = "AppBox" if install_mode else "AppImage"
-    output_file = output_dir / f"{app_name}-{version}-{platform.machine().lower()}.{file_ext}"
+    # -- Scan the AppDir as packaged, after RPATH patching and every generated file. The same scan
+    # -- keys the artifact cache and describes the bundle in the manifest.
 
-    # -- Patch binary RPATH before building.
+    tree = scan_tree(app_dir)
 
-    patch_binary_rpath(str(new_binary_path), config)
+    if manifest_path:
+        appdir_manifest = load_manifest(get_appdir_manifest_path(app_name))
+        write_manifest(manifest_path, build_bundle_manifest(app_name, tree, appdir_manifest))
+        print_info(f"Manifest written: {manifest_path}", prefix="🧾")
+        print_blank()
 
     # -- Build.
 
-    package_appdir(app_name, app_dir, output_file, appimagetool_binary, runtime, config, quiet)
+    package_appdir(app_name, app_dir, output_file, appimagetool_binary, runtime, config, quiet, tree=tree)
 
     # -- Create build marker file for AppBoxes to prove official build.
 
@@ -647,3 +638,5 @@ def prepare_appimage(config, install_mode=False, quiet=True, yaml_dir=None):
     if not quiet:
         print_info(f"Bundle ready: {output_file}", prefix="📦")
         print_blank()
+
+    return output_file
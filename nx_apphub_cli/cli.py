@@ -15,11 +15,19 @@ import yaml
 
 from .exceptions import NxAppHubError, ConfigError, BuildError
 from .appdir_lint import run_linter
-from .builder import prepare_appimage, setup_appimage_directories
+from .builder import get_output_file, prepare_appimage, setup_appimage_directories
 from .config import load_yaml_config, validate_yaml_config
 from .generator import generate_yaml, generate_description_md
+from .incremental import (
+    compute_base_key, compute_bundle_key, copy_recorded_manifest, has_base, invalidate_build,
+    is_artifact_current, load_build_state, record_artifact, record_base, restore_base
+)
 from .manager import install, remove, search, show, update, downgrade
-from .utils import get_architecture, concurrent_downloads
+from .mirrors import show_mirrors
+from .pathfilter import build_path_filter
+from .scheduler import configure_scheduler
+from .lockfile import get_lockfile_path, refresh_lockfile
+from .utils import get_architecture, concurrent_downloads, get_repos_from_config, resolve_download_plan
 from .console import (
     print_header, print_success, print_error, print_warning,
     print_info, print_blank
@@ -41,30 +49,46 @@ def main():
             metavar=""
         )
 
+        jobs_help = "Maximum concurrent downloads (default: 8; at most 4 per mirror)"
+
         # -- Management commands.
 
         subparser_install = subparsers.add_parser("install", help="Install one or more applications")
         subparser_install.add_argument("app_names", nargs="+", type=str, help="Name(s) of application(s) to install")
+        subparser_install.add_argument("--jobs", metavar="N", type=int, help=jobs_help)
 
         subparser_remove = subparsers.add_parser("remove", help="Remove one or more installed applications")
         subparser_remove.add_argument("app_names", nargs="+", type=str, help="Name(s) of application(s) to remove")
 
         subparser_update = subparsers.add_parser("update", help="Update one or more installed applications")
         subparser_update.add_argument("app_names", nargs="+", type=str, help="Name(s) of application(s) to update")
+        subparser_update.add_argument("--jobs", metavar="N", type=int, help=jobs_help)
 
         subparser_downgrade = subparsers.add_parser("downgrade", help="Downgrade one or more installed applications")
         subparser_downgrade.add_argument("app_names", nargs="+", type=str, help="Name(s) of application(s) to downgrade")
+        subparser_downgrade.add_argument("--jobs", metavar="N", type=int, help=jobs_help)
 
         subparser_search = subparsers.add_parser("search", help="Search for specific applications")
         subparser_search.add_argument("app_names", nargs="+", type=str, help="Name(s) of application(s) to search for")
 
         subparsers.add_parser("show", help="Show installed applications")
 
+        subparsers.add_parser("mirrors", help="Show the current mirror health and speed scores")
+
         # -- Building command (requires YAML file).
 
         subparser_build = subparsers.add_parser("build", help="Build an custom bundle from a local YAML file")
         subparser_build.add_argument("config", metavar="CONFIG", type=str, help="Path to YAML configuration file")
         subparser_build.add_argument("--appdir-lint", metavar="APPDIR", type=str, help="Run appdir-lint after build on the specified extracted AppDir")
+        subparser_build.add_argument("--jobs", metavar="N", type=int, help=jobs_help)
+        subparser_build.add_argument("--on-conflict", choices=["warn", "error"], default="warn", help="When packages ship different files at the same path: warn (default) or error")
+        subparser_build.add_argument("--manifest", action="store_true", help="Save a manifest of every file in the AppDir and the package it came from next to the bundle")
+        subparser_build.add_argument("--profile", choices=["dev", "release", "custom"], help="Packaging profile: dev (fast), release (smallest, default) or custom (buildinfo.packaging); overrides buildinfo.profile")
+        subparser_build.add_argument("--rebuild", action="store_true", help="Ignore the previous build and run every stage again")
+
+        subparser_lock = subparsers.add_parser("lock", help="Resolve dependencies and regenerate the lockfile of a local YAML file")
+        subparser_lock.add_argument("config", metavar="CONFIG", type=str, help="Path to YAML configuration file")
+        subparser_lock.add_argument("--jobs", metavar="N", type=int, help=jobs_help)
 
         subparser_generate = subparsers.add_parser("generate", help="Generate YAML template from package metadata")
         subparser_generate.add_argument("--package", required=True, help="Package name")
@@ -82,6 +106,10 @@ def main():
             parser.print_help()
             sys.exit(1)
 
+        # -- All HTTP work of a command shares one scheduler; --jobs sets its limits.
+
+        configure_scheduler(getattr(args, "jobs", None))
+
         if args.command == "install":
             install(args.app_names)
         elif args.command == "remove":
@@ -94,6 +122,8 @@ def main():
             search(args.app_names)
         elif args.command == "show":
             show()
+        elif args.command == "mirrors":
+            show_mirrors()
         elif args.command == "build":
             print_header("🛠  Building local bundle...")
 
@@ -101,12 +131,12 @@ def main():
             yaml_dir = yaml_file.parent
 
             config = load_yaml_config(args.config)
+            if args.profile and isinstance(config.get("buildinfo"), dict):
+                config["buildinfo"]["profile"] = args.profile
             validate_yaml_config(config)
 
             package_name = config["buildinfo"]["name"]
 
-            setup_appimage_directories(package_name, config["buildinfo"]["binarypath"])
-
             distrorepo = config.get("buildinfo", {}).get("distrorepo", {})
 
             if isinstance(distrorepo, list):
@@ -122,27 +152,74 @@ def main():
                         if key not in repo:
                             raise ConfigError(f"Missing required key '{key}' in repo: {repo}")
 
-            distrorepo = config["buildinfo"].get("distrorepo", {})
+            base_repos, ppa_repos = get_repos_from_config(config)
+            dependencies = config["buildinfo"].get("deps", [])
 
-            if isinstance(distrorepo, list):
-                base_repos = distrorepo
-                ppa_repos = {}
-            elif isinstance(distrorepo, dict):
-                base_repos = distrorepo.get("base", [])
-                ppa_repos = {ppa["id"]: ppa for ppa in distrorepo.get("ppas", [])}
+            manifest_path = None
+            if args.manifest:
+                app_version = config["buildinfo"].get("version", "latest")
+                manifest_path = Path.cwd() / f"{package_name}-{app_version}-{get_architecture()}.manifest.json"
+
+            lock_path = get_lockfile_path(yaml_dir)
+            plan = resolve_download_plan(
+                dependencies, base_repos, ppa_repos, package_name, lock_path=lock_path, write_lock=True
+            )
+
+            # -- Skip the stages whose inputs did not change since the last build of this app.
+
+            state = {} if args.rebuild else load_build_state(package_name)
+            base_key = compute_base_key(config, plan, yaml_dir, conflict_policy=args.on_conflict)
+            output_file = get_output_file(config)
+
+            if is_artifact_current(state, compute_bundle_key(base_key, config), output_file):
+                print_blank()
+                print_success(f"Bundle is up to date: {output_file}", prefix="✔️")
+                if manifest_path and copy_recorded_manifest(package_name, manifest_path):
+                    print_info(f"Manifest written: {manifest_path}", prefix="🧾")
+                elif manifest_path:
+                    print_warning("No manifest was recorded with this bundle; run 'build --manifest --rebuild' to write one.")
+                print_blank()
             else:
-                base_repos = []
-                ppa_repos = {}
+                if has_base(state, base_key, package_name):
+                    _, app_dir = setup_appimage_directories(package_name, config["buildinfo"]["binarypath"])
+
+                    print_blank()
+                    print_info("Dependencies, scripts and prebuild commands unchanged; reusing the previous AppDir.", prefix="♻️")
+                    restore_base(package_name, app_dir)
+
+                    print_blank()
+                    output_file = prepare_appimage(config, yaml_dir=yaml_dir, skip_prebuild=True, manifest_path=manifest_path)
+                else:
+                    invalidate_build(package_name)
+                    setup_appimage_directories(package_name, config["buildinfo"]["binarypath"])
+
+                    concurrent_downloads(
+                        dependencies,
+                        base_repos,
+                        ppa_repos,
+                        package_name,
+                        lock_path=lock_path,
+                        write_lock=True,
+                        conflict_policy=args.on_conflict,
+                        link_trees=not config.get("apprunconf", {}).get("prebuild-commands"),
+                        path_filter=build_path_filter(config["buildinfo"]),
+                        plan=plan
+                    )
 
-            dependencies = config["buildinfo"].get("deps", [])
+                    print_blank()
+                    output_file = prepare_appimage(
+                        config,
+                        yaml_dir=yaml_dir,
+                        on_prebuild_done=lambda app_dir: record_base(package_name, app_dir, base_key),
+                        manifest_path=manifest_path
+                    )
 
-            concurrent_downloads(dependencies, base_repos, ppa_repos, package_name)
+                # -- The bundle key is computed after the build so it covers a freshly downloaded packaging tool.
 
-            print_blank()
-            prepare_appimage(config, yaml_dir=yaml_dir)
+                record_artifact(package_name, compute_bundle_key(base_key, config), output_file, manifest_path=manifest_path)
 
-            print_success("Bundle creation complete!")
-            print_blank()
+                print_success("Bundle creation complete!")
+                print_blank()
 
             if args.appdir_lint:
                 app_name = config["buildinfo"]["name"]
@@ -187,7 +264,8 @@ def main():
 
                 lint_args = types.SimpleNamespace(
                     appdir=str(lint_target),
-                    yaml=args.config
+                    yaml=args.config,
+                    manifest=str(manifest_path) if manifest_path else None
                 )
 
                 try:
@@ -195,6 +273,14 @@ def main():
                 except Exception as e:
                     print_error(f"appdir-lint failed: {e}")
 
+        elif args.command == "lock":
+            print_header("🔒 Refreshing lockfile...")
+
+            config = load_yaml_config(args.config)
+            validate_yaml_config(config)
+
+            refresh_lockfile(config, Path(args.config).parent)
+
         elif args.command == "generate":
             integration_key = args.integration_type
 
@@ -12,6 +12,8 @@ import yaml
 from .exceptions import ConfigError
 from .sandbox import get_known_apparmor_profiles, bwrap_boolean_flags, bwrap_list_flags, bwrap_key_value_flags
 from .console import print_warning, print_blank, print_success
+from .pathfilter import is_valid_pattern
+from .profiles import validate_build_profile
 
 # <---
 # --->
@@ -139,6 +141,27 @@ def validate_yaml_config(config):
     if os_target is not None:
         if not isinstance(os_target, str) or not os_target.strip():
             raise ConfigError("'buildinfo.os-target' must be a non-empty string when defined.")
+
+    # -- Validate extraction path filters.
+
+    for key in ("exclude-paths", "keep-paths"):
+        patterns = config["buildinfo"].get(key)
+        if patterns is None:
+            config["buildinfo"][key] = []
+        elif isinstance(patterns, str):
+            config["buildinfo"][key] = [patterns]
+        elif not isinstance(patterns, list):
+            raise ConfigError(f"'buildinfo.{key}' must be a string or a list of strings.")
+
+        if not all(is_valid_pattern(p) for p in config["buildinfo"][key]):
+            raise ConfigError(f"'buildinfo.{key}' entries must be non-empty paths relative to the AppDir.")
+
+    keep_locales = config["buildinfo"].get("keep-locales", "all")
+    if isinstance(keep_locales, str) and keep_locales != "all":
+        config["buildinfo"]["keep-locales"] = keep_locales = [keep_locales]
+    if keep_locales != "all":
+        if not isinstance(keep_locales, list) or not all(isinstance(x, str) and x.strip() for x in keep_locales):
+            raise ConfigError("'buildinfo.keep-locales' must be 'all' or a list of locale names (e.g. en, de, pt_BR).")
     
     # -- Validate apprunconf section.
 
@@ -164,6 +187,10 @@ def validate_yaml_config(config):
     else:
         raise ConfigError("'apprunconf.prebuild-commands' must be a list of strings.")
 
+    for key in ("bundle-ld-library-path", "minimal-rpath", "soname-farm"):
+        if not isinstance(apprunconf.get(key, False), bool):
+            raise ConfigError(f"'apprunconf.{key}' must be true or false.")
+
     config["apprunconf"] = apprunconf
 
     # -- Validate sandbox section.
@@ -333,5 +360,9 @@ def validate_yaml_config(config):
     if not isinstance(runtime, str) or runtime not in allowed_runtimes:
         raise ConfigError(f"'buildinfo.runtime' must be one of: {', '.join(sorted(allowed_runtimes))}.")
 
+    # -- Validate build profile.
+
+    validate_build_profile(config["buildinfo"])
+
     print_success("YAML validation passed successfully.")
     print_blank()
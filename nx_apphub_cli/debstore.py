@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+# SPDX-License-Identifier: BSD-3-Clause
+# Copyright <2026> <Uri Herrera <uri_herrera@nxos.org>>
+
+import fcntl
+import os
+import time
+from pathlib import Path
+from threading import Lock
+
+from .utils import evict_least_recently_used, parse_size
+
+# <---
+# --->
+# -- Content-addressed .deb store shared by every app and build.
+
+cache_dir = Path.home() / ".cache/nx-apphub-cli"
+store_dir = cache_dir / "store"
+
+default_store_limit = "10G"
+
+# -- Abandoned partial downloads are dropped after a week.
+
+partial_max_age_seconds = 7 * 24 * 3600
+
+store_lock = Lock()
+
+
+def get_store_limit():
+    """Return the store size cap in bytes (NX_APPHUB_STORE_MAX_SIZE, default 10G)."""
+    return parse_size(os.environ.get("NX_APPHUB_STORE_MAX_SIZE", default_store_limit))
+
+
+def get_store_path(sha256):
+    """Return the store location of a .deb with the given SHA256."""
+    return store_dir / sha256[:2] / f"{sha256}.deb"
+
+
+def get_partial_path(sha256):
+    """Return the resumable .part location of a .deb that is being downloaded."""
+    return store_dir / "partial" / f"{sha256}.part"
+
+
+def lookup_deb(sha256):
+    """Return the stored .deb for a SHA256 and mark it as recently used, or None."""
+    if not sha256:
+        return None
+
+    path = get_store_path(sha256)
+    try:
+        os.utime(path)
+    except FileNotFoundError:
+        return None
+
+    return path
+
+
+def enforce_store_limit(limit=None):
+    """Evict least recently used .debs until the store fits its size cap. Returns bytes freed."""
+    limit = get_store_limit() if limit is None else limit
+
+    with store_lock:
+        now = time.time()
+
+        for path in (store_dir / "partial").glob("*.part"):
+            try:
+                if now - path.stat().st_mtime > partial_max_age_seconds:
+                    path.unlink()
+            except FileNotFoundError:
+                continue
+
+        # -- Old .part locks go too, unless a download still holds them.
+
+        for path in (store_dir / "partial").glob("*.part.lock"):
+            try:
+                if now - path.stat().st_mtime <= partial_max_age_seconds:
+                    continue
+                with open(path, "a", encoding="utf-8") as f:
+                    fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    path.unlink()
+            except (FileNotFoundError, BlockingIOError):
+                continue
+
+        return evict_least_recently_used(store_dir.glob("*/*.deb"), limit)
@@ -2,25 +2,31 @@
 # SPDX-License-Identifier: BSD-3-Clause
 # Copyright <2025> <Uri Herrera <uri_herrera@nxos.org>>
 
+import asyncio
+import fcntl
 import gzip
+import hashlib
 import lzma
+import os
 import random
 import time
-from io import BytesIO
-from urllib.parse import urljoin, urlparse
-from collections import defaultdict
+from itertools import chain, count
+from urllib.parse import urlparse
+from collections import defaultdict, deque, namedtuple
 from pathlib import Path
 from threading import Lock
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from concurrent.futures import FIRST_COMPLETED, CancelledError, wait
 
-import requests
 from debian import debian_support
 from rich.console import Console
-from requests.adapters import HTTPAdapter
-from urllib3.util.retry import Retry
 
-from .exceptions import DownloadError
+from .debstore import get_partial_path, get_store_path, lookup_deb
+from .exceptions import DownloadError, TransferError
 from .console import print_error, print_warning
+from .mirrors import get_host, rank_urls, record_failure, record_success
+from .scheduler import spill_to_free_host
+from .transfer import check_status, fetch_async, open_stream, run, run_all, submit
+from .utils import parse_size, read_json_file, write_json_file, write_bytes_atomic
 
 console = Console()
 
@@ -34,6 +40,7 @@ def set_console(new_console):
 # -- Base cache directory for downloads.
 
 cache_dir = Path.home() / ".cache/nx-apphub-cli"
+index_cache_dir = cache_dir / "indexes"
 
 
 # -- Mirrors for supported distributions.
@@ -73,24 +80,61 @@ zbkit_mirrors = [
 ]
 
 
+# -- Core system packages that must never be bundled in an AppDir.
+
+excluded_packages = {
+    "dbus-user-session",
+    "libc6",
+    "libdrm2",
+    "libegl-mesa0",
+    "libegl1",
+    "libgbm1",
+    "libgcc-s1",
+    "libgl1",
+    "libgl1-mesa-dri",
+    "libgl1-mesa-glx",
+    "libglapi-mesa",
+    "libgles2",
+    "libglib2.0-0",
+    "libglib2.0-0t64",
+    "libglib2.0-bin",
+    "libglx-mesa0",
+    "libglx0",
+    "libopengl0",
+    "libstdc++6",
+    "libsystemd0",
+    "libsystemd-shared",
+    "libwayland-client0",
+    "libwayland-cursor0",
+    "libwayland-egl1",
+    "libwayland-server0",
+    "mesa-libgallium",
+    "mesa-vulkan-drivers",
+    "sudo",
+    "systemd",
+    "systemd-sysv",
+    "udev"
+}
+
+
 # -- Caching and Locks
 
 cache_lock = Lock()
 metadata_cache = {}
 
+PackageRecord = namedtuple("PackageRecord", ["version", "filename", "size", "sha256"])
+
+
+# -- Small chunks keep progress fine-grained enough to notice a trickling mirror.
 
-# -- Use retry strategy and session reuse for connection pooling.
+dl_chunk_size = 64 * 1024
 
-retry_strategy = Retry(
-    total=3,
-    status_forcelist=[429, 500, 502, 503, 504],
-    backoff_factor=0.3,
-)
-adapter = HTTPAdapter(max_retries=retry_strategy)
+part_counter = count()
 
-session = requests.Session()
-session.mount("http://", adapter)
-session.mount("https://", adapter)
+# -- A transfer below the throughput floor for a whole window gets a hedged request.
+
+default_min_throughput = "64K"
+stall_window_seconds = 10
 
 
 def get_mirrors_for_distro(distro):
@@ -119,222 +163,311 @@ def get_mirrors_for_repo(repo, quiet=True):
     return get_mirrors_for_distro(distro)
 
 
-def build_probe_tasks(repos, pkg_name, quiet):
+def get_index_sources(repo, quiet=True):
     """
-    Build probe tasks that randomly distribute mirrors to balance load,
-    avoiding hitting the same mirror with multiple concurrent requests unnecessarily.
+    Return the Packages index sources for a repository entry.
+
+    Each source is a tuple of (mirror, release, arch, component, label). Base repositories
+    yield one source per mirror × component; PPAs yield a single Launchpad source.
     """
-    tasks = []
-    for repo in repos:
-        if "ppa" in repo:
-            continue
+    release = repo.get("release")
+    arch = repo.get("arch")
 
-        distro = str(repo.get("distro", "")).lower()
-        release = repo.get("release")
-        arch = repo.get("arch")
-        components = repo.get("components", ["main"])
+    if "ppa" in repo:
+        ppa = str(repo["ppa"]).strip()
+        if not ppa or "/" not in ppa:
+            if not quiet:
+                print_error(f"Invalid PPA format: {ppa}. Expected format: '<user>/<ppa-name>'.", prefix="⛔")
+            return []
 
+        distro = str(repo.get("distro", "ubuntu")).lower()
         if not (distro and release and arch):
             if not quiet:
-                print_error(f"Error: Missing required repo keys for {pkg_name}: {repo}")
-            continue
+                print_error(f"Error: Missing required repo keys for PPA: {repo}")
+            return []
 
-        mirror_list = get_mirrors_for_repo(repo, quiet=quiet)
-        if not mirror_list:
-            if not quiet and distro != "debian-snapshot":
-                print_warning(f"Skipping unknown distro: {distro}", prefix="⚠️")
-            continue
+        base_url = f"https://ppa.launchpadcontent.net/{ppa}/{distro}".rstrip("/")
+        return [(base_url, release, arch, "main", f"{base_url} [ppa]")]
 
-        # -- Randomize the mirror list to spread load across mirrors.
+    distro = str(repo.get("distro", "")).lower()
+    components = repo.get("components", ["main"])
 
-        mirror_list = mirror_list[:]
-        random.shuffle(mirror_list)
+    if not (distro and release and arch):
+        if not quiet:
+            print_error(f"Error: Missing required repo keys: {repo}")
+        return []
 
-        # -- Only add one mirror per component at a time to reduce load.
+    mirror_list = get_mirrors_for_repo(repo, quiet=quiet)
+    if not mirror_list:
+        if not quiet and distro != "debian-snapshot":
+            print_warning(f"Skipping unknown distro: {distro}", prefix="⚠️")
+        return []
 
-        for component in components:
-            for mirror in mirror_list:
-                tasks.append((mirror, release, arch, pkg_name, component))
+    return [
+        (mirror, release, arch, component, f"{mirror} [{component}]")
+        for component in components
+        for mirror in mirror_list
+    ]
 
-    return tasks
 
+def load_indexes(sources, stop_event=None):
+    """
+    Fetch every distinct Packages index once, concurrently on the transfer engine.
 
-def get_latest_deb(pkg_name, repos, package_name, log_lock, stop_event=None, quiet=True):
-    """Download the latest .deb package for the given pkg_name by probing all mirrors concurrently using threads."""
-
-    excluded_packages = {
-        "dbus-user-session",
-        "libc6",
-        "libdrm2",
-        "libegl-mesa0",
-        "libegl1",
-        "libgbm1",
-        "libgcc-s1",
-        "libgl1",
-        "libgl1-mesa-dri",
-        "libgl1-mesa-glx",
-        "libglapi-mesa",
-        "libgles2",
-        "libglib2.0-0",
-        "libglib2.0-0t64",
-        "libglib2.0-bin",
-        "libglx-mesa0",
-        "libglx0",
-        "libopengl0",
-        "libstdc++6",
-        "libsystemd0",
-        "libsystemd-shared",
-        "libwayland-client0",
-        "libwayland-cursor0",
-        "libwayland-egl1",
-        "libwayland-server0",
-        "mesa-libgallium",
-        "mesa-vulkan-drivers",
-        "sudo",
-        "systemd",
-        "systemd-sysv",
-        "udev"
-    }
-
-    if pkg_name in excluded_packages:
-        if not quiet:
-            from .console import print_blank
-            print_blank()
-            print_blank()
-            print_warning(f"        Skipping {pkg_name}: This package is a core system library and should not be bundled in the AppDir.", prefix="⚠️")
-            print_blank()
-        return None
+    Returns a tuple of (indexes, failures) where indexes maps (mirror, release, arch, component)
+    to a parsed index and failures lists status messages for indexes that could not be loaded.
+    """
+    keys = list(dict.fromkeys(source[:4] for source in sources))
+    indexes = {}
+    failures = []
 
     if stop_event and stop_event.is_set():
-        raise DownloadError("Download cancelled.")
-
-    package_dir = cache_dir / package_name
-    deb_dir = package_dir / "debs"
-    deb_dir.mkdir(parents=True, exist_ok=True)
-
-    if not repos:
-        raise DownloadError(f"No valid repositories provided for {pkg_name}.")
+        raise DownloadError("Download cancelled during dependency resolution.")
 
-    probe_tasks = build_probe_tasks(repos, pkg_name, quiet)
+    results = run_all([load_package_index(*key, stop_event=stop_event) for key in keys])
 
-    fetch_failures = []
-    no_metadata = []
-    candidates = []
-    mirror_logs = []
+    if stop_event and stop_event.is_set():
+        raise DownloadError("Download cancelled during dependency resolution.")
 
-    for repo in repos:
-        if "ppa" in repo:
-            candidate = fetch_from_ppa(pkg_name, repo, deb_dir, quiet)
-            if candidate:
-                candidates.append(candidate)
+    for key, result in zip(keys, results):
+        if isinstance(result, BaseException):
+            index, status_msg = None, f"⛔ Unhandled error for: {key[0]} [{key[3]}]: {result}"
+        else:
+            index, status_msg = result
 
-    def probe_mirror(task):
-        if stop_event and stop_event.is_set():
-            return (task, None, None, Exception("Download cancelled"))
+        if index is not None:
+            indexes[key] = index
+        elif status_msg:
+            failures.append(status_msg)
 
-        mirror, release, arch, _, component = task
-        try:
-            result, status_msg = fetch_package_metadata(mirror, release, arch, pkg_name, component, stop_event=stop_event)
-            return (task, result, status_msg, None)
-        except Exception as e:
-            return (task, None, None, e)
-
-    with ThreadPoolExecutor(max_workers=5) as executor:
-        future_to_task = {executor.submit(probe_mirror, task): task for task in probe_tasks}
-        for future in as_completed(future_to_task):
-            if stop_event and stop_event.is_set():
-                executor.shutdown(wait=False, cancel_futures=True)
-                raise DownloadError("Download cancelled during mirror probing.")
+    return indexes, failures
 
-            mirror, _, _, pkg_name_task, component = future_to_task[future]
-            try:
-                _, result, status_msg, exception = future.result()
-                if result:
-                    filename, version_str = result
-                    version = debian_support.Version(version_str)
-                    deb_url = f"{mirror}/{filename}"
-                    candidates.append({
-                        "version": version,
-                        "version_str": version_str,
-                        "url": deb_url,
-                        "path": deb_dir / f"{pkg_name_task}.deb",
-                        "source": f"{mirror} [{component}]"
-                    })
-                elif status_msg and not quiet:
-                    if "Unable to fetch metadata" in status_msg:
-                        fetch_failures.append(status_msg)
-                    elif "No metadata" in status_msg:
-                        no_metadata.append(status_msg)
-                    else:
-                        mirror_logs.append(status_msg)
-                elif exception and not quiet:
-                    if "Download cancelled" not in str(exception):
-                        mirror_logs.append(f"⛔ Unhandled error for: {pkg_name_task} from: {mirror} [{component}]: {exception}")
-            except Exception as e:
-                if not quiet:
-                    mirror_logs.append(f"⛔ Unexpected error for: {pkg_name}: {e}")
-
-    if not quiet:
-        if fetch_failures:
-            console.print("\n" + "\n".join(f"        {msg}" for msg in fetch_failures))
-        if no_metadata:
-            console.print("\n" + "\n".join(f"        {msg}" for msg in no_metadata))
-        if mirror_logs:
-            console.print("\n" + "\n".join(f"        {msg}" for msg in mirror_logs))
-
-    if not candidates:
-        msg = f"Unable to find '{pkg_name}' after probing {len(probe_tasks)} mirror/component pairs. Aborting."
-        if log_lock:
-            with log_lock:
-                console.print(f"❌ {msg}")
-                console.print("")
-        raise DownloadError(msg)
 
+def order_candidates(candidates):
+    """Order candidates by descending version, then by mirror score within each version."""
     version_groups = defaultdict(list)
     for c in candidates:
         version_groups[c["version"]].append(c)
 
-    sorted_versions = sorted(version_groups.keys(), reverse=True)
+    ordered = []
+    for version in sorted(version_groups.keys(), reverse=True):
+        ordered.extend(rank_urls(version_groups[version], key=lambda c: c["url"]))
 
-    shuffled_candidates = []
-    for version in sorted_versions:
-        mirrors = version_groups[version]
-        random.shuffle(mirrors)
-        shuffled_candidates.extend(mirrors)
+    return ordered
 
-    best = shuffled_candidates[0]
 
-    if not quiet:
+def resolve_plan(download_tasks, stop_event=None, quiet=True):
+    """
+    Resolve every dependency against all repository indexes before anything is downloaded.
+
+    download_tasks is a list of (pkg_name, repos) tuples. Each distinct index is fetched once
+    and every package is resolved in memory against base repositories and PPAs alike.
+
+    Returns a list of plan entries: dicts with package, version, url, repo, filename, size,
+    sha256, source and alternates (the remaining candidates, best first).
+    """
+    task_sources = []
+    all_sources = []
+
+    for pkg_name, repos in download_tasks:
+        if pkg_name in excluded_packages:
+            if not quiet:
+                print_warning(f"        Skipping {pkg_name}: This package is a core system library and should not be bundled in the AppDir.", prefix="⚠️")
+            continue
+
+        if not repos:
+            raise DownloadError(f"No valid repositories provided for {pkg_name}.")
+
+        sources = [source for repo in repos for source in get_index_sources(repo, quiet=quiet)]
+        task_sources.append((pkg_name, sources))
+        all_sources.extend(sources)
+
+    indexes, failures = load_indexes(all_sources, stop_event=stop_event)
+
+    plan = []
+    missing = []
+
+    for pkg_name, sources in task_sources:
+        candidates = []
+        for mirror, release, arch, component, label in sources:
+            record = indexes.get((mirror, release, arch, component), {}).get(pkg_name)
+            if record is None:
+                continue
+
+            candidates.append({
+                "version": debian_support.Version(record.version),
+                "version_str": record.version,
+                "url": f"{mirror}/{record.filename}",
+                "repo": mirror,
+                "filename": record.filename,
+                "size": record.size,
+                "sha256": record.sha256,
+                "source": label,
+            })
+
+        if not candidates:
+            missing.append((pkg_name, len(sources)))
+            continue
+
+        best, *alternates = order_candidates(candidates)
+
+        plan.append({
+            "package": pkg_name,
+            "version": best["version_str"],
+            "url": best["url"],
+            "repo": best["repo"],
+            "filename": best["filename"],
+            "size": best["size"],
+            "sha256": best["sha256"],
+            "source": best["source"],
+            "alternates": [
+                {key: c[key] for key in ("version_str", "url", "repo", "filename", "size", "sha256", "source")}
+                for c in alternates
+            ],
+        })
+
+    if missing:
+        if failures:
+            console.print("\n" + "\n".join(f"        {msg}" for msg in failures))
+        details = ", ".join(f"'{name}' ({count} mirror/component pairs)" for name, count in missing)
+        raise DownloadError(f"Unable to find {details}. Aborting.")
+
+    return plan
+
+
+def download_planned(entry, package_name, log_lock=None, stop_event=None, quiet=True, extract=None):
+    """
+    Fetch a resolved plan entry, falling back to its alternates and retrying once.
+
+    Packages already in the shared store are returned without any network access;
+    downloads with a known SHA256 are verified while streaming and land in the store.
+
+    extract, an ExtractionStage for the AppDir, also gets the package extracted. A package whose
+    tree is already cached is assembled from it without touching the .deb, and None is returned.
+    A download that starts from the first byte is extracted as it arrives; stored, resumed or
+    hedged packages are queued on the stage once the file is complete.
+    """
+    pkg_name = entry["package"]
+    sha256 = entry.get("sha256")
+
+    if extract and sha256 and extract.submit_cached(pkg_name, sha256):
+        if not quiet:
+            console.print(f"        🌳 Using cached tree: {pkg_name} ({entry['version']})\n")
+        return None
+
+    stored = lookup_deb(sha256)
+    if stored:
+        if not quiet:
+            console.print(f"        🗃️ Using stored package: {pkg_name} ({entry['version']})\n")
+        if extract:
+            extract.submit(stored, pkg_name, sha256=sha256)
+        return stored
+
+    deb_dir = cache_dir / package_name / "debs"
+    deb_dir.mkdir(parents=True, exist_ok=True)
+
+    if not quiet and log_lock:
         with log_lock:
             console.print("")
             console.print(f"        📦 Package: {pkg_name}")
-            console.print(f"        🔹 Version: {best['version_str']}")
-            console.print(f"        🔹 Source:  {best['source']}\n")
-            console.print(f"        📥 Downloading: {pkg_name} from: {best['url']}...\n")
+            console.print(f"        🔹 Version: {entry['version']}")
+            console.print(f"        🔹 Source:  {entry['source']}\n")
+            console.print(f"        📥 Downloading: {pkg_name} from: {entry['url']}...\n")
 
     if stop_event and stop_event.is_set():
         raise DownloadError("Download cancelled.")
 
+    candidates = spill_to_free_host([entry] + list(entry.get("alternates", [])))
     download_errors = []
+    sinks = []
+
+    def fetch_candidate(candidate, transfer=None, hedge=False):
+
+        # -- Verified packages stream straight into the store; a partial file resumes on any mirror.
 
-    for candidate in shuffled_candidates:
-        if stop_event and stop_event.is_set(): break
         url = candidate["url"]
-        path = candidate["path"]
+        expected_sha256 = candidate.get("sha256")
+        suffix = ".hedge.part" if hedge else ".part"
+
+        # -- Only the primary transfer feeds the AppDir, so racing mirrors never write it twice.
+
+        sink = None
+        if extract and not hedge:
+            sink = extract.stream(pkg_name, sha256=expected_sha256)
+            sinks.append(sink)
+
+        if expected_sha256:
+            return download_file(
+                url,
+                get_store_path(expected_sha256),
+                quiet=quiet,
+                expected_sha256=expected_sha256,
+                expected_size=candidate.get("size"),
+                part_path=get_partial_path(expected_sha256).with_suffix(suffix),
+                transfer=transfer,
+                hedge=hedge,
+                sink=sink
+            )
+        destination = deb_dir / f"{pkg_name}.deb"
+        return download_file(
+            url,
+            destination,
+            quiet=quiet,
+            expected_size=candidate.get("size"),
+            part_path=destination.with_name(destination.name + suffix),
+            transfer=transfer,
+            hedge=hedge,
+            sink=sink
+        )
+
+    def hedge_pool(candidate):
+
+        # -- Only mirrors serving the very same file may race each other.
+
+        return [
+            c for c in candidates
+            if c is not candidate
+            and c.get("sha256") == candidate.get("sha256")
+            and c["url"].rsplit("/", 1)[-1] == candidate["url"].rsplit("/", 1)[-1]
+        ]
+
+    def complete(path, candidate):
+
+        # -- Aborted extractions must stop writing before the finished file is extracted over them.
+
+        for sink in sinks:
+            if not sink.done:
+                sink.abort()
+                sink.wait()
+
+        if extract and not any(sink.done for sink in sinks):
+            extract.submit(path, pkg_name, sha256=candidate.get("sha256"))
+        return path
+
+    for candidate in candidates:
+        if stop_event and stop_event.is_set():
+            break
         try:
-            return download_file(url, path, quiet=quiet)
+            return complete(hedged_download(candidate, hedge_pool(candidate), fetch_candidate, stop_event=stop_event, quiet=quiet), candidate)
         except DownloadError as e:
-            download_errors.append(f"{pkg_name}: {e} ← {url}")
+            download_errors.append(f"{pkg_name}: {e} ← {candidate['url']}")
 
-    for candidate in shuffled_candidates:
-        url = candidate["url"]
-        path = candidate["path"]
+    for candidate in candidates:
+        if stop_event and stop_event.is_set():
+            break
         try:
             if not quiet:
-                console.print(f"        🔁 Retrying download for: {pkg_name} from: {url}")
-            return download_file(url, path, quiet=quiet)
+                console.print(f"        🔁 Retrying download for: {pkg_name} from: {candidate['url']}")
+            return complete(hedged_download(candidate, hedge_pool(candidate), fetch_candidate, stop_event=stop_event, quiet=quiet), candidate)
         except DownloadError as e:
-            download_errors.append(f"{pkg_name} (retry): {e} ← {url}")
+            download_errors.append(f"{pkg_name} (retry): {e} ← {candidate['url']}")
+
+    for sink in sinks:
+        sink.abort()
+        sink.wait()
+
+    if stop_event and stop_event.is_set():
+        raise DownloadError("Download cancelled.")
 
     if not quiet and download_errors and log_lock:
         with log_lock:
@@ -349,8 +482,253 @@ def get_latest_deb(pkg_name, repos, package_name, log_lock, stop_event=None, qui
     raise DownloadError(msg)
 
 
-def fetch_package_metadata(mirror, release, arch, pkg_name, component="main", stop_event=None, retries=3):
-    """Fetch the package filename and version from repository metadata, with retry and .xz fallback."""
+def get_min_throughput():
+    """Return the throughput floor in bytes/s below which a transfer is hedged (NX_APPHUB_MIN_THROUGHPUT)."""
+    return parse_size(os.environ.get("NX_APPHUB_MIN_THROUGHPUT", default_min_throughput))
+
+
+def is_stalled(transfer, floor, now):
+    """Return True when a transfer has stayed below the throughput floor for a whole window."""
+    samples = transfer["samples"]
+
+    # -- Time spent queued for a scheduler slot says nothing about the mirror.
+
+    if not transfer["active"]:
+        samples.clear()
+        return False
+
+    samples.append((now, transfer["received"]))
+
+    while len(samples) > 1 and now - samples[1][0] >= stall_window_seconds:
+        samples.popleft()
+
+    first_time, first_received = samples[0]
+    elapsed = now - first_time
+
+    if elapsed < stall_window_seconds:
+        return False
+
+    return (transfer["received"] - first_received) / elapsed < floor
+
+
+def cancel_transfer(transfer):
+    """Stop a running transfer by cancelling its coroutine on the transfer engine."""
+    transfer["cancelled"] = True
+    future = transfer.get("future")
+    if future is not None:
+        future.cancel()
+
+
+def hedged_download(candidate, backups, fetch, stop_event=None, quiet=True):
+    """
+    Download a candidate, hedging it when it falls below the throughput floor.
+
+    fetch returns the download coroutine for a candidate; it runs on the transfer engine.
+    If the transfer stays below the floor for a whole window, the same file is also requested
+    from the next-best backup mirror. Whichever finishes first wins and the other is cancelled.
+    """
+    floor = get_min_throughput()
+    transfers = {}
+
+    def start(target, hedge):
+        transfer = {
+            "url": target["url"],
+            "received": 0,
+            "future": None,
+            "active": False,
+            "cancelled": False,
+            "samples": deque(),
+        }
+        transfer["future"] = submit(fetch(target, transfer=transfer, hedge=hedge))
+        transfers[transfer["future"]] = transfer
+        return transfer
+
+    primary = start(candidate, hedge=False)
+    pending = {primary["future"]}
+    backups = list(backups)
+    hedged = False
+    last_error = None
+
+    while pending:
+        if stop_event and stop_event.is_set():
+            for transfer in transfers.values():
+                cancel_transfer(transfer)
+            raise DownloadError("Download cancelled.")
+
+        done, pending = wait(pending, timeout=1, return_when=FIRST_COMPLETED)
+
+        if not done:
+            if floor and backups and not hedged and is_stalled(primary, floor, time.monotonic()):
+                hedged = True
+                backup = backups.pop(0)
+                if not quiet:
+                    console.print(f"        🐌 Slow transfer from: {get_host(candidate['url'])}, hedging with: {backup['url']}")
+                pending.add(start(backup, hedge=True)["future"])
+            continue
+
+        for future in done:
+            try:
+                path = future.result()
+            except CancelledError:
+                last_error = DownloadError("Cancelled")
+                continue
+            except DownloadError as e:
+                last_error = e
+                continue
+
+            for other in transfers.values():
+                if other["future"] is not future:
+                    cancel_transfer(other)
+            if future is not primary["future"]:
+                record_failure(primary["url"], "stalled")
+            return path
+
+    raise last_error
+
+
+def get_latest_deb(pkg_name, repos, package_name, log_lock, stop_event=None, quiet=True):
+    """Resolve and download the latest .deb package for the given pkg_name."""
+
+    if stop_event and stop_event.is_set():
+        raise DownloadError("Download cancelled.")
+
+    plan = resolve_plan([(pkg_name, repos)], stop_event=stop_event, quiet=quiet)
+    if not plan:
+        return None
+
+    return download_planned(plan[0], package_name, log_lock=log_lock, stop_event=stop_event, quiet=quiet)
+
+
+def _index_cache_paths(url):
+    """Return the on-disk body and validator paths for a repository index URL."""
+    digest = hashlib.sha256(url.encode("utf-8")).hexdigest()
+    return index_cache_dir / f"{digest}.data", index_cache_dir / f"{digest}.json"
+
+
+async def fetch_index(url, timeout=20):
+    """
+    Fetch a repository index, revalidating the on-disk copy with a conditional GET.
+
+    Returns the raw (still compressed) index body, or None if the index does not exist.
+    A 304 response is served from the local copy.
+    """
+    data_path, meta_path = _index_cache_paths(url)
+
+    headers = {}
+    meta = read_json_file(meta_path, default={}) if data_path.exists() else {}
+    if meta.get("etag"):
+        headers["If-None-Match"] = meta["etag"]
+    if meta.get("last_modified"):
+        headers["If-Modified-Since"] = meta["last_modified"]
+
+    try:
+        response = await fetch_async(url, headers=headers, timeout=timeout)
+
+        if response.status == 304 and headers:
+            try:
+                content = data_path.read_bytes()
+                record_success(url, latency=response.elapsed)
+                return content
+            except OSError:
+
+                # -- The body vanished between the check and the read; fetch it again unconditionally.
+
+                response = await fetch_async(url, timeout=timeout)
+
+        if response.status == 404:
+            record_success(url, latency=response.elapsed)
+            return None
+
+        check_status(response)
+        content = response.content
+        record_success(url, latency=response.elapsed)
+
+    except TransferError as e:
+        record_failure(url, e.status)
+        raise
+
+    etag = response.headers.get("ETag")
+    last_modified = response.headers.get("Last-Modified")
+
+    if etag or last_modified:
+        try:
+            write_bytes_atomic(data_path, content)
+            write_json_file(meta_path, {
+                "url": url,
+                "etag": etag,
+                "last_modified": last_modified,
+                "fetched": int(time.time()),
+            })
+        except OSError:
+            pass
+
+    return content
+
+
+def parse_packages_index(text):
+    """
+    Parse a Packages index in a single pass into a name → PackageRecord mapping.
+
+    When a package appears more than once, the highest version is kept.
+    """
+    index = {}
+    version_compare = debian_support.version_compare
+
+    name = version = filename = sha256 = None
+    size = 0
+
+    for line in chain(text.splitlines(), ("",)):
+        if not line:
+            if name and version and filename:
+                existing = index.get(name)
+                if existing is None or version_compare(version, existing.version) > 0:
+                    index[name] = PackageRecord(version, filename, size, sha256)
+            name = version = filename = sha256 = None
+            size = 0
+            continue
+
+        if line[0] in " \t":
+            continue
+
+        key, _, value = line.partition(":")
+
+        if key == "Package":
+            name = value.strip()
+        elif key == "Version":
+            version = value.strip()
+        elif key == "Filename":
+            filename = value.strip()
+        elif key == "Size":
+            try:
+                size = int(value)
+            except ValueError:
+                size = 0
+        elif key == "SHA256":
+            sha256 = value.strip()
+
+    return index
+
+
+def decode_packages_index(url, content):
+    """Decompress a Packages.gz/xz body and return its parsed index."""
+    if url.endswith(".gz"):
+        raw = gzip.decompress(content)
+    elif url.endswith(".xz"):
+        raw = lzma.decompress(content)
+    else:
+        raw = content
+
+    return parse_packages_index(raw.decode("utf-8", errors="ignore"))
+
+
+async def load_package_index(mirror, release, arch, component="main", stop_event=None, retries=3):
+    """
+    Return the parsed Packages index for a mirror/release/arch/component, with retry and .xz fallback.
+
+    Decompressing and parsing run in a worker thread so the event loop keeps serving transfers.
+
+    Returns a tuple of (index, status message); the index is None when it could not be loaded.
+    """
 
     base_url = f"{mirror}/dists/{release}/{component}/binary-{arch}/"
     urls_to_try = [base_url + "Packages.gz", base_url + "Packages.xz"]
@@ -359,156 +737,207 @@ def fetch_package_metadata(mirror, release, arch, pkg_name, component="main", st
     cache_key = (mirror, release, arch, component)
 
     with cache_lock:
-        if cache_key in metadata_cache:
-            lines = metadata_cache[cache_key]
-        else:
-            lines = None
+        index = metadata_cache.get(cache_key)
 
-    if lines is None:
-        for url in urls_to_try:
+    if index is not None:
+        return index, None
+
+    for url in urls_to_try:
+        if stop_event and stop_event.is_set():
+            return None, "Download cancelled"
+
+        for attempt in range(1, retries + 1):
             if stop_event and stop_event.is_set():
                 return None, "Download cancelled"
 
-            for attempt in range(1, retries + 1):
-                if stop_event and stop_event.is_set():
-                    return None, "Download cancelled"
-
-                try:
-                    response = session.get(url, timeout=20, stream=True)
-
-                    if response.status_code == 404:
-                        break
-
-                    response.raise_for_status()
-                    content = response.content
-                    if url.endswith(".gz"):
-                        with gzip.open(BytesIO(content), "rt", encoding="utf-8", errors="ignore") as f:
-                            lines = f.readlines()
-                    elif url.endswith(".xz"):
-                        with lzma.open(BytesIO(content), "rt", encoding="utf-8", errors="ignore") as f:
-                            lines = f.readlines()
-                    if lines:
-                        with cache_lock:
-                            metadata_cache[cache_key] = lines
-                        break
-
-                except requests.exceptions.RequestException as e:
-                    if attempt < retries:
-                        time.sleep(random.uniform(*delay_range))
-                        continue
-
-                    if isinstance(e, requests.exceptions.Timeout):
-                        reason = "⌛ Timeout"
-                    elif isinstance(e, requests.exceptions.ConnectionError):
-                        reason = "🔌 Connection error"
-                    elif isinstance(e, requests.exceptions.HTTPError) and e.response is not None:
-                        reason = f"HTTP {e.response.status_code}"
-                    else:
-                        reason = e.__class__.__name__
-
-                    mirror_host = urlparse(url).hostname
-                    return None, f"⭢ 🚧 Unable to fetch metadata from: {mirror_host}: {reason} (after {retries} attempts)"
-
-            if lines:
-                break
-
-    if not lines:
-        return None, f"⛔ No metadata for: '{pkg_name}' from: '{mirror}' in [{component}]"
+            try:
+                content = await fetch_index(url)
+
+                if content is None:
+                    break
 
-    current_package = None
-    filename = None
-    version = None
+                index = await asyncio.to_thread(decode_packages_index, url, content)
+                with cache_lock:
+                    metadata_cache[cache_key] = index
+                return index, None
 
-    for line in lines:
-        line = line.strip()
+            except TransferError as e:
+                if attempt < retries:
+                    await asyncio.sleep(random.uniform(*delay_range))
+                    continue
 
-        if line.startswith("Package: "):
-            current_package = line.split("Package: ")[1]
-            filename = None
-            version = None
+                mirror_host = urlparse(url).hostname
+                return None, f"⭢ 🚧 Unable to fetch metadata from: {mirror_host}: {e} (after {retries} attempts)"
 
-        elif line.startswith("Version: ") and current_package == pkg_name:
-            version = line.split("Version: ")[1]
+    return None, f"⛔ No metadata from: '{mirror}' in [{component}]"
 
-        elif line.startswith("Filename: ") and current_package == pkg_name:
-            filename = line.split("Filename: ")[1]
 
-        if current_package == pkg_name and filename and version:
-            return (filename, version), None
+def fetch_package_metadata(mirror, release, arch, pkg_name, component="main", stop_event=None, retries=3):
+    """Fetch the package filename and version from repository metadata, with retry and .xz fallback."""
 
-    return None, f"⛔ No metadata for: '{pkg_name}' from: '{mirror}' in [{component}]"
+    index, status_msg = run(load_package_index(mirror, release, arch, component, stop_event=stop_event, retries=retries))
 
+    if index is None and status_msg and "No metadata" not in status_msg:
+        return None, status_msg
 
-def fetch_from_ppa(pkg_name, repo, deb_dir, quiet=True):
-    """Download packages from a PPA repository."""
-    ppa = repo["ppa"].strip()
-    if not ppa or "/" not in ppa:
-        if not quiet:
-            console.print(f"⛔ Invalid PPA format: {ppa}. Expected format: '<user>/<ppa-name>'.")
-        return None
+    record = index.get(pkg_name) if index else None
+    if record is None:
+        return None, f"⛔ No metadata for: '{pkg_name}' from: '{mirror}' in [{component}]"
 
-    distro = repo.get("distro", "ubuntu").lower()
-    release = repo.get("release")
-    arch = repo.get("arch")
+    return (record.filename, record.version), None
 
-    if not (distro and release and arch):
-        if not quiet:
-            console.print(f"❌ Error: Missing required repo keys for {pkg_name}: {repo}")
-        return None
 
-    base_url = f"https://ppa.launchpadcontent.net/{ppa}/{distro}".rstrip('/')
+def _hash_file(path, digest):
+    """Feed an existing file into a hash object. Runs in a worker thread."""
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(dl_chunk_size), b""):
+            digest.update(chunk)
+
+
+def _write_chunk(f, digest, chunk):
+    """Append a chunk to the .part file and hash it. Runs in a worker thread, off the event loop."""
+    f.write(chunk)
+    digest.update(chunk)
+
 
+def _claim_part_file(part_path):
+    """
+    Lock a .part file for this download. Returns the open lock and the .part path to use.
+
+    The lock lives in a .lock file next to the .part, which is replaced as downloads finish. When
+    another download holds it, this one writes a .part named after the process instead.
+    """
+    lock_path = part_path.with_name(part_path.name + ".lock")
+    handle = open(lock_path, "a", encoding="utf-8")
     try:
-        result, _ = fetch_package_metadata(base_url, release, arch, pkg_name)
-        if result:
-            filename, version_str = result
-            version = debian_support.Version(version_str)
-            full_url = urljoin(base_url + "/", filename)
-            deb_path = deb_dir / f"{pkg_name}.deb"
-
-            return {
-                "version": version,
-                "version_str": version_str,
-                "url": full_url,
-                "path": deb_path,
-                "source": f"{base_url} [ppa]"
-            }
-
-    except Exception as e:
-        if not quiet:
-            console.print(f"⛔ Failed to fetch metadata for: {pkg_name} from: {base_url}: {e}")
+        fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        return handle, part_path
+    except BlockingIOError:
+        handle.close()
+
+    # -- No other download uses a name with this process in it, so its lock file is not needed on disk.
+
+    private_path = part_path.with_name(f"{part_path.stem}.{os.getpid()}-{next(part_counter)}{part_path.suffix}")
+    handle, private_path = _claim_part_file(private_path)
+    Path(handle.name).unlink(missing_ok=True)
+    return handle, private_path
 
-    return None
 
+async def download_file(url, destination, quiet=True, expected_sha256=None, expected_size=None, part_path=None,
+                        transfer=None, hedge=False, sink=None):
+    """
+    Download a file from the given URL to the given destination. Runs on the transfer engine.
+
+    The body is streamed into a .part file while its size and SHA256 are checked, so no
+    second read pass is needed. When the expected SHA256 is known, an existing .part file
+    is resumed with an HTTP Range request, whichever mirror it came from.
+
+    An optional transfer dict exposes progress ("received") and whether the request holds a
+    scheduler slot yet ("active") to a monitor; hedge marks a hedged request. Cancelling the
+    coroutine drops the .part file. The .part file is held with an flock while it is in use.
+
+    An optional sink (a StreamingExtraction) receives the body as it arrives when the download
+    starts from the first byte; it is finished once the file is verified, and aborted otherwise.
+    """
+    destination = Path(destination)
+    part_path = Path(part_path) if part_path else destination.with_name(destination.name + ".part")
+    part_path.parent.mkdir(parents=True, exist_ok=True)
+    destination.parent.mkdir(parents=True, exist_ok=True)
+
+    # -- Another download of the same file (another build, or the same one) gets a .part of its own.
+
+    part_lock, part_path = _claim_part_file(part_path)
 
-def download_file(url, destination, quiet=True):
-    """Download a file from the given URL to the given destination."""
     try:
-        response = session.get(url, timeout=20, stream=True)
-        response.raise_for_status()
 
-        dl_chunk_size = 1024 * 1024
+        digest = hashlib.sha256()
+        offset = 0
+
+        # -- Only resume partial files whose content can be verified at the end.
+
+        if part_path.exists():
+            offset = part_path.stat().st_size
+            if not expected_sha256 or (expected_size and offset >= expected_size):
+                part_path.unlink()
+                offset = 0
+            elif offset:
+                await asyncio.to_thread(_hash_file, part_path, digest)
+
+        headers = {"Range": f"bytes={offset}-"} if offset else {}
+
+        received = 0
+        started = [None]
+        streaming = False
+
+        def on_start():
+            started[0] = time.monotonic()
+            if transfer is not None:
+                transfer["active"] = True
+
+        try:
+            try:
+                async with open_stream(url, headers=headers, hedge=hedge, on_start=on_start) as (response, latency):
+                    check_status(response)
+
+                    # -- Start over if the server ignored the range or answered with a different one.
+
+                    if offset and (
+                        response.status != 206
+                        or not response.headers.get("Content-Range", "").startswith(f"bytes {offset}-")
+                    ):
+                        offset = 0
+                        digest = hashlib.sha256()
+
+                    # -- A download that starts from the first byte is extracted while it arrives.
 
-        with open(destination, "wb") as f:
-            for chunk in response.iter_content(chunk_size=dl_chunk_size):
-                if chunk:
-                    f.write(chunk)
+                    if sink is not None and not offset:
+                        streaming = True
+                        sink.start()
+
+                    with open(part_path, "ab" if offset else "wb") as f:
+                        async for chunk in response.content.iter_chunked(dl_chunk_size):
+                            await asyncio.to_thread(_write_chunk, f, digest, chunk)
+                            received += len(chunk)
+                            if transfer is not None:
+                                transfer["received"] = offset + received
+                            if streaming and not sink.offer(chunk):
+                                await asyncio.to_thread(sink.feed, chunk)
+
+                record_success(url, latency=latency, size=received, elapsed=max(time.monotonic() - started[0] - latency, 1e-3))
+
+            except TransferError as e:
+                record_failure(url, e.status)
+                raise
+
+            except asyncio.CancelledError:
+                part_path.unlink(missing_ok=True)
+                raise
+
+            size = part_path.stat().st_size
+
+            if expected_size and size != expected_size:
+                if size > expected_size:
+                    part_path.unlink(missing_ok=True)
+                raise DownloadError(f"📏 Size mismatch ({size} of {expected_size} bytes)")
+
+            if expected_sha256 and digest.hexdigest() != expected_sha256:
+                part_path.unlink(missing_ok=True)
+                record_failure(url, "checksum")
+                raise DownloadError("🧾 SHA256 mismatch")
+
+            os.replace(part_path, destination)
+
+            if streaming:
+                await asyncio.to_thread(sink.finish)
+
+        except BaseException:
+            if streaming:
+                sink.abort()
+            raise
 
         if not quiet:
             console.print(f"        🎉 Successfully downloaded: {destination}\n")
 
         return destination
-
-    except requests.exceptions.RequestException as e:
-        if isinstance(e, requests.exceptions.HTTPError) and e.response is not None:
-            raise DownloadError(f"🧾 HTTP {e.response.status_code}") from e
-        elif isinstance(e, requests.exceptions.SSLError):
-            raise DownloadError("🔒 SSL error") from e
-        elif isinstance(e, requests.exceptions.Timeout):
-            raise DownloadError("⌛ Timeout") from e
-        elif isinstance(e, requests.exceptions.ConnectionError):
-            if "NameResolutionError" in str(e):
-                raise DownloadError("🌐 DNS resolution failed") from e
-            raise DownloadError("🔌 Connection failed") from e
-        else:
-            raise DownloadError(f"⚠️ {e.__class__.__name__}") from e
+    finally:
+        part_lock.close()
@@ -18,6 +18,15 @@ class DownloadError(NxAppHubError):
     """Raised when a download operation fails."""
 
 
+class TransferError(DownloadError):
+    """Raised when an HTTP request fails; carries the HTTP status, if any."""
+
+    def __init__(self, message, status=None, reason=None):
+        super().__init__(message)
+        self.status = status
+        self.reason = reason
+
+
 class ExtractionError(NxAppHubError):
     """Raised when extracting packages or files fails."""
 
@@ -26,6 +35,14 @@ class BuildError(NxAppHubError):
     """Raised when building an AppDir fails."""
 
 
+class ToolNotFoundError(BuildError):
+    """Raised when an optional build-time tool is in neither the AppDir nor the host; carries its name."""
+
+    def __init__(self, tool):
+        super().__init__(f"'{tool}' was not found in the AppDir or on this system.")
+        self.tool = tool
+
+
 class RepoError(NxAppHubError):
     """Raised when repository metadata or sources are invalid."""
 
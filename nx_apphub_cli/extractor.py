@@ -2,90 +2,888 @@
 # SPDX-License-Identifier: BSD-3-Clause
 # Copyright <2025> <Uri Herrera <uri_herrera@nxos.org>>
 
+import hashlib
+import os
 import shutil
 import subprocess
+import tarfile
+import time
+from collections import defaultdict, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+from functools import partial
 from pathlib import Path
+from queue import Full, Queue
+from threading import Lock, Thread, get_ident
 
-from .exceptions import ExtractionError
-from .console import print_success, print_info
+from .exceptions import ConfigError, ExtractionError
+from .governor import decompression_share, get_cpu_count
+from .console import print_blank, print_info, print_message, print_success, print_warning
+from .manifest import (
+    build_appdir_manifest, build_package_manifest, get_appdir_manifest_path, get_manifest_dir, write_manifest
+)
+from .treecache import TreeLinker, discard_tree_dir, lookup_tree, new_tree_dir, publish_tree
+from .utils import format_size
 
 # <---
 # --->
-# -- Extract .deb files into the correct package directory.
+# -- Streaming .deb extraction: ar container → decompressor → tar members, straight into the AppDir.
 
-def extract_deb(deb_path, package_name, quiet=True):
-    """Extracts a .deb package into its designated AppDir."""
+ar_magic = b"!<arch>\n"
+ar_header_size = 60
+copy_chunk_size = 1024 * 1024
 
-    if deb_path is None:
-        return
+# -- Chunks buffered between a download and its extraction before the download waits.
+
+stream_queue_chunks = 256
+
+tar_stream_modes = {
+    "data.tar": "r|",
+    "data.tar.gz": "r|gz",
+    "data.tar.xz": "r|xz",
+    "data.tar.bz2": "r|bz2",
+}
+
+# -- External decompressors, in order of preference. Multi-threaded tools are used when installed;
+# -- otherwise xz, gz and bz2 fall back to tarfile's built-in codecs and zst to a plain zstd.
+# -- Set NX_APPHUB_PARALLEL_DECOMPRESSION=0 to use only the single-threaded path.
+
+parallel_decompressors = {
+    "data.tar.xz": [["xz", "-T0", "-dcq"]],
+    "data.tar.gz": [["pigz", "-dc"]],
+    "data.tar.bz2": [["lbzip2", "-dc"], ["pbzip2", "-dc"]],
+    "data.tar.zst": [["zstd", "-T0", "-dcq"]],
+}
+
+serial_decompressors = {
+    "data.tar.zst": [["zstd", "-dcq"], ["unzstd", "-cq"]],
+}
+
+# -- How each multi-threaded tool takes its thread count, which replaces -T0 at run time.
+
+thread_options = {
+    "xz": lambda threads: [f"-T{threads}"],
+    "zstd": lambda threads: [f"-T{threads}"],
+    "pigz": lambda threads: ["-p", str(threads)],
+    "lbzip2": lambda threads: ["-n", str(threads)],
+    "pbzip2": lambda threads: [f"-p{threads}"],
+}
+
+decompressor_cache = {}
+decompressor_lock = Lock()
+
+ExtractionTiming = namedtuple("ExtractionTiming", ["package", "member", "backend", "seconds", "decompressor_seconds"])
+
+
+def _read_exact(stream, size):
+    """Read exactly size bytes from a stream, or fewer only at end of stream."""
+    chunks = []
+    while size > 0:
+        chunk = stream.read(size)
+        if not chunk:
+            break
+        chunks.append(chunk)
+        size -= len(chunk)
+    return b"".join(chunks)
+
+
+def _skip(stream, size):
+    while size > 0:
+        chunk = stream.read(min(size, copy_chunk_size))
+        if not chunk:
+            raise ExtractionError("Truncated ar archive.")
+        size -= len(chunk)
+
+
+class MemberReader:
+    """File-like view of the next size bytes of a stream."""
+
+    def __init__(self, stream, size):
+        self.stream = stream
+        self.remaining = size
+
+    def read(self, size=-1):
+        if self.remaining <= 0:
+            return b""
+        if size is None or size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.stream.read(size)
+        if not data:
+            raise ExtractionError("Truncated ar archive.")
+        self.remaining -= len(data)
+        return data
+
+
+def open_data_member(stream):
+    """
+    Read ar headers from a .deb stream up to its data.tar.* member.
+
+    Returns (member name, reader over the member bytes). Other members are skipped as they pass.
+    """
+    if _read_exact(stream, len(ar_magic)) != ar_magic:
+        raise ExtractionError("Not a Debian package (missing ar header).")
+
+    while True:
+        header = _read_exact(stream, ar_header_size)
+        if not header:
+            raise ExtractionError("No valid data archive found.")
+        if len(header) != ar_header_size or header[58:60] != b"`\n":
+            raise ExtractionError("Corrupt ar member header.")
+
+        name = header[0:16].decode("ascii", errors="replace").strip().rstrip("/")
+        try:
+            size = int(header[48:58].decode("ascii").strip())
+        except ValueError as e:
+            raise ExtractionError(f"Corrupt ar member size for: {name}") from e
+
+        if name.startswith("data.tar"):
+            return name, MemberReader(stream, size)
+
+        _skip(stream, size + size % 2)
+
+
+def _safe_member_path(name):
+    """Return a member name relative to the AppDir, or None for names that would escape it."""
+    parts = [part for part in name.split("/") if part not in ("", ".")]
+    if not parts or ".." in parts:
+        return None
+    return "/".join(parts)
+
+
+def _library_target(rel_path):
+    """Libraries shipped in top-level lib/ are placed in usr/lib/."""
+    parts = rel_path.split("/")
+    if len(parts) == 2 and parts[0] == "lib" and ".so" in parts[1]:
+        return f"usr/lib/{parts[1]}"
+    return rel_path
+
+
+def _temp_path(target):
+    return target.with_name(f".{target.name}.{os.getpid()}.{get_ident()}.tmp")
+
+
+class PathOwnership:
+    """
+    Track which package owns every non-directory path written into an AppDir.
+
+    When several packages ship the same path, the package ranked first (its position in the
+    download plan) wins, whatever order they are extracted in. Every claimant's content
+    signature is kept so that packages shipping different content can be reported.
+    """
+
+    def __init__(self, priorities=None):
+        self.lock = Lock()
+        self.priorities = priorities or {}
+        self.owners = {}
+        self.claims = defaultdict(dict)
+
+    def _rank(self, package):
+        return (self.priorities.get(package, len(self.priorities)), package or "")
+
+    def should_write(self, rel_path, package):
+        """Return False if a higher-ranked package already owns the path."""
+        with self.lock:
+            owner = self.owners.get(rel_path)
+            return owner is None or self._rank(package) <= self._rank(owner)
+
+    def commit(self, rel_path, package, signature, install=None):
+        """Record a claim and, if the package wins the path, run install while holding the lock."""
+        with self.lock:
+            self.claims[rel_path][package] = signature
+            owner = self.owners.get(rel_path)
+            if install is None or (owner is not None and self._rank(package) > self._rank(owner)):
+                return False
+            install()
+            self.owners[rel_path] = package
+            return True
+
+    def conflicts(self):
+        """Return (path, owner, {package: signature}) for paths shipped with different content."""
+        with self.lock:
+            return [
+                (rel_path, self.owners.get(rel_path), dict(claims))
+                for rel_path, claims in sorted(self.claims.items())
+                if len(claims) > 1 and len(set(claims.values())) > 1
+            ]
+
+
+def extract_tar_members(tar, app_dir, ownership=None, package=None, path_filter=None):
+    """
+    Write the members of an open tar stream into app_dir.
+
+    Every file, symlink and hardlink is written to a temporary name and renamed into place, so
+    it never writes through an existing link and concurrent extractions cannot interleave.
+    Members that lose the path to a higher-ranked package are only hashed. Paths excluded by
+    path_filter are skipped unread, along with hardlinks to them.
+    Returns a list of (path, kind, size, mode, sha256 or link target) entries for the package;
+    kind is "dir", "file" (hardlinks included) or "symlink".
+    """
+    ownership = ownership or PathOwnership()
+    renamed = {}
+    signatures = {}
+    excluded = set()
+    entries = []
+
+    for member in tar:
+        rel_path = _safe_member_path(member.name)
+        if rel_path is None:
+            continue
+
+        rel_path = _library_target(rel_path)
+        renamed[_safe_member_path(member.name)] = rel_path
+        target = app_dir / rel_path
+        mode = member.mode & 0o777
+
+        if path_filter and not member.isdir():
+            link_source = renamed.get(_safe_member_path(member.linkname)) if member.islnk() else None
+            if link_source in excluded or path_filter.excludes_path(rel_path):
+                excluded.add(rel_path)
+                path_filter.skip(member.size if member.isreg() else 0)
+                continue
+        elif path_filter and path_filter.excludes_path(rel_path):
+            continue
+
+        if member.isdir():
+            target.mkdir(parents=True, exist_ok=True)
+            target.chmod(mode | 0o700)
+            entries.append((rel_path, "dir", 0, mode, ""))
+            continue
+
+        if not (member.isreg() or member.issym() or member.islnk()):
+            continue
+
+        target.parent.mkdir(parents=True, exist_ok=True)
+        write = ownership.should_write(rel_path, package)
+        temp = _temp_path(target)
+
+        try:
+            if member.isreg():
+                digest = hashlib.sha256()
+                source = tar.extractfile(member)
+                with open(temp, "wb") if write else nullcontext() as f:
+                    while chunk := source.read(copy_chunk_size):
+                        digest.update(chunk)
+                        if f:
+                            f.write(chunk)
+                if write:
+                    os.chmod(temp, mode)
+                    os.utime(temp, (member.mtime, member.mtime))
+                signature = ("file", member.size, digest.hexdigest())
+
+            elif member.issym():
+                if write:
+                    os.symlink(member.linkname, temp)
+                signature = ("symlink", member.linkname)
+
+            else:
+                link_source = _safe_member_path(member.linkname)
+                link_source = renamed.get(link_source, link_source)
+                if link_source not in signatures:
+                    raise ExtractionError(f"Hard link target missing in archive: {member.linkname}")
+                if write:
+                    os.link(app_dir / link_source, temp)
+                signature = signatures[link_source]
+
+            ownership.commit(rel_path, package, signature, partial(os.replace, temp, target) if write else None)
+
+        finally:
+            if write and os.path.lexists(temp):
+                temp.unlink()
+
+        signatures[rel_path] = signature
+        entries.append((rel_path, signature[0], signature[1] if signature[0] == "file" else 0, mode, signature[-1]))
+
+    return entries
+
+
+def parallel_decompression_enabled():
+    """Return False when NX_APPHUB_PARALLEL_DECOMPRESSION disables the multi-threaded tools."""
+    return os.environ.get("NX_APPHUB_PARALLEL_DECOMPRESSION", "1").strip().lower() not in ("0", "no", "false", "off")
+
+
+def _is_usable(command):
+    """Return True if a decompressor is installed and accepts its options."""
+    if not shutil.which(command[0]):
+        return False
+    try:
+        probe = [command[0], *[arg for arg in command[1:] if arg.startswith("-T")], "--version"]
+        return subprocess.run(
+            probe, check=False, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, timeout=5
+        ).returncode == 0
+    except (OSError, subprocess.SubprocessError):
+        return False
+
+
+def find_decompressor(name):
+    """Return the external decompressor command for a data.tar.* member, or None for tarfile's own codec."""
+    candidates = serial_decompressors.get(name, [])
+    if parallel_decompression_enabled():
+        candidates = parallel_decompressors.get(name, []) + candidates
+
+    with decompressor_lock:
+        for command in candidates:
+            key = tuple(command)
+            if key not in decompressor_cache:
+                decompressor_cache[key] = _is_usable(command)
+            if decompressor_cache[key]:
+                return command
+
+    return None
+
+
+def with_threads(command, threads):
+    """Return a multi-threaded decompressor command limited to a number of threads; others are returned as is."""
+    if not any(command in commands for commands in parallel_decompressors.values()):
+        return command
+    options = [arg for arg in command[1:] if not arg.startswith("-T")]
+    return [command[0], *thread_options[command[0]](threads), *options]
+
+
+def _extract_piped(member_reader, app_dir, command, usage=None, **kwargs):
+    """
+    Decompress a data.tar.* member through an external command and extract the tar stream it produces.
+
+    If usage is a list, the CPU seconds the decompressor itself used are appended to it.
+    """
+    try:
+        proc = subprocess.Popen(
+            command,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE
+        )
+    except FileNotFoundError as e:
+        raise ExtractionError(f"{command[0]} is required to extract this package.") from e
+
+    feed_errors = []
+
+    def feed():
+        try:
+            while chunk := member_reader.read(copy_chunk_size):
+                proc.stdin.write(chunk)
+        except (BrokenPipeError, ExtractionError) as e:
+            feed_errors.append(e)
+        finally:
+            try:
+                proc.stdin.close()
+            except BrokenPipeError:
+                pass
+
+    feeder = Thread(target=feed, daemon=True)
+    feeder.start()
+
+    try:
+        with tarfile.open(fileobj=proc.stdout, mode="r|") as tar:
+            entries = extract_tar_members(tar, app_dir, **kwargs)
+
+        # -- tar stops at its end-of-archive marker; drain the padding so the decompressor can exit.
+
+        while proc.stdout.read(copy_chunk_size):
+            pass
+    except BaseException:
+        proc.kill()
+        raise
+    finally:
+        feeder.join()
+        proc.stdout.close()
+        stderr = proc.stderr.read().decode(errors="replace").strip()
+        _, status, rusage = os.wait4(proc.pid, 0)
+        proc.returncode = os.waitstatus_to_exitcode(status)
+        if usage is not None:
+            usage.append(rusage.ru_utime + rusage.ru_stime)
+
+    if feed_errors and not isinstance(feed_errors[0], BrokenPipeError):
+        raise feed_errors[0]
+    if proc.returncode != 0:
+        raise ExtractionError(f"{command[0]} failed: {stderr or proc.returncode}")
+
+    return entries
+
+
+def materialise_tree(root, manifest, app_dir, ownership=None, package=None, linker=None, path_filter=None):
+    """
+    Assemble a package in app_dir from its cached tree, resolving and filtering paths like
+    extract_tar_members.
+
+    Returns the same entries extracting the .deb would.
+    """
+    ownership = ownership or PathOwnership()
+    linker = linker or TreeLinker()
+    app_dir = Path(app_dir)
+    app_dir.mkdir(parents=True, exist_ok=True)
+    entries = []
+
+    for rel_path, kind, size, mode, digest, _ in manifest["entries"]:
+        if path_filter and path_filter.excludes_path(rel_path):
+            if kind != "dir":
+                path_filter.skip(size)
+            continue
+
+        target = app_dir / rel_path
+        entries.append((rel_path, kind, size, mode, digest))
+
+        if kind == "dir":
+            target.mkdir(parents=True, exist_ok=True)
+            target.chmod(mode | 0o700)
+            continue
+
+        target.parent.mkdir(parents=True, exist_ok=True)
+        write = ownership.should_write(rel_path, package)
+        signature = ("file", size, digest) if kind == "file" else ("symlink", digest)
+        temp = _temp_path(target)
+
+        try:
+            if write and kind == "file":
+                linker.place(root / rel_path, temp)
+            elif write:
+                os.symlink(digest, temp)
 
-    package_dir = Path.home() / ".cache/nx-apphub-cli" / package_name
-    app_dir = package_dir / "AppDir"
-    deb_dir = package_dir / "debs"
+            ownership.commit(rel_path, package, signature, partial(os.replace, temp, target) if write else None)
 
+        finally:
+            if write and os.path.lexists(temp):
+                temp.unlink()
+
+    return entries
+
+
+def extract_deb_stream(stream, app_dir, ownership=None, package=None, timings=None, path_filter=None):
+    """
+    Extract the data archive of a .deb read sequentially from a stream into app_dir. Returns its entries.
+
+    If timings is a list, an ExtractionTiming is appended to it: the wall time of the whole
+    extraction (decompression, tar parsing and file writes), without the time the stream spends
+    waiting for input (its waited attribute, if any), and the CPU time of an external decompressor.
+    """
+    app_dir = Path(app_dir)
     app_dir.mkdir(parents=True, exist_ok=True)
-    temp_dir = deb_dir / "temp"
-    temp_dir.mkdir(parents=True, exist_ok=True)
+
+    name, member_reader = open_data_member(stream)
+    command = find_decompressor(name)
+
+    if command is None and name not in tar_stream_modes:
+        if name == "data.tar.zst":
+            raise ExtractionError("zstd is required to extract data.tar.zst packages.")
+        raise ExtractionError(f"Unsupported archive format: {name}")
+
+    started = time.monotonic()
+    waited = getattr(stream, "waited", 0.0)
+    usage = []
+    backend = "tarfile"
+
+    try:
+        with decompression_share() as threads:
+            if command:
+                command = with_threads(command, threads)
+                backend = " ".join(command[:-1])
+                entries = _extract_piped(
+                    member_reader, app_dir, command, usage=usage, ownership=ownership, package=package,
+                    path_filter=path_filter
+                )
+            else:
+                with tarfile.open(fileobj=member_reader, mode=tar_stream_modes[name]) as tar:
+                    entries = extract_tar_members(tar, app_dir, ownership=ownership, package=package, path_filter=path_filter)
+    except (tarfile.TarError, EOFError, OSError) as e:
+        raise ExtractionError(f"{name}: {e}") from e
+
+    if timings is not None:
+        seconds = time.monotonic() - started - (getattr(stream, "waited", 0.0) - waited)
+        timings.append(ExtractionTiming(package, name, backend, max(seconds, 0.0), usage[0] if usage else None))
+
+    return entries
+
+
+def get_app_dir(package_name):
+    """Return the AppDir being assembled for a package."""
+    return Path.home() / ".cache/nx-apphub-cli" / package_name / "AppDir"
+
+
+def extract_deb(deb_path, package_name, quiet=True, ownership=None, package=None, timings=None, path_filter=None):
+    """
+    Extracts a .deb package into its designated AppDir, streaming it without temporary files.
+
+    ownership and package (the dependency being extracted) let concurrent extractions into
+    the same AppDir resolve paths shipped by more than one package; see extract_deb_stream for timings.
+    """
+
+    if deb_path is None:
+        return
 
     if not quiet:
         print_info(f"Extracting {deb_path}...", prefix="🗄️")
 
     try:
-        subprocess.run(
-            ["ar", "x", deb_path], 
-            cwd=temp_dir, 
-            check=True,
-            stdout=subprocess.DEVNULL,
-            stderr=subprocess.PIPE
+        with open(deb_path, "rb") as f:
+            entries = extract_deb_stream(
+                f,
+                get_app_dir(package_name),
+                ownership=ownership,
+                package=package,
+                timings=timings,
+                path_filter=path_filter
+            )
+    except (ExtractionError, OSError) as e:
+        raise ExtractionError(f"Extraction failed for {deb_path}: {e}") from e
+
+    if not quiet:
+        print_success(f"Extracted {deb_path} successfully.", prefix="🗃️")
+
+    return entries
+
+
+class StreamingExtraction:
+    """
+    Extract a .deb into an AppDir while it is still being downloaded.
+
+    The download offers chunks as they arrive; a worker thread runs them through the ar,
+    decompression and tar stages. After a failure the worker keeps draining, so the download
+    never blocks on it, and finish() reports the error.
+
+    With the SHA256 of the .deb, the package is extracted into a new cached tree instead, which
+    finish() publishes once the download is verified and then assembles into the AppDir.
+    """
+
+    def __init__(self, package_name, ownership=None, package=None, timings=None, sha256=None, linker=None,
+                 path_filter=None):
+        self.app_dir = get_app_dir(package_name)
+        self.ownership = ownership
+        self.package = package
+        self.timings = timings
+        self.sha256 = sha256
+        self.linker = linker
+        self.path_filter = path_filter
+        self.tree_dir = None
+        self.waited = 0.0
+        self.entries = None
+        self.queue = Queue(maxsize=stream_queue_chunks)
+        self.buffer = b""
+        self.error = None
+        self.eof = False
+        self.started = False
+        self.done = False
+        self.aborted = False
+        self.thread = Thread(target=self._run, daemon=True)
+
+    def read(self, size=-1):
+        while not self.eof and (size < 0 or len(self.buffer) < size):
+            started = time.monotonic()
+            chunk = self.queue.get()
+            self.waited += time.monotonic() - started
+            if chunk is None:
+                self.eof = True
+                break
+            self.buffer += chunk
+
+        if self.aborted:
+            raise ExtractionError("Download aborted.")
+
+        if size < 0:
+            size = len(self.buffer)
+        data, self.buffer = self.buffer[:size], self.buffer[size:]
+        return data
+
+    def _run(self):
+        try:
+            if self.sha256:
+                self.tree_dir = new_tree_dir(self.sha256)
+                self.entries = extract_deb_stream(self, self.tree_dir / "root", package=self.package, timings=self.timings)
+            else:
+                self.entries = extract_deb_stream(
+                    self,
+                    self.app_dir,
+                    ownership=self.ownership,
+                    package=self.package,
+                    timings=self.timings,
+                    path_filter=self.path_filter
+                )
+        except Exception as e:
+            self.error = e
+
+        # -- Drain whatever the download still sends, so offer() and feed() never block.
+
+        while not self.eof:
+            if self.queue.get() is None:
+                self.eof = True
+
+    def start(self):
+        self.started = True
+        self.thread.start()
+
+    def offer(self, chunk):
+        """Queue a chunk without blocking; returns False if the queue is full."""
+        try:
+            self.queue.put_nowait(chunk)
+            return True
+        except Full:
+            return False
+
+    def feed(self, chunk):
+        """Queue a chunk, waiting for the extraction to catch up."""
+        self.queue.put(chunk)
+
+    def finish(self):
+        """Signal the end of the .deb and wait for the extraction to complete."""
+        self.queue.put(None)
+        self.thread.join()
+
+        try:
+            if self.error:
+                raise self.error
+            if self.tree_dir:
+                tree = publish_tree(self.tree_dir, self.sha256, self.entries)
+                self.entries = materialise_tree(
+                    *tree,
+                    self.app_dir,
+                    ownership=self.ownership,
+                    package=self.package,
+                    linker=self.linker,
+                    path_filter=self.path_filter
+                )
+        except Exception as e:
+            discard_tree_dir(self.tree_dir)
+            raise ExtractionError(f"Streaming extraction failed: {e}") from e
+
+        self.done = True
+
+    def abort(self):
+        """Stop feeding the extraction; it stops at its next read."""
+        self.aborted = True
+        try:
+            self.queue.put_nowait(None)
+        except Full:
+            pass
+
+    def wait(self):
+        """Wait for an aborted extraction to stop writing into the AppDir."""
+        if not self.started:
+            return
+        while self.thread.is_alive():
+            try:
+                self.queue.put_nowait(None)
+            except Full:
+                pass
+            self.thread.join(timeout=0.1)
+        discard_tree_dir(self.tree_dir)
+
+
+# -- What to do when packages ship different content at the same path.
+
+conflict_policies = ("warn", "error")
+max_reported_conflicts = 20
+max_reported_timings = 10
+
+
+class ExtractionStage:
+    """
+    Extraction worker pool for one AppDir, running alongside the downloads.
+
+    Packages that were not extracted while downloading are queued here. All extractions share
+    one PathOwnership, so a path shipped by several packages resolves the same way on every build.
+    Packages with a known SHA256 go through the tree cache; hardlinks=False keeps the AppDir
+    from sharing inodes with it when build steps may modify packaged files in place.
+    path_filter, if given, keeps excluded paths out of the AppDir (the cached trees stay whole).
+    """
+
+    def __init__(self, package_name, priorities=None, policy="warn", max_workers=None, hardlinks=True,
+                 path_filter=None):
+        if policy not in conflict_policies:
+            raise ConfigError(f"Unknown conflict policy '{policy}'. Use one of: {', '.join(conflict_policies)}")
+
+        self.package_name = package_name
+        self.policy = policy
+        self.ownership = PathOwnership(priorities)
+        self.executor = ThreadPoolExecutor(max_workers=max_workers or get_cpu_count())
+        self.futures = {}
+        self.timings = []
+        self.linker = TreeLinker(hardlinks=hardlinks)
+        self.path_filter = path_filter
+        self.reused = 0
+        self.entries = {}
+        self.streams = []
+        self.lock = Lock()
+
+    def stream(self, package, sha256=None):
+        """Return a StreamingExtraction for a package that is about to be downloaded."""
+        sink = StreamingExtraction(
+            self.package_name,
+            ownership=self.ownership,
+            package=package,
+            timings=self.timings,
+            sha256=sha256,
+            linker=self.linker,
+            path_filter=self.path_filter
         )
+        with self.lock:
+            self.streams.append(sink)
+        return sink
 
-        archive_files = list(temp_dir.glob("data.tar.*"))
-        if not archive_files:
-            raise ExtractionError(f"No valid data archive found in {deb_path}.")
+    # -- The first parameter is not called package: fn's own keyword arguments often include one.
 
-        data_archive = archive_files[0]
+    def _record(self, key, fn, *args, **kwargs):
+        entries = fn(*args, **kwargs)
+        with self.lock:
+            self.entries[key] = entries
+        return entries
 
-        if data_archive.suffix in [".xz", ".gz"]:
-            subprocess.run(
-                ["tar", "xf", str(data_archive), "-C", str(app_dir)], 
-                check=True,
-                stderr=subprocess.PIPE
-            )
-        elif data_archive.suffix == ".zst":
-            decompressed_archive = temp_dir / "data.tar"
-            subprocess.run(
-                ["unzstd", "-d", str(data_archive), "-o", str(decompressed_archive)],
-                check=True,
-                stdout=subprocess.DEVNULL,
-                stderr=subprocess.PIPE
-            )
-            subprocess.run(
-                ["tar", "xf", str(decompressed_archive), "-C", str(app_dir)], 
-                check=True,
-                stderr=subprocess.PIPE
+    def _queue(self, key, fn, *args, **kwargs):
+        future = self.executor.submit(self._record, key, fn, *args, **kwargs)
+        with self.lock:
+            self.futures[key] = future
+        return future
+
+    def submit(self, deb_path, package, sha256=None):
+        """Queue a finished .deb for extraction, through the tree cache when its SHA256 is known."""
+        if sha256:
+            return self._queue(package, self._extract_tree, deb_path, package, sha256)
+        return self._queue(
+            package,
+            extract_deb,
+            deb_path,
+            self.package_name,
+            ownership=self.ownership,
+            package=package,
+            timings=self.timings,
+            path_filter=self.path_filter
+        )
+
+    def submit_cached(self, package, sha256):
+        """Queue a package whose tree is already cached; returns None when it is not, so it must be fetched."""
+        tree = lookup_tree(sha256, verify=True)
+        if tree is None:
+            return None
+
+        with self.lock:
+            self.reused += 1
+        return self._queue(package, self._materialise, tree, package)
+
+    def _materialise(self, tree, package):
+        try:
+            return materialise_tree(
+                *tree,
+                get_app_dir(self.package_name),
+                ownership=self.ownership,
+                package=package,
+                linker=self.linker,
+                path_filter=self.path_filter
             )
-        else:
-            raise ExtractionError(f"Unsupported archive format in {deb_path}: {data_archive.suffix}")
+        except OSError as e:
+            raise ExtractionError(f"Could not assemble {package} from the tree cache: {e}") from e
 
-        if not quiet:
-            print_success(f"Extracted {deb_path} successfully.", prefix="🗃️")
+    def _extract_tree(self, deb_path, package, sha256):
+        tree = lookup_tree(sha256)
 
-        # -- Ensure that libraries are correctly moved without overwriting existing ones.
+        if tree is None:
+            tree_dir = new_tree_dir(sha256)
+            try:
+                with open(deb_path, "rb") as f:
+                    entries = extract_deb_stream(f, tree_dir / "root", package=package, timings=self.timings)
+                tree = publish_tree(tree_dir, sha256, entries)
+            except (ExtractionError, OSError) as e:
+                discard_tree_dir(tree_dir)
+                raise ExtractionError(f"Extraction failed for {deb_path}: {e}") from e
 
-        lib_dir = app_dir / "usr/lib"
-        lib_dir.mkdir(parents=True, exist_ok=True)
+        return self._materialise(tree, package)
 
-        for extracted_file in (app_dir / "lib").glob("*.so*"):
-            target_file = lib_dir / extracted_file.name
-            if not target_file.exists():
-                shutil.move(str(extracted_file), str(target_file))
-                if not quiet:
-                    print_info(f"Moved {extracted_file} → {target_file}", prefix="")
+    def pop_future(self, package):
+        """Return the queued extraction of a package, if any."""
+        with self.lock:
+            return self.futures.pop(package, None)
 
-    except subprocess.CalledProcessError as e:
-        error_msg = e.stderr.decode(errors='replace').strip() if e.stderr else str(e)
-        raise ExtractionError(f"Extraction failed for {deb_path}: {error_msg}") from e
+    def shutdown(self, cancel=False):
+        """Wait for running extractions; with cancel, drop the queued ones."""
+        self.executor.shutdown(wait=True, cancel_futures=cancel)
 
-    finally:
-        if temp_dir.exists():
-            shutil.rmtree(temp_dir)
+    def check_conflicts(self):
+        """Report paths shipped with different content by several packages; fail under the 'error' policy."""
+        conflicts = self.ownership.conflicts()
+        if not conflicts:
+            return conflicts
+
+        lines = [
+            f"{rel_path}: {owner} (kept) over {', '.join(p for p in sorted(claims) if p != owner)}"
+            for rel_path, owner, claims in conflicts[:max_reported_conflicts]
+        ]
+        if len(conflicts) > max_reported_conflicts:
+            lines.append(f"... and {len(conflicts) - max_reported_conflicts} more")
+
+        summary = f"{len(conflicts)} paths are shipped with different content by more than one package"
+
+        if self.policy == "error":
+            raise ExtractionError(summary + ":\n" + "\n".join(f"    {line}" for line in lines))
+
+        print_blank()
+        print_warning(f"{summary}:", prefix="⚠️")
+        for line in lines:
+            print_message(f"    {line}")
+
+        return conflicts
+
+    def package_entries(self):
+        """Return {package: entries} for every package extracted so far, streamed or not."""
+        with self.lock:
+            entries = dict(self.entries)
+            for sink in self.streams:
+                if sink.done:
+                    entries[sink.package] = sink.entries
+        return entries
+
+    def write_manifests(self, plan, manifest_path=None):
+        """
+        Write a manifest for every extracted package and the merged AppDir manifest.
+
+        Both go to the app's build cache; manifest_path, if given, gets a copy of the merged one.
+        Returns the merged manifest.
+        """
+        plan_entries = {entry["package"]: entry for entry in plan}
+        manifest_dir = get_manifest_dir(self.package_name)
+
+        package_manifests = {}
+        for package, entries in self.package_entries().items():
+            package_manifests[package] = build_package_manifest(package, plan_entries.get(package), entries)
+            write_manifest(manifest_dir / f"{package}.json", package_manifests[package])
+
+        manifest = build_appdir_manifest(
+            self.package_name, package_manifests, self.ownership.owners, self.ownership.claims
+        )
+        write_manifest(get_appdir_manifest_path(self.package_name), manifest)
+
+        if manifest_path:
+            write_manifest(manifest_path, manifest)
+
+        return manifest
+
+    def report_skipped(self):
+        """Print how much the path filter kept out of the AppDir."""
+        if self.path_filter and self.path_filter.skipped_files:
+            print_blank()
+            print_info(
+                f"Skipped {self.path_filter.skipped_files} excluded files ({format_size(self.path_filter.skipped_bytes)}).",
+                prefix="✂️"
+            )
+
+    def report_timings(self):
+        """Print the total extraction time and the slowest packages with the decompressor each one used."""
+        if self.reused:
+            methods = ", ".join(f"{count} {method}" for method, count in self.linker.counts.items() if count)
+            print_blank()
+            print_info(f"{self.reused} packages reused from the tree cache; files placed by {methods or 'none'}.", prefix="🌳")
+
+        timings = sorted(self.timings, key=lambda timing: timing.seconds, reverse=True)
+        if not timings:
+            return timings
+
+        print_blank()
+        decompressor_seconds = sum(t.decompressor_seconds or 0.0 for t in timings)
+        print_info(
+            f"Extracted {len(timings)} packages in {sum(t.seconds for t in timings):.2f}s (summed across workers"
+            + (f"; external decompressors used {decompressor_seconds:.2f}s of CPU" if decompressor_seconds else "")
+            + "):",
+            prefix="⏱️"
+        )
+        for timing in timings[:max_reported_timings]:
+            detail = f", decompressor {timing.decompressor_seconds:.2f}s CPU" if timing.decompressor_seconds is not None else ""
+            print_message(f"    {timing.package}: {timing.seconds:.2f}s ({timing.member}, {timing.backend}{detail})")
+        if len(timings) > max_reported_timings:
+            print_message(f"    ... and {len(timings) - max_reported_timings} more")
+
+        return timings
@@ -7,10 +7,10 @@ import lzma
 import re
 from io import BytesIO
 
-import requests
 from rich.console import Console
 
-from .exceptions import GeneratorError
+from .exceptions import GeneratorError, TransferError
+from .transfer import check_status, fetch
 from .utils import get_host_nitrux_version
 
 console = Console()
@@ -84,12 +84,12 @@ def fetch_repository_metadata(distro, release, arch, components):
 
             for url in urls_to_try:
                 try:
-                    r = requests.get(url, timeout=10)
+                    r = fetch(url, timeout=10)
 
-                    if r.status_code == 404:
+                    if r.status == 404:
                         continue
 
-                    r.raise_for_status()
+                    check_status(r)
 
                     content = r.content
                     if url.endswith(".gz"):
@@ -101,13 +101,13 @@ def fetch_repository_metadata(distro, release, arch, components):
 
                     break
 
-                except requests.exceptions.RequestException as e:
+                except TransferError as e:
                     console.print("🚧 Could not fetch metadata from the repository.")
                     console.print(f"  ↪ URL: {url}")
 
-                    if hasattr(e, 'response') and e.response is not None:
-                        status_code = e.response.status_code
-                        reason = e.response.reason
+                    if e.status is not None:
+                        status_code = e.status
+                        reason = e.reason
                         console.print(
                             f"      ↪ Issue: The server returned a "
                             f"'{status_code} {reason}' error."
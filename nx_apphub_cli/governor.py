@@ -0,0 +1,230 @@
+#!/usr/bin/env python3
+# SPDX-License-Identifier: BSD-3-Clause
+# Copyright <2026> <Uri Herrera <uri_herrera@nxos.org>>
+
+import fcntl
+import os
+import time
+from collections import namedtuple
+from contextlib import contextmanager
+from pathlib import Path
+from threading import Lock
+
+from .console import print_info, print_blank
+from .exceptions import ConfigError
+
+# <---
+# --->
+# -- Resource governor for the CPU- and memory-heavy steps of a build.
+# -- Packaging jobs take one of a fixed number of slots shared by every nx-apphub-cli process on
+# -- the host (flock on files under the cache, which also record the holder's PID), and each job
+# -- gets an explicit share of the cores and of the memory available when it starts, passed on to
+# -- mksquashfs or mkdwarfs. Multi-threaded decompressors get an even share of the cores left by
+# -- running packaging jobs, between the decompressions running in this process when they start.
+
+cache_dir = Path.home() / ".cache/nx-apphub-cli"
+slots_dir = cache_dir / "slots"
+
+# -- Rough peak per compression worker at high zstd levels; caps workers when memory is short.
+
+worker_memory = 256 * 1024 ** 2
+min_job_memory = 256 * 1024 ** 2
+
+# -- One packaging slot per 4 cores and 4 GiB of RAM, at least one.
+
+cores_per_slot = 4
+memory_per_slot = 4 * 1024 ** 3
+
+slot_poll_seconds = 1
+
+PackagingLimits = namedtuple("PackagingLimits", ["workers", "memory"])
+
+decompression_lock = Lock()
+active_decompressions = 0
+
+
+def _read_cgroup(name):
+    try:
+        with open(Path("/sys/fs/cgroup") / name, encoding="utf-8") as f:
+            return f.read().split()
+    except OSError:
+        return None
+
+
+def get_cpu_count():
+    """Return the cores this process may use, honouring CPU affinity and a cgroup v2 CPU quota."""
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except (AttributeError, OSError):
+        cpus = os.cpu_count() or 1
+
+    quota = _read_cgroup("cpu.max")
+    if quota and quota[0] != "max":
+        cpus = min(cpus, max(1, int(quota[0]) // int(quota[1])))
+
+    return max(1, cpus)
+
+
+def _read_meminfo():
+    info = {}
+    try:
+        with open("/proc/meminfo", encoding="utf-8") as f:
+            for line in f:
+                key, _, value = line.partition(":")
+                info[key] = int(value.split()[0]) * 1024
+    except (OSError, ValueError, IndexError):
+        pass
+    return info
+
+
+def _cgroup_memory_left():
+    limit = _read_cgroup("memory.max")
+    current = _read_cgroup("memory.current")
+    if not limit or limit[0] == "max" or not current:
+        return None
+    return max(0, int(limit[0]) - int(current[0]))
+
+
+def get_total_memory():
+    """Return the memory this process may use in bytes, honouring a cgroup v2 limit."""
+    total = _read_meminfo().get("MemTotal", memory_per_slot)
+    limit = _read_cgroup("memory.max")
+    if limit and limit[0] != "max":
+        total = min(total, int(limit[0]))
+    return total
+
+
+def get_available_memory():
+    """Return the memory that can be used right now in bytes, honouring a cgroup v2 limit."""
+    available = _read_meminfo().get("MemAvailable", get_total_memory())
+    left = _cgroup_memory_left()
+    return available if left is None else min(available, left)
+
+
+def get_packaging_slots():
+    """Return how many packaging jobs may run at once on this host (NX_APPHUB_PACKAGING_JOBS overrides)."""
+    configured = os.environ.get("NX_APPHUB_PACKAGING_JOBS")
+    if configured:
+        if not configured.isdigit() or int(configured) < 1:
+            raise ConfigError(f"Invalid NX_APPHUB_PACKAGING_JOBS: '{configured}'. Use a positive number.")
+        return int(configured)
+
+    return max(1, min(get_cpu_count() // cores_per_slot, get_total_memory() // memory_per_slot))
+
+
+def _is_running(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def _busy_slots(slots, own=None):
+    """
+    Count the slots currently held by other processes.
+
+    Reads the PID each holder records instead of probing the locks, so counting never makes a
+    slot look taken to a process that is trying to take it. Records left by a process that died
+    are ignored.
+    """
+    busy = 0
+    for index in range(slots):
+        if index == own:
+            continue
+        try:
+            holder = (slots_dir / f"packaging-{index}.lock").read_text(encoding="utf-8").strip()
+        except OSError:
+            continue
+        if holder.isdigit() and _is_running(int(holder)):
+            busy += 1
+    return busy
+
+
+@contextmanager
+def packaging_slot():
+    """
+    Hold one of the host's packaging slots and yield the PackagingLimits of this job.
+
+    Waits while every slot is taken. Cores are split evenly between slots; memory is three
+    quarters of what is available when the slot is taken, shared with the slots still free.
+    """
+    slots = get_packaging_slots()
+    slots_dir.mkdir(parents=True, exist_ok=True)
+    waiting = False
+    handle = None
+
+    while handle is None:
+        for index in range(slots):
+            f = open(slots_dir / f"packaging-{index}.lock", "a", encoding="utf-8")
+            try:
+                fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                f.close()
+                continue
+            f.truncate(0)
+            f.write(f"{os.getpid()}\n")
+            f.flush()
+            handle, own = f, index
+            break
+        else:
+            if not waiting:
+                print_info(f"All {slots} packaging slots are busy; waiting for another build to finish...", prefix="⏳")
+                print_blank()
+                waiting = True
+            time.sleep(slot_poll_seconds)
+
+    try:
+        free = slots - _busy_slots(slots, own)
+        memory = max(min_job_memory, get_available_memory() * 3 // 4 // max(1, free))
+        workers = max(1, min(get_cpu_count() // slots, memory // worker_memory))
+        yield PackagingLimits(workers, memory)
+    finally:
+        handle.truncate(0)
+        fcntl.flock(handle, fcntl.LOCK_UN)
+        handle.close()
+
+
+@contextmanager
+def decompression_share():
+    """Count a running decompression and yield the threads it may use."""
+    global active_decompressions
+
+    cpus = get_cpu_count()
+    slots = get_packaging_slots()
+    cpus -= _busy_slots(slots) * (cpus // slots)
+
+    with decompression_lock:
+        active_decompressions += 1
+        threads = max(1, cpus // active_decompressions)
+
+    try:
+        yield threads
+    finally:
+        with decompression_lock:
+            active_decompressions -= 1
+
+
+def get_limit_flags(runtime, limits, settings=None):
+    """
+    Return the flags that keep a runtime's packaging tool within its PackagingLimits.
+
+    Workers set explicitly by a custom build profile are kept. go-appimagetool takes no limits.
+    """
+    settings = settings or {}
+    memory_mib = f"{limits.memory // 1024 ** 2}"
+    flags = []
+
+    if runtime == "classic":
+        if "workers" not in settings:
+            flags += ["--mksquashfs-opt", "-processors", "--mksquashfs-opt", str(limits.workers)]
+        flags += ["--mksquashfs-opt", "-mem", "--mksquashfs-opt", f"{memory_mib}M"]
+
+    elif runtime == "uruntime":
+        if "workers" not in settings:
+            flags += ["-N", str(limits.workers)]
+        flags += ["-L", f"{memory_mib}m"]
+
+    return flags
@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+# SPDX-License-Identifier: BSD-3-Clause
+# Copyright <2026> <Uri Herrera <uri_herrera@nxos.org>>
+
+import json
+import os
+import re
+from pathlib import Path
+
+# <---
+# --->
+# -- Icon theme index: every icon of a theme directory found in one walk, keyed by name and format.
+# -- Each index records the mtime of every directory it walked and is rebuilt when one changes.
+# -- Indexes of the host's themes are kept on disk, so most builds never walk /usr/share/icons,
+# -- and are checked once per process; themes inside the build cache change during a build and
+# -- are checked on every lookup.
+
+cache_dir = Path.home() / ".cache/nx-apphub-cli"
+icon_index_path = cache_dir / "icon-index.json"
+
+index_format = 1
+
+icon_exts = [".png", ".svg", ".xpm"]
+
+# -- Scalable icons outrank any raster size.
+
+scalable_size = 1 << 16
+
+size_pattern = re.compile(r"^(\d+)(?:x\d+)?(?:@\d+x)?$")
+
+indexes = {}
+host_indexes = None
+checked = set()
+
+
+def _icon_size(parts):
+    """Return the size an icon directory stands for (48x48, 48, scalable), or 0 if it names none."""
+    size = 0
+    for part in parts:
+        if part == "scalable":
+            return scalable_size
+        match = size_pattern.match(part)
+        if match:
+            size = max(size, int(match.group(1)))
+    return size
+
+
+def build_index(theme_path, recursive=True):
+    """
+    Walk a theme directory once and return its index.
+
+    An icon found at the theme root wins; otherwise the largest size does. Files with the same
+    name, format and size keep the first one in sorted path order, so lookups are stable.
+    """
+    theme_path = Path(theme_path)
+    dirs = {}
+    best = {}
+
+    for root, subdirs, files in os.walk(theme_path):
+        subdirs.sort()
+        rel_root = os.path.relpath(root, theme_path)
+        try:
+            dirs[rel_root] = os.stat(root).st_mtime_ns
+        except OSError:
+            continue
+
+        parts = [] if rel_root == "." else rel_root.split(os.sep)
+        rank = (1 if parts else 2, _icon_size(parts))
+
+        for name in sorted(files):
+            stem, ext = os.path.splitext(name)
+            if ext not in icon_exts:
+                continue
+            key = f"{stem}{ext}"
+            if key not in best or rank > best[key][0]:
+                best[key] = (rank, os.path.join(rel_root, name) if parts else name)
+
+        if not recursive:
+            break
+
+    return {
+        "format": index_format,
+        "recursive": recursive,
+        "dirs": dirs,
+        "icons": {key: path for key, (_, path) in best.items()},
+    }
+
+
+def is_index_current(index, theme_path):
+    """Return True if no directory of an index was added, removed or changed since it was built."""
+    if not index or index.get("format") != index_format:
+        return False
+
+    for rel_root, mtime_ns in index["dirs"].items():
+        try:
+            if os.stat(Path(theme_path) / rel_root).st_mtime_ns != mtime_ns:
+                return False
+        except OSError:
+            return False
+
+    return True
+
+
+def _load_host_indexes():
+    global host_indexes
+
+    if host_indexes is None:
+        try:
+            with open(icon_index_path, encoding="utf-8") as f:
+                host_indexes = json.load(f)
+        except (OSError, ValueError):
+            host_indexes = {}
+        if not isinstance(host_indexes, dict):
+            host_indexes = {}
+
+    return host_indexes
+
+
+def _save_host_indexes():
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    tmp_path = icon_index_path.with_name(f".{icon_index_path.name}.{os.getpid()}.tmp")
+
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(host_indexes, f, separators=(",", ":"))
+
+    os.replace(tmp_path, icon_index_path)
+
+
+def get_index(theme_path, recursive=True):
+    """
+    Return the index of a theme directory, or None if it does not exist.
+
+    Indexes are kept for the life of the process, and on disk for directories outside the cache
+    (the host's themes); either is rebuilt when a directory mtime no longer matches. A host theme
+    is only checked the first time it is looked up in a process.
+    """
+    theme_path = Path(theme_path)
+    key = str(theme_path)
+    index = indexes.get(key)
+
+    if key in checked and index is not None and index.get("recursive") == recursive:
+        return index
+
+    if not theme_path.is_dir():
+        return None
+
+    persistent = cache_dir not in theme_path.parents
+
+    if index is None and persistent:
+        index = _load_host_indexes().get(key)
+
+    if index is not None and index.get("recursive") == recursive and is_index_current(index, theme_path):
+        indexes[key] = index
+        if persistent:
+            checked.add(key)
+        return index
+
+    index = build_index(theme_path, recursive=recursive)
+    indexes[key] = index
+    if persistent:
+        checked.add(key)
+
+    if persistent:
+        _load_host_indexes()[key] = index
+        try:
+            _save_host_indexes()
+        except OSError:
+            pass
+
+    return index
+
+
+def lookup_icon(theme_path, icon_name, ext, recursive=True):
+    """Return the best icon file with a name and extension in a theme directory, or None."""
+    index = get_index(theme_path, recursive=recursive)
+    if index is None:
+        return None
+
+    path = index["icons"].get(f"{icon_name}{ext}")
+    return Path(theme_path) / path if path else None
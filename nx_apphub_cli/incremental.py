@@ -0,0 +1,303 @@
+#!/usr/bin/env python3
+# SPDX-License-Identifier: BSD-3-Clause
+# Copyright <2026> <Uri Herrera <uri_herrera@nxos.org>>
+
+import hashlib
+import json
+import os
+import shutil
+import stat
+from importlib.metadata import PackageNotFoundError, version
+from pathlib import Path
+
+from .manifest import get_appdir_manifest_path, hash_file, scan_tree
+from .utils import appimagetool_path, evict_least_recently_used, go_appimagetool_path, parse_size, uruntime_path
+
+# <---
+# --->
+# -- Incremental builds.
+# -- A build is split in two stages, each keyed by a fingerprint of its inputs:
+# --   base:     resolved packages, path filters, scripts/ and prebuild commands → the AppDir
+# --             right after the prebuild commands, kept as a hardlinked snapshot;
+# --   bundle:   the base plus the whole normalized YAML, the packaging tool and this CLI → the bundle.
+# -- When the bundle key and the bundle are unchanged, nothing runs; when only the base key
+# -- matches, the AppDir is restored from the snapshot and only AppRun generation onwards re-runs.
+# -- Snapshots share inodes with the tree cache, so they are capped on their own and the least
+# -- recently built apps lose theirs first.
+
+cache_dir = Path.home() / ".cache/nx-apphub-cli"
+builds_dir = cache_dir / "builds"
+
+state_format = 1
+default_builds_limit = "10G"
+
+runtime_tools = {
+    "classic": appimagetool_path,
+    "go": go_appimagetool_path,
+    "uruntime": uruntime_path,
+}
+
+
+def get_builds_limit():
+    """Return the snapshot size cap in bytes (NX_APPHUB_BUILDS_MAX_SIZE, default 10G)."""
+    return parse_size(os.environ.get("NX_APPHUB_BUILDS_MAX_SIZE", default_builds_limit))
+
+
+def get_build_dir(app_name):
+    """Return the directory holding the incremental state of an app."""
+    return builds_dir / app_name
+
+
+def _digest(value):
+    """Return the SHA256 of a JSON-serialisable value in canonical form."""
+    data = json.dumps(value, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(data.encode("utf-8")).hexdigest()
+
+
+def file_identity(path):
+    """Return [size, mtime_ns] of a file, or None if it does not exist."""
+    try:
+        st = Path(path).stat()
+    except (OSError, TypeError):
+        return None
+    return [st.st_size, st.st_mtime_ns]
+
+
+def directory_digest(path):
+    """
+    Return a digest of every path, mode, file content and symlink target under a directory, or None if it is missing.
+
+    Nothing is followed: a symlink is recorded by its target string, so repointing one changes the
+    digest even when it dangles. A link that resolves to a file also adds that file's content, which
+    is what the build copies.
+    """
+    path = Path(path)
+    if not path.is_dir():
+        return None
+
+    records = scan_tree(path)
+    for record in records:
+        if record["kind"] == "symlink" and (path / record["path"]).is_file():
+            record["sha256"] = hash_file(path / record["path"])
+
+    return _digest({"target": os.readlink(path) if path.is_symlink() else None, "files": records})
+
+
+def get_cli_version():
+    try:
+        return version("nx-apphub-cli")
+    except PackageNotFoundError:
+        return "unknown"
+
+
+def compute_base_key(config, plan, yaml_dir=None, conflict_policy="warn"):
+    """Fingerprint the inputs of dependency fetch, extraction (with its conflict policy), scripts/ and prebuild commands."""
+    buildinfo = config.get("buildinfo", {})
+
+    return _digest({
+        "format": state_format,
+        "packages": [[e["package"], e.get("version"), e.get("sha256")] for e in plan or []],
+        "filters": [buildinfo.get(k) for k in ("exclude-paths", "keep-paths", "keep-locales")],
+        "binarypath": buildinfo.get("binarypath"),
+        "on-conflict": conflict_policy,
+        "scripts": directory_digest(Path(yaml_dir) / "scripts") if yaml_dir else None,
+        "prebuild": config.get("apprunconf", {}).get("prebuild-commands", []),
+        "cli": get_cli_version(),
+    })
+
+
+def compute_bundle_key(base_key, config):
+    """Fingerprint everything the bundle depends on beyond the base AppDir."""
+    runtime = config.get("buildinfo", {}).get("runtime", "classic")
+
+    return _digest({
+        "base": base_key,
+        "config": config,
+        "icon": file_identity(config.get("buildinfo", {}).get("iconpath")),
+        "tool": file_identity(runtime_tools.get(runtime)),
+    })
+
+
+def load_build_state(app_name):
+    """Return the recorded state of the last build of an app, or an empty dict."""
+    try:
+        with open(get_build_dir(app_name) / "state.json", encoding="utf-8") as f:
+            state = json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+    if not isinstance(state, dict) or state.get("format") != state_format:
+        return {}
+    return state
+
+
+def save_build_state(app_name, state):
+    build_dir = get_build_dir(app_name)
+    build_dir.mkdir(parents=True, exist_ok=True)
+    tmp_path = build_dir / f".state.json.{os.getpid()}.tmp"
+
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(dict(state, format=state_format), f, indent=1)
+
+    os.replace(tmp_path, build_dir / "state.json")
+
+
+def invalidate_build(app_name):
+    """Forget the previous build of an app."""
+    shutil.rmtree(get_build_dir(app_name), ignore_errors=True)
+
+
+def is_artifact_current(state, bundle_key, output_file):
+    """Return True if the recorded bundle was built from bundle_key and has not been touched since."""
+    return (
+        state.get("bundle_key") == bundle_key
+        and state.get("artifact") == str(output_file)
+        and state.get("artifact_identity") is not None
+        and state.get("artifact_identity") == file_identity(output_file)
+    )
+
+
+def has_base(state, base_key, app_name):
+    """Return True if a snapshot of the AppDir built from base_key is available."""
+    return state.get("base_key") == base_key and (get_build_dir(app_name) / "base").is_dir()
+
+
+def link_tree(source, destination):
+    """Recreate a directory tree with every file hardlinked (or copied across filesystems)."""
+    source = Path(source)
+    destination = Path(destination)
+    destination.mkdir(parents=True, exist_ok=True)
+    hardlinks = True
+
+    for root, dirs, files in os.walk(source):
+        rel_root = Path(root).relative_to(source)
+        target_root = destination / rel_root
+
+        for name in dirs:
+            src = Path(root) / name
+            dst = target_root / name
+            if src.is_symlink():
+                os.symlink(os.readlink(src), dst)
+            else:
+                dst.mkdir(exist_ok=True)
+                shutil.copystat(src, dst)
+
+        for name in files:
+            src = Path(root) / name
+            dst = target_root / name
+            if src.is_symlink():
+                os.symlink(os.readlink(src), dst)
+                continue
+            if hardlinks:
+                try:
+                    os.link(src, dst)
+                    continue
+                except OSError:
+                    hardlinks = False
+            shutil.copy2(src, dst)
+
+        shutil.copystat(root, target_root)
+
+
+def record_base(app_name, app_dir, base_key):
+    """Snapshot the AppDir after the prebuild commands, with its manifest, as the base of later builds."""
+    build_dir = get_build_dir(app_name)
+    invalidate_build(app_name)
+    build_dir.mkdir(parents=True)
+
+    link_tree(app_dir, build_dir / "base")
+
+    manifest_path = get_appdir_manifest_path(app_name)
+    if manifest_path.exists():
+        shutil.copy2(manifest_path, build_dir / "manifest.json")
+
+    save_build_state(app_name, {"base_key": base_key, "base_size": tree_size(build_dir / "base")})
+    enforce_builds_limit(keep=app_name)
+
+
+def restore_base(app_name, app_dir):
+    """Replace the AppDir and its manifest with the recorded base snapshot."""
+    shutil.rmtree(app_dir, ignore_errors=True)
+    link_tree(get_build_dir(app_name) / "base", app_dir)
+
+    recorded = get_build_dir(app_name) / "manifest.json"
+    if recorded.exists():
+        manifest_path = get_appdir_manifest_path(app_name)
+        manifest_path.parent.mkdir(parents=True, exist_ok=True)
+        shutil.copy2(recorded, manifest_path)
+
+
+def record_artifact(app_name, bundle_key, output_file, manifest_path=None):
+    """Record the bundle a build produced, and its manifest if one was written, so an unchanged rebuild can return them."""
+    bundle_manifest = get_build_dir(app_name) / "bundle-manifest.json"
+    if manifest_path and Path(manifest_path).exists():
+        get_build_dir(app_name).mkdir(parents=True, exist_ok=True)
+        shutil.copy2(manifest_path, bundle_manifest)
+    else:
+        bundle_manifest.unlink(missing_ok=True)
+
+    state = load_build_state(app_name)
+    state.update(
+        bundle_key=bundle_key,
+        artifact=str(output_file),
+        artifact_identity=file_identity(output_file),
+    )
+    save_build_state(app_name, state)
+
+
+def tree_size(path):
+    """Return the bytes of the distinct regular files under a directory."""
+    seen = set()
+    size = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                st = os.lstat(os.path.join(root, name))
+            except OSError:
+                continue
+            if stat.S_ISREG(st.st_mode) and (st.st_dev, st.st_ino) not in seen:
+                seen.add((st.st_dev, st.st_ino))
+                size += st.st_size
+    return size
+
+
+def _snapshot_size(state_path):
+    if not (state_path.parent / "base").is_dir():
+        return None
+    return load_build_state(state_path.parent.name).get("base_size") or None
+
+
+def _drop_snapshot(state_path):
+    app_name = state_path.parent.name
+    shutil.rmtree(get_build_dir(app_name) / "base", ignore_errors=True)
+    state = load_build_state(app_name)
+    state.pop("base_size", None)
+    save_build_state(app_name, state)
+
+
+def enforce_builds_limit(limit=None, keep=None):
+    """
+    Drop the base snapshots of the least recently built apps until the snapshots fit their size cap.
+
+    The app named by keep, and apps built within the last hour, are never evicted. The rest of an
+    evicted app's state stays, so an unchanged bundle is still recognised; its next change
+    rebuilds from scratch. Returns bytes freed.
+    """
+    limit = get_builds_limit() if limit is None else limit
+
+    return evict_least_recently_used(
+        builds_dir.glob("*/state.json"),
+        limit,
+        size=_snapshot_size,
+        evict=_drop_snapshot,
+        keep=get_build_dir(keep) / "state.json" if keep else None
+    )
+
+
+def copy_recorded_manifest(app_name, manifest_path):
+    """Copy the manifest recorded with the bundle to manifest_path. Returns False if there is none."""
+    recorded = get_build_dir(app_name) / "bundle-manifest.json"
+    if not recorded.exists():
+        return False
+    shutil.copy2(recorded, manifest_path)
+    return True
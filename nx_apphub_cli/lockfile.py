@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+# SPDX-License-Identifier: BSD-3-Clause
+# Copyright <2026> <Uri Herrera <uri_herrera@nxos.org>>
+
+import hashlib
+import json
+from pathlib import Path
+
+from .exceptions import ConfigError
+from .console import print_info, print_success, print_blank
+from .utils import read_json_file, write_json_file
+
+# <---
+# --->
+# -- Lockfile name and format version.
+
+lockfile_name = "nx-apphub.lock"
+lockfile_format = 1
+
+
+def get_lockfile_path(yaml_dir):
+    """Return the lockfile path that sits next to an app YAML."""
+    return Path(yaml_dir) / lockfile_name
+
+
+def compute_inputs_digest(dependencies, base_repos, ppa_repos):
+    """Hash the YAML inputs that determine dependency resolution."""
+    payload = {
+        "deps": dependencies or [],
+        "base": base_repos or [],
+        "ppas": ppa_repos or {},
+    }
+    encoded = json.dumps(payload, sort_keys=True, default=str).encode("utf-8")
+    return hashlib.sha256(encoded).hexdigest()
+
+
+def load_lockfile(lock_path, inputs_digest):
+    """
+    Return the pinned download plan from a lockfile, or None if it is missing or stale.
+
+    A lockfile is only valid when its format and inputs digest match the current YAML.
+    """
+    data = read_json_file(lock_path)
+    if not isinstance(data, dict):
+        return None
+
+    if data.get("format") != lockfile_format or data.get("inputs") != inputs_digest:
+        return None
+
+    plan = []
+    for entry in data.get("packages", []):
+        try:
+            candidates = [
+                {
+                    "version_str": entry["version"],
+                    "url": f"{repo}/{entry['filename']}",
+                    "repo": repo,
+                    "filename": entry["filename"],
+                    "size": int(entry.get("size") or 0),
+                    "sha256": entry.get("sha256"),
+                    "source": f"{repo} [lock]",
+                }
+                for repo in [entry["repo"]] + list(entry.get("mirrors", []))
+            ]
+        except (KeyError, TypeError, ValueError):
+            return None
+
+        best, *alternates = candidates
+        plan.append({
+            "package": entry["package"],
+            "version": best.pop("version_str"),
+            **best,
+            "alternates": alternates,
+        })
+
+    return plan
+
+
+def write_lockfile(lock_path, plan, inputs_digest):
+    """Record a resolved download plan as a lockfile."""
+    packages = []
+
+    for entry in plan:
+
+        # -- Only mirrors serving the exact pinned file are kept as alternates.
+
+        mirrors = []
+        for alt in entry.get("alternates", []):
+            if alt["filename"] == entry["filename"] and alt["sha256"] == entry["sha256"]:
+                if alt["repo"] != entry["repo"] and alt["repo"] not in mirrors:
+                    mirrors.append(alt["repo"])
+
+        packages.append({
+            "package": entry["package"],
+            "version": entry["version"],
+            "repo": entry["repo"],
+            "filename": entry["filename"],
+            "size": entry["size"],
+            "sha256": entry["sha256"],
+            "mirrors": mirrors,
+        })
+
+    write_json_file(lock_path, {
+        "format": lockfile_format,
+        "inputs": inputs_digest,
+        "packages": sorted(packages, key=lambda p: p["package"]),
+    })
+
+
+def refresh_lockfile(config, yaml_dir):
+    """Resolve the dependencies of an app YAML against its repositories and rewrite the lockfile."""
+    from .downloader import resolve_plan
+    from .utils import build_download_tasks, get_repos_from_config
+
+    base_repos, ppa_repos = get_repos_from_config(config)
+    dependencies = config["buildinfo"].get("deps", [])
+
+    if not dependencies:
+        raise ConfigError("No dependencies listed; nothing to lock.")
+
+    print_info(f"Resolving {len(dependencies)} dependencies...", prefix="🔎")
+    print_blank()
+
+    plan = resolve_plan(build_download_tasks(dependencies, base_repos, ppa_repos))
+
+    lock_path = get_lockfile_path(yaml_dir)
+    write_lockfile(lock_path, plan, compute_inputs_digest(dependencies, base_repos, ppa_repos))
+
+    print_success(f"Lockfile written: {lock_path} ({len(plan)} packages)", prefix="🔒")
+    print_blank()
+    return lock_path
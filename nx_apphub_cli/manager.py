@@ -10,12 +10,16 @@ from pathlib import Path
 
 from .builder import prepare_appimage
 from .config import load_yaml_config
+from .lockfile import get_lockfile_path
+from .pathfilter import build_path_filter
 from .utils import (
     cleanup_cache,
     concurrent_downloads,
+    format_size,
     get_architecture,
     get_host_nitrux_version,
     get_os_release_data,
+    get_repos_from_config,
 )
 from .exceptions import ManagerError, NxAppHubError
 from .console import (
@@ -240,14 +244,20 @@ def install(app_names):
             print_blank()
             continue
 
-        base_repos = repos_config if isinstance(repos_config, list) else repos_config.get("base", [])
-        ppa_repos = {} if isinstance(repos_config, list) else {
-            ppa["id"]: ppa for ppa in repos_config.get("ppas", [])
-        }
-
+        base_repos, ppa_repos = get_repos_from_config(config)
         dependencies = config["buildinfo"].get("deps", [])
 
-        concurrent_downloads(dependencies, base_repos, ppa_repos, app_name)
+        # -- Curated apps only consume a lockfile shipped by the apps repository; never write one there.
+
+        concurrent_downloads(
+            dependencies,
+            base_repos,
+            ppa_repos,
+            app_name,
+            lock_path=get_lockfile_path(yaml_dir),
+            link_trees=not config.get("apprunconf", {}).get("prebuild-commands"),
+            path_filter=build_path_filter(config["buildinfo"])
+        )
 
         print_blank()
         print_info("Building AppBox...", prefix="🛠")
@@ -609,15 +619,6 @@ def downgrade(app_names):
     print_blank()
 
 
-def format_size(size_bytes):
-    """Format a size in bytes to a human-readable string."""
-    for unit in ["B", "KiB", "MiB", "GiB", "TiB"]:
-        if size_bytes < 1024:
-            return f"{size_bytes:.2f} {unit}"
-        size_bytes /= 1024
-    return f"{size_bytes:.2f} PiB"
-
-
 def show():
     """Show installed AppBoxes."""
     print_header("📦 Installed AppBoxes")
@@ -0,0 +1,205 @@
+#!/usr/bin/env python3
+# SPDX-License-Identifier: BSD-3-Clause
+# Copyright <2026> <Uri Herrera <uri_herrera@nxos.org>>
+
+import hashlib
+import json
+import os
+import stat
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from pathlib import Path
+
+# <---
+# --->
+# -- File manifests: which package every file in an AppDir came from.
+# -- Each extracted package gets a manifest of its files; the AppDir manifest merges them and
+# -- records the package that owns every path, plus the packages it shadowed. The bundle manifest
+# -- describes the AppDir as it is packaged, after the build steps that rewrite or add files.
+
+cache_dir = Path.home() / ".cache/nx-apphub-cli"
+
+manifest_format = 1
+
+
+def get_manifest_dir(app_name):
+    """Return the directory holding the per-package manifests of an app being built."""
+    return cache_dir / app_name / "manifests"
+
+
+def get_appdir_manifest_path(app_name):
+    """Return the merged AppDir manifest of an app being built."""
+    return cache_dir / app_name / "manifest.json"
+
+
+def _file_record(rel_path, kind, size, mode, digest):
+    record = {"path": rel_path, "kind": kind, "size": size, "mode": f"{mode:04o}"}
+    if kind == "file":
+        record["sha256"] = digest
+    elif kind == "symlink":
+        record["target"] = digest
+    return record
+
+
+def build_package_manifest(package, entry, entries):
+    """Return the manifest of one package: its plan entry and every file, symlink and hardlink it ships."""
+    entry = entry or {}
+    files = [_file_record(*item) for item in entries if item[1] != "dir"]
+
+    return {
+        "format": manifest_format,
+        "package": package,
+        "version": entry.get("version"),
+        "sha256": entry.get("sha256"),
+        "size": sum(record["size"] for record in files),
+        "files": files,
+    }
+
+
+def build_appdir_manifest(app_name, package_manifests, owners, claims):
+    """
+    Merge package manifests into the AppDir manifest.
+
+    owners maps each path to the package whose copy was kept and claims maps it to every
+    package that shipped it; both come from the extraction's PathOwnership.
+    """
+    files = []
+
+    for package, manifest in sorted(package_manifests.items()):
+        for record in manifest["files"]:
+            owner = owners.get(record["path"], package)
+            if owner != package:
+                continue
+
+            record = dict(record, package=package)
+            shadowed = sorted(p for p in claims.get(record["path"], ()) if p != package)
+            if shadowed:
+                record["shadows"] = shadowed
+            files.append(record)
+
+    files.sort(key=lambda record: record["path"])
+
+    return {
+        "format": manifest_format,
+        "name": app_name,
+        "packages": [
+            {
+                "package": package,
+                "version": manifest["version"],
+                "sha256": manifest["sha256"],
+                "files": len(manifest["files"]),
+                "size": manifest["size"],
+            }
+            for package, manifest in sorted(package_manifests.items())
+        ],
+        "size": sum(record["size"] for record in files),
+        "files": files,
+    }
+
+
+def hash_file(path):
+    """Return the SHA256 of a file's content."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(partial(f.read, 1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def scan_tree(root):
+    """
+    Return a record for every directory, file and symlink under root, sorted by path.
+
+    Records have the shape of manifest file records; directories carry neither a sha256 nor a
+    target. Symlinks are recorded, never followed, and other file types are skipped. File
+    contents are hashed in parallel. A build scans its AppDir once, for both the artifact key
+    and the bundle manifest.
+    """
+    root = Path(root)
+    records = []
+    files = []
+
+    for dirpath, dirs, names in os.walk(root):
+        dirs.sort()
+        for name in dirs + sorted(names):
+            path = Path(dirpath) / name
+            st = path.lstat()
+            rel_path = path.relative_to(root).as_posix()
+            mode = stat.S_IMODE(st.st_mode)
+
+            if stat.S_ISLNK(st.st_mode):
+                records.append(_file_record(rel_path, "symlink", 0, mode, os.readlink(path)))
+            elif stat.S_ISDIR(st.st_mode):
+                records.append(_file_record(rel_path, "dir", 0, mode, None))
+            elif stat.S_ISREG(st.st_mode):
+                records.append(_file_record(rel_path, "file", st.st_size, mode, None))
+                files.append((len(records) - 1, path))
+
+    with ThreadPoolExecutor(max_workers=min(32, (os.cpu_count() or 1) + 4)) as pool:
+        for (index, _), digest in zip(files, pool.map(hash_file, [path for _, path in files])):
+            records[index]["sha256"] = digest
+
+    records.sort(key=lambda record: record["path"])
+    return records
+
+
+def build_bundle_manifest(app_name, tree, appdir_manifest=None):
+    """
+    Return the manifest of an AppDir as it is packaged, from its scan_tree records.
+
+    The records are taken from the AppDir itself, so files rewritten (RPATHs) or added
+    (AppRun, runtime caches) after extraction are described as shipped. Paths recorded in the
+    AppDir manifest keep their package and the packages they shadowed, and are marked modified
+    when their content changed since extraction; paths added by the build have no package.
+    """
+    extracted = {record["path"]: record for record in (appdir_manifest or {}).get("files", [])}
+    records = [dict(record) for record in tree if record["kind"] != "dir"]
+
+    for record in records:
+        source = extracted.get(record["path"])
+        record["package"] = source["package"] if source else None
+        if source and source.get("shadows"):
+            record["shadows"] = source["shadows"]
+        if source and record["kind"] == "file" and source.get("sha256") not in (None, record["sha256"]):
+            record["modified"] = True
+
+    return {
+        "format": manifest_format,
+        "name": app_name,
+        "packages": (appdir_manifest or {}).get("packages", []),
+        "size": sum(record["size"] for record in records),
+        "files": records,
+    }
+
+
+def write_manifest(path, manifest):
+    """Write a manifest as JSON, replacing any previous one atomically."""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=1)
+        f.write("\n")
+
+    os.replace(tmp_path, path)
+    return path
+
+
+def load_manifest(path):
+    """Load a manifest, or return None if it is missing or not a manifest this version understands."""
+    try:
+        with open(path, encoding="utf-8") as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return None
+
+    if not isinstance(manifest, dict) or manifest.get("format") != manifest_format:
+        return None
+
+    return manifest
+
+
+def file_owners(manifest):
+    """Return {path: package} for every file recorded in an AppDir manifest."""
+    return {record["path"]: record["package"] for record in manifest.get("files", [])}
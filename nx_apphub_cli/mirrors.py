@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+# SPDX-License-Identifier: BSD-3-Clause
+# Copyright <2026> <Uri Herrera <uri_herrera@nxos.org>>
+
+import atexit
+import random
+import time
+from pathlib import Path
+from threading import Lock
+from urllib.parse import urlparse
+
+from .console import print_header, print_info, print_message, print_warning, print_blank
+from .utils import read_json_file, write_json_file, format_size
+
+# <---
+# --->
+# -- Persistent mirror scoreboard.
+
+cache_dir = Path.home() / ".cache/nx-apphub-cli"
+scoreboard_path = cache_dir / "mirrors.json"
+
+ewma_alpha = 0.3
+
+# -- Transfers smaller than this say more about latency than throughput.
+
+min_throughput_sample = 256 * 1024
+
+# -- Assumed values for hosts without samples, and the package size used to turn them into a score.
+
+default_latency = 0.5
+default_throughput = 2 * 1024 * 1024
+nominal_transfer = 4 * 1024 * 1024
+
+backoff_base_seconds = 30
+backoff_max_seconds = 3600
+backoff_penalty = 1e6
+
+scoreboard_lock = Lock()
+scoreboard = None
+scoreboard_dirty = False
+
+
+def get_host(url):
+    """Return the host a mirror URL points to."""
+    return urlparse(url).netloc or url
+
+
+def _load_scoreboard():
+    """Load the scoreboard from disk once per process. Caller must hold scoreboard_lock."""
+    global scoreboard
+    if scoreboard is None:
+        data = read_json_file(scoreboard_path, default={})
+        scoreboard = data if isinstance(data, dict) else {}
+        atexit.register(save_scoreboard)
+    return scoreboard
+
+
+def save_scoreboard():
+    """Persist the scoreboard if it changed during this run."""
+    global scoreboard_dirty
+    with scoreboard_lock:
+        if scoreboard is None or not scoreboard_dirty:
+            return
+        try:
+            write_json_file(scoreboard_path, scoreboard)
+            scoreboard_dirty = False
+        except OSError:
+            pass
+
+
+def _ewma(previous, sample):
+    return sample if previous is None else (1 - ewma_alpha) * previous + ewma_alpha * sample
+
+
+def _get_entry(host):
+    """Return the mutable scoreboard entry for a host. Caller must hold scoreboard_lock."""
+    board = _load_scoreboard()
+    return board.setdefault(host, {
+        "latency": None,
+        "throughput": None,
+        "errors": 0.0,
+        "successes": 0,
+        "failures": 0,
+        "consecutive_failures": 0,
+        "backoff_until": 0,
+        "last_status": None,
+    })
+
+
+def record_success(url, latency=None, size=0, elapsed=None):
+    """Record a successful request: time to response headers and, for large bodies, throughput."""
+    global scoreboard_dirty
+    with scoreboard_lock:
+        entry = _get_entry(get_host(url))
+
+        if latency is not None:
+            entry["latency"] = _ewma(entry["latency"], latency)
+        if elapsed and size >= min_throughput_sample:
+            entry["throughput"] = _ewma(entry["throughput"], size / elapsed)
+
+        entry["errors"] = _ewma(entry["errors"], 0.0)
+        entry["successes"] += 1
+        entry["consecutive_failures"] = 0
+        entry["backoff_until"] = 0
+        entry["last_status"] = "ok"
+        scoreboard_dirty = True
+
+
+def record_failure(url, status=None):
+    """
+    Record a failed request.
+
+    Rate limiting (429) and server errors (5xx) also put the host into exponential backoff.
+    """
+    global scoreboard_dirty
+    with scoreboard_lock:
+        entry = _get_entry(get_host(url))
+
+        entry["errors"] = _ewma(entry["errors"], 1.0)
+        entry["failures"] += 1
+        entry["consecutive_failures"] += 1
+        entry["last_status"] = str(status) if status is not None else "error"
+
+        if status == 429 or (isinstance(status, int) and status >= 500):
+            delay = min(backoff_base_seconds * 2 ** (entry["consecutive_failures"] - 1), backoff_max_seconds)
+            entry["backoff_until"] = time.time() + delay
+
+        scoreboard_dirty = True
+
+
+def _score_entry(entry, now):
+    """Estimate the seconds a nominal package transfer would take from a host; lower is better."""
+    latency = entry.get("latency") or default_latency
+    throughput = entry.get("throughput") or default_throughput
+    score = (latency + nominal_transfer / throughput) * (1 + 4 * entry.get("errors", 0.0))
+
+    if entry.get("backoff_until", 0) > now:
+        score += backoff_penalty
+
+    return score
+
+
+def get_mirror_score(url):
+    """Return the current score of the host behind a URL."""
+    with scoreboard_lock:
+        entry = _load_scoreboard().get(get_host(url))
+    return _score_entry(entry or {}, time.time())
+
+
+def rank_urls(items, key=lambda item: item):
+    """
+    Order items by the score of the mirror each one points to, best first.
+
+    Hosts without samples share the default score; a random tie-break keeps load spread across them.
+    """
+    now = time.time()
+    with scoreboard_lock:
+        board = _load_scoreboard()
+        scored = [
+            (_score_entry(board.get(get_host(key(item))) or {}, now), random.random(), index)
+            for index, item in enumerate(items)
+        ]
+    return [items[index] for _, _, index in sorted(scored)]
+
+
+def show_mirrors():
+    """Print the current mirror scoreboard, best host first."""
+    print_header("🌐 Mirror scores")
+
+    with scoreboard_lock:
+        board = dict(_load_scoreboard())
+
+    if not board:
+        print_warning("No mirror statistics recorded yet.", prefix="⚠️")
+        print_blank()
+        return
+
+    now = time.time()
+
+    for host, entry in sorted(board.items(), key=lambda item: _score_entry(item[1], now)):
+        latency = f"{entry['latency'] * 1000:.0f} ms" if entry.get("latency") is not None else "n/a"
+        throughput = f"{format_size(entry['throughput'])}/s" if entry.get("throughput") else "n/a"
+        backoff = entry.get("backoff_until", 0) - now
+        state = f"⏳ backoff {int(backoff)}s" if backoff > 0 else "✅"
+
+        print_message(
+            f"    {state} {host} — score: {_score_entry(entry, now):.2f}, "
+            f"latency: {latency}, throughput: {throughput}, "
+            f"errors: {entry.get('errors', 0.0) * 100:.0f}% "
+            f"({entry.get('successes', 0)} ok / {entry.get('failures', 0)} failed)"
+        )
+
+    print_blank()
+    print_info(f"Scoreboard: {scoreboard_path}", prefix="📁")
+    print_blank()
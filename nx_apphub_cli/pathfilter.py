@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+# SPDX-License-Identifier: BSD-3-Clause
+# Copyright <2026> <Uri Herrera <uri_herrera@nxos.org>>
+
+import re
+from threading import Lock
+
+# <---
+# --->
+# -- Paths that are never written into an AppDir.
+# -- Patterns are relative to the AppDir: "*" and "?" stay within one path component, "**" spans
+# -- any number of them, and a pattern without "/" matches the file name in any directory.
+
+default_exclude_paths = [
+    "usr/share/doc/**",
+    "usr/share/man/**",
+    "usr/share/info/**",
+    "usr/share/lintian/**",
+    "usr/include/**",
+    "*.a",
+    "*.la",
+    "*.pc",
+]
+
+# -- Copyright files are kept so every bundle still carries the licenses of what it ships.
+
+default_keep_paths = [
+    "usr/share/doc/*/copyright",
+]
+
+locale_root = "usr/share/locale/"
+
+
+def glob_to_regex(pattern):
+    """Compile an AppDir path pattern into a regular expression matching whole relative paths."""
+    pattern = pattern.strip().strip("/")
+    anywhere = "/" not in pattern
+    parts = []
+    index = 0
+
+    while index < len(pattern):
+        if pattern.startswith("**/", index):
+            parts.append("(?:.*/)?")
+            index += 3
+        elif pattern.startswith("**", index):
+            parts.append(".*")
+            index += 2
+        elif pattern[index] == "*":
+            parts.append("[^/]*")
+            index += 1
+        elif pattern[index] == "?":
+            parts.append("[^/]")
+            index += 1
+        else:
+            parts.append(re.escape(pattern[index]))
+            index += 1
+
+    return re.compile(("(?:.*/)?" if anywhere else "") + "".join(parts) + r"\Z")
+
+
+def is_valid_pattern(pattern):
+    """Return True for a non-empty pattern that stays inside the AppDir."""
+    if not isinstance(pattern, str) or not pattern.strip():
+        return False
+    return ".." not in pattern.strip().strip("/").split("/")
+
+
+class PathFilter:
+    """
+    Decide which package paths are skipped at extraction time.
+
+    A path is skipped when it matches an exclude pattern and no keep pattern, or when it is
+    inside usr/share/locale/ under a locale that is not kept. Skipped files and bytes are counted.
+    """
+
+    def __init__(self, exclude_paths=(), keep_paths=(), keep_locales=None):
+        self.excludes = [glob_to_regex(p) for p in exclude_paths]
+        self.keeps = [glob_to_regex(p) for p in keep_paths]
+        self.keep_locales = None if keep_locales is None else set(keep_locales)
+        self.lock = Lock()
+        self.skipped_files = 0
+        self.skipped_bytes = 0
+
+    def _locale_kept(self, rel_path):
+        if self.keep_locales is None or not rel_path.startswith(locale_root):
+            return True
+
+        name, _, rest = rel_path[len(locale_root):].partition("/")
+        if not rest:
+            return True
+
+        # -- "de" keeps de, de_DE and de@euro; "pt_BR" keeps only pt_BR and its variants.
+
+        language = re.split(r"[@.]", name, maxsplit=1)[0]
+        return any(language == locale or language.split("_")[0] == locale for locale in self.keep_locales)
+
+    def excludes_path(self, rel_path):
+        """Return True if a path must not be written into the AppDir."""
+        if any(keep.match(rel_path) for keep in self.keeps):
+            return False
+        if any(exclude.match(rel_path) for exclude in self.excludes):
+            return True
+        return not self._locale_kept(rel_path)
+
+    def skip(self, size=0):
+        """Count a skipped file."""
+        with self.lock:
+            self.skipped_files += 1
+            self.skipped_bytes += size
+
+
+def _as_list(value):
+    if not value:
+        return []
+    return [value] if isinstance(value, str) else list(value)
+
+
+def build_path_filter(buildinfo):
+    """Return the PathFilter for a buildinfo section, defaults included."""
+    buildinfo = buildinfo or {}
+    keep_locales = buildinfo.get("keep-locales", "all")
+
+    return PathFilter(
+        exclude_paths=default_exclude_paths + _as_list(buildinfo.get("exclude-paths")),
+        keep_paths=default_keep_paths + _as_list(buildinfo.get("keep-paths")),
+        keep_locales=None if keep_locales == "all" else _as_list(keep_locales)
+    )
@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+# SPDX-License-Identifier: BSD-3-Clause
+# Copyright <2026> <Uri Herrera <uri_herrera@nxos.org>>
+
+from .exceptions import ConfigError
+from .utils import parse_size
+
+# <---
+# --->
+# -- Build profiles: the compression settings each runtime packages the AppDir with.
+# -- "release" keeps the settings bundles have always been built with, "dev" trades size for
+# -- packaging speed, and "custom" takes buildinfo.packaging from the YAML.
+
+default_profile = "release"
+
+build_profiles = {
+    "release": {
+        "classic": {},
+        "go": {},
+        "uruntime": {"compression": "zstd", "level": 22, "block-size": "4M", "lookback": 6},
+    },
+    "dev": {
+        "classic": {"compression": "zstd", "level": 1},
+        "go": {},
+        "uruntime": {"compression": "zstd", "level": 1, "block-size": "1M", "lookback": 1},
+    },
+}
+
+allowed_profiles = {"release", "dev", "custom"}
+
+# -- Compressions each packaging tool accepts, with the range of levels it takes (None: no level).
+# -- mksquashfs only has -Xcompression-level for gzip and zstd; mkdwarfs has no gzip, and plain lz4 takes no level.
+
+runtime_compressions = {
+    "classic": {"gzip": (1, 9), "xz": None, "zstd": (1, 22), "lz4": None},
+    "uruntime": {"zstd": (1, 22), "xz": (0, 9), "lz4": None, "lz4hc": (1, 12)},
+}
+
+# -- mkdwarfs names some compressions differently.
+
+mkdwarfs_compressions = {"xz": "lzma"}
+
+allowed_compressions = set().union(*runtime_compressions.values())
+
+packaging_keys = {"compression", "level", "block-size", "workers", "lookback"}
+
+
+def get_profile_name(config):
+    """Return the build profile of a config."""
+    return config.get("buildinfo", {}).get("profile", default_profile)
+
+
+def get_packaging_settings(config, runtime):
+    """Return the packaging settings of the config's build profile for a runtime."""
+    profile = get_profile_name(config)
+
+    if profile == "custom":
+        return dict(config.get("buildinfo", {}).get("packaging", {}))
+
+    return dict(build_profiles[profile][runtime])
+
+
+def _block_size_bits(value):
+    size = parse_size(value)
+    if size <= 0 or size & (size - 1):
+        raise ConfigError(f"Invalid block size: '{value}'. It must be a power of two (e.g. 1M).")
+    return size.bit_length() - 1
+
+
+def get_packaging_flags(config, runtime):
+    """
+    Return the command-line flags that apply a config's build profile to a runtime's packaging tool.
+
+    classic passes them to mksquashfs through appimagetool, uruntime to mkdwarfs. go-appimagetool
+    has no compression settings, so it always packages with its own defaults.
+    """
+    settings = get_packaging_settings(config, runtime)
+    flags = []
+
+    if runtime == "classic":
+        if "compression" in settings:
+            flags += ["--comp", settings["compression"]]
+        if "level" in settings and runtime_compressions[runtime].get(settings.get("compression")):
+            flags += ["--mksquashfs-opt", "-Xcompression-level", "--mksquashfs-opt", str(settings["level"])]
+        if "block-size" in settings:
+            flags += ["--mksquashfs-opt", "-b", "--mksquashfs-opt", str(parse_size(settings["block-size"]))]
+        if "workers" in settings:
+            flags += ["--mksquashfs-opt", "-processors", "--mksquashfs-opt", str(settings["workers"])]
+
+    elif runtime == "uruntime":
+        if "compression" in settings:
+            compression = mkdwarfs_compressions.get(settings["compression"], settings["compression"])
+            if "level" in settings and runtime_compressions[runtime].get(settings["compression"]):
+                compression += f":level={settings['level']}"
+            flags += ["--compression", compression]
+        if "block-size" in settings:
+            flags.append(f"-S{_block_size_bits(settings['block-size'])}")
+        if "lookback" in settings:
+            flags.append(f"-B{settings['lookback']}")
+        if "workers" in settings:
+            flags += ["-N", str(settings["workers"])]
+
+    return flags
+
+
+def validate_build_profile(buildinfo):
+    """Validate buildinfo.profile and, for the custom profile, buildinfo.packaging against the runtime's tool."""
+    profile = buildinfo.get("profile", default_profile)
+
+    if profile not in allowed_profiles:
+        raise ConfigError(f"'buildinfo.profile' must be one of: {', '.join(sorted(allowed_profiles))}.")
+
+    packaging = buildinfo.get("packaging")
+
+    if profile != "custom":
+        return
+
+    if not isinstance(packaging, dict) or not packaging:
+        raise ConfigError("'buildinfo.packaging' must be a mapping of packaging settings when 'buildinfo.profile' is 'custom'.")
+
+    unknown = set(packaging) - packaging_keys
+    if unknown:
+        raise ConfigError(
+            f"Unknown keys in 'buildinfo.packaging': {', '.join(sorted(unknown))}. "
+            f"Allowed: {', '.join(sorted(packaging_keys))}."
+        )
+
+    runtime = buildinfo.get("runtime", "classic")
+    compressions = runtime_compressions.get(runtime, {name: None for name in allowed_compressions})
+
+    if "compression" in packaging and packaging["compression"] not in compressions:
+        raise ConfigError(
+            f"'buildinfo.packaging.compression' must be one of: {', '.join(sorted(compressions))} "
+            f"for the '{runtime}' runtime."
+        )
+
+    for key in ("level", "workers", "lookback"):
+        if key in packaging and (not isinstance(packaging[key], int) or isinstance(packaging[key], bool) or packaging[key] < 0):
+            raise ConfigError(f"'buildinfo.packaging.{key}' must be a non-negative integer.")
+
+    if "level" in packaging:
+        if "compression" not in packaging:
+            raise ConfigError("'buildinfo.packaging.level' requires 'buildinfo.packaging.compression'.")
+
+        levels = compressions[packaging["compression"]]
+        if runtime in runtime_compressions and levels is None:
+            raise ConfigError(
+                f"'buildinfo.packaging.level' is not supported with '{packaging['compression']}' "
+                f"for the '{runtime}' runtime."
+            )
+        if levels and not levels[0] <= packaging["level"] <= levels[1]:
+            raise ConfigError(
+                f"'buildinfo.packaging.level' must be between {levels[0]} and {levels[1]} "
+                f"for '{packaging['compression']}'."
+            )
+
+    if "block-size" in packaging:
+        _block_size_bits(packaging["block-size"])
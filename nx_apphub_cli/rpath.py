@@ -0,0 +1,303 @@
+#!/usr/bin/env python3
+# SPDX-License-Identifier: BSD-3-Clause
+# Copyright <2026> <Uri Herrera <uri_herrera@nxos.org>>
+
+import os
+import subprocess
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from elftools.common.exceptions import ELFError
+from elftools.elf.elffile import ELFFile
+
+from .appdir_lint import _read_dynamic_elf, is_elf
+from .config import get_apprunconf_value
+from .console import print_blank, print_info, print_success, print_warning
+from .exceptions import BuildError
+from .governor import get_cpu_count
+from .sonames import build_soname_farm, farm_dir
+from .treecache import unshare_file
+from .utils import get_architecture
+
+# <---
+# --->
+# -- RPATH of every dynamically linked ELF in the AppDir.
+# -- Each executable and library gets the AppDir library directories as $ORIGIN-relative DT_RPATH
+# -- entries, computed from its own location, so it finds its libraries without LD_LIBRARY_PATH.
+# -- With the minimal RPATH, each shared object only keeps the directories its DT_NEEDED libraries
+# -- resolve from, so the loader stops probing directories that do not exist or hold none of them.
+
+arch_map = {
+    "x86_64": "x86_64-linux-gnu",
+    "aarch64": "aarch64-linux-gnu",
+    "arm64": "aarch64-linux-gnu",
+}
+
+
+def get_library_dirs(config):
+    """Return the AppDir-relative library directories every ELF searches, in priority order."""
+    setlibpath = get_apprunconf_value(config, "setlibpath", default="/usr/lib", expected_type=str).strip("/")
+
+    arch = get_architecture()
+    multiarch_triplet = arch_map.get(arch)
+
+    if not multiarch_triplet:
+        raise BuildError(f"Unsupported architecture detected: {arch}. Aborting.")
+
+    return [Path(directory) for directory in [
+
+        # -- Prefer AppDir/usr first.
+
+        setlibpath,
+        f"{setlibpath}/{multiarch_triplet}",
+        f"{setlibpath}64",
+
+        # -- Qt-specific plugin locations under /usr.
+
+        f"{setlibpath}/{multiarch_triplet}/qt5/qml",
+        f"{setlibpath}/{multiarch_triplet}/qt6/qml",
+        f"{setlibpath}/{multiarch_triplet}/qt5/plugins",
+        f"{setlibpath}/{multiarch_triplet}/qt6/plugins",
+        f"{setlibpath}/qt5/libexec",
+        f"{setlibpath}/qt5/bin",
+        f"{setlibpath}/qt6/libexec",
+        f"{setlibpath}/qt6/bin",
+
+        # -- /lib multiarch.
+
+        f"lib/{multiarch_triplet}",
+        f"lib64/{multiarch_triplet}",
+
+        # -- /lib non-multiarch.
+
+        "lib",
+        "lib64",
+    ]]
+
+
+def get_extra_rpaths(config, app_dir, main_binary):
+    """
+    Return apprunconf.extra-rpaths as AppDir-relative directories where possible.
+
+    Extra entries are written relative to the main binary; $ORIGIN entries that stay inside the
+    AppDir become Paths rebased for every ELF, anything else is kept as a verbatim string.
+    """
+    extras = config.get("apprunconf", {}).get("extra-rpaths", [])
+    if isinstance(extras, str):
+        extras = [extras]
+    extras = [p for p in extras if isinstance(p, str) and p.strip()]
+
+    app_dir = Path(app_dir)
+    origin = Path(main_binary).parent
+    resolved = []
+
+    for entry in extras:
+        for token in ("${ORIGIN}", "$ORIGIN"):
+            if entry.startswith(token):
+                target = Path(os.path.normpath(str(origin) + entry[len(token):]))
+                if target == app_dir or app_dir in target.parents:
+                    entry = Path(os.path.relpath(target, app_dir))
+                break
+        resolved.append(entry)
+
+    return resolved
+
+
+def compute_rpath(elf_path, app_dir, library_dirs):
+    """Return the DT_RPATH of an ELF: every AppDir library directory relative to $ORIGIN, without duplicates."""
+    origin = Path(elf_path).parent
+    ordered = []
+
+    for directory in library_dirs:
+        if isinstance(directory, Path):
+            relative = os.path.relpath(Path(app_dir) / directory, origin)
+            directory = "$ORIGIN" if relative == "." else f"$ORIGIN/{relative}"
+        if directory not in ordered:
+            ordered.append(directory)
+
+    return ":".join(ordered)
+
+
+def list_library_dirs(app_dir, library_dirs):
+    """Return {directory: file names} for the AppDir library directories that exist."""
+    contents = {}
+    for directory in library_dirs:
+        if isinstance(directory, Path) and directory not in contents:
+            try:
+                contents[directory] = set(os.listdir(Path(app_dir) / directory))
+            except OSError:
+                continue
+    return contents
+
+
+def minimal_library_dirs(needed, library_dirs, contents, keep=()):
+    """
+    Return the smallest ordered subset of library_dirs that resolves the same DT_NEEDED libraries.
+
+    A directory is kept when it is the first one holding one of the needed sonames, so every
+    library still loads from where it did. Directories in keep are kept if they exist; for
+    executables, whose RPATH the loader also searches for libraries opened with dlopen. Entries
+    outside the AppDir cannot be resolved here and are always kept.
+    """
+    chosen = set()
+    for soname in needed:
+        for directory in library_dirs:
+            if isinstance(directory, Path) and soname in contents.get(directory, ()):
+                chosen.add(directory)
+                break
+
+    return [
+        directory for directory in library_dirs
+        if not isinstance(directory, Path) or directory in chosen or (directory in keep and directory in contents)
+    ]
+
+
+def count_probes(needed, library_dirs, contents):
+    """Return how many RPATH directories the loader tries to find every needed soname."""
+    probes = 0
+    for soname in needed:
+        for directory in library_dirs:
+            probes += 1
+            if isinstance(directory, Path) and soname in contents.get(directory, ()):
+                break
+    return probes
+
+
+def has_interpreter(path):
+    """Return True if an ELF has a PT_INTERP segment, i.e. it is an executable rather than a library."""
+    with open(path, "rb") as f:
+        return any(segment["p_type"] == "PT_INTERP" for segment in ELFFile(f).iter_segments())
+
+
+def find_dynamic_elfs(app_dir):
+    """Yield (path, needed, rpath, runpath, executable) for every regular, dynamically linked ELF in the AppDir."""
+    for root, _, files in os.walk(app_dir):
+        for name in files:
+            path = Path(root) / name
+            if path.is_symlink() or not path.is_file() or not is_elf(path):
+                continue
+            try:
+                needed, rpath, runpath = _read_dynamic_elf(path)
+                executable = has_interpreter(path)
+            except (ELFError, OSError, ValueError):
+                continue
+
+            # -- Nothing to resolve (static binaries, the dynamic loader, objects without .dynamic).
+
+            if not needed:
+                continue
+
+            yield path, needed, rpath, runpath, executable
+
+
+def _set_rpath(job):
+    """Worker: write an ELF's DT_RPATH with patchelf unless it is already set. Returns (path, status, error)."""
+    path, rpath_value, current_rpath, current_runpath = job
+
+    if current_rpath == rpath_value and not current_runpath:
+        return path, "current", None
+
+    try:
+        unshare_file(path)
+        subprocess.run(
+            ["patchelf", "--set-rpath", rpath_value, "--force-rpath", str(path)],
+            check=True,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.PIPE,
+            text=True
+        )
+    except subprocess.CalledProcessError as e:
+        return path, "failed", (e.stderr or str(e)).strip()
+    except OSError as e:
+        return path, "failed", str(e)
+
+    return path, "patched", None
+
+
+def patch_appdir_rpaths(app_dir, config, main_binary):
+    """
+    Patch the RPATH of every dynamically linked ELF in the AppDir in a process pool.
+
+    With apprunconf.soname-farm, the soname farm is built first and searched before every other
+    directory. Unless apprunconf.minimal-rpath is false, the RPATH of each shared object is reduced
+    to the directories its DT_NEEDED libraries resolve from, executables keep every existing one,
+    and the loader lookups saved are reported. ELFs already carrying the right RPATH are left
+    untouched. A failure on the main binary fails the build; other failures are reported.
+    Returns the ELFs that could not be patched.
+    """
+    app_dir = Path(app_dir)
+    main_binary = Path(main_binary)
+    minimal = get_apprunconf_value(config, "minimal-rpath", default=True, expected_type=bool)
+    soname_farm = get_apprunconf_value(config, "soname-farm", default=False, expected_type=bool)
+
+    library_dirs = []
+    for directory in get_library_dirs(config) + get_extra_rpaths(config, app_dir, main_binary):
+        if directory not in library_dirs:
+            library_dirs.append(directory)
+
+    # -- Executables keep every existing directory for dlopen, or only the farm, which links them all.
+    # -- Only shared objects are reduced: with no LD_LIBRARY_PATH, an executable's RPATH is all that
+    # -- helpers (libexec tools, QtWebEngineProcess, the real binary behind a wrapper) dlopen from.
+
+    search_dirs = library_dirs
+    executable_keep = set(library_dirs)
+    farm_members = set()
+
+    if soname_farm:
+        farm_members = build_soname_farm(app_dir, library_dirs)
+        search_dirs = [farm_dir] + library_dirs
+        executable_keep = {farm_dir}
+
+    contents = list_library_dirs(app_dir, search_dirs)
+    probes_before = 0
+    probes_after = 0
+
+    jobs = []
+    for path, needed, rpath, runpath, executable in find_dynamic_elfs(app_dir):
+        elf_dirs = search_dirs
+        if minimal:
+            keep = executable_keep if executable or path == main_binary else ()
+            elf_dirs = minimal_library_dirs(needed, search_dirs, contents, keep=keep)
+            probes_before += count_probes(needed, library_dirs, contents)
+            probes_after += count_probes(needed, elf_dirs, contents)
+        rpath_value = compute_rpath(path, app_dir, elf_dirs)
+
+        # -- A library loaded through the farm gets the farm as $ORIGIN, so it looks there first.
+
+        if path.relative_to(app_dir) in farm_members and not rpath_value.startswith("$ORIGIN:"):
+            rpath_value = f"$ORIGIN:{rpath_value}" if rpath_value else "$ORIGIN"
+
+        jobs.append((path, rpath_value, rpath, runpath))
+
+    counts = {"patched": 0, "current": 0, "failed": 0}
+    failed = []
+
+    with ProcessPoolExecutor(max_workers=get_cpu_count()) as pool:
+        for path, status, error in pool.map(_set_rpath, jobs, chunksize=8):
+            counts[status] += 1
+            if status != "failed":
+                continue
+            if path == main_binary:
+                raise BuildError(f"Failed to patch RPATH for {path}: {error}")
+            failed.append((path, error))
+
+    print_success(
+        f"Patched RPATH for {counts['patched']} ELF files ({counts['current']} already correct).",
+        prefix="🩹"
+    )
+
+    if probes_before:
+        print_info(
+            f"Minimal RPATH removed {probes_before - probes_after} of {probes_before} library directory lookups "
+            f"({len(jobs)} ELF files).",
+            prefix="⚡"
+        )
+
+    if failed:
+        print_blank()
+        print_warning(f"Warning: Could not patch the RPATH of {len(failed)} ELF files:")
+        for path, error in failed:
+            print_info(f"{path.relative_to(app_dir)}: {error}", prefix="  •")
+        print_info("AppRun will export the bundled LD_LIBRARY_PATH so they can still load their libraries.", prefix="💡")
+
+    return [path for path, _ in failed]
@@ -0,0 +1,265 @@
+#!/usr/bin/env python3
+# SPDX-License-Identifier: BSD-3-Clause
+# Copyright <2026> <Uri Herrera <uri_herrera@nxos.org>>
+
+import hashlib
+import os
+import re
+import shutil
+import subprocess
+import tempfile
+from collections import namedtuple
+from pathlib import Path
+
+from .console import print_blank, print_info, print_success, print_warning
+from .exceptions import ToolNotFoundError
+from .rpath import arch_map, get_library_dirs
+from .treecache import unshare_file
+from .utils import get_architecture
+
+# <---
+# --->
+# -- Runtime caches generated at build time, so bundled GLib/GTK apps neither rebuild them on
+# -- first launch nor fall back to scanning module and schema directories on every launch.
+# -- Each cache is only generated when its subsystem is present in the AppDir, with the tool the
+# -- AppDir bundles or, failing that, the host's. Caches are written with paths that survive the
+# -- AppDir being mounted anywhere; AppRun exports the variables that point at them.
+
+pixbuf_loaders_template = "loaders.cache.in"
+
+# -- Placeholder for the mount point in caches that can only hold absolute paths; AppRun renders it.
+
+appdir_placeholder = "@APPDIR@"
+
+font_exts = {".ttf", ".otf", ".ttc", ".pfb", ".pcf", ".woff", ".woff2", ".gz"}
+
+fontconfig_file = Path("etc/fonts/nx-apphub.conf")
+fontconfig_cache_dir = Path("var/cache/fontconfig")
+
+# -- Fonts are cached as if they lived here, wherever the AppDir is mounted.
+
+fontconfig_remap_path = "/nx-apphub/fonts"
+
+# -- What every cache generator gets: the AppDir, a file-name-safe app name, the multiarch triplet
+# -- and the environment its tools run in.
+
+CacheContext = namedtuple("CacheContext", ["app_dir", "app_id", "triplet", "env"])
+
+
+def _find_tool(app_dir, bundled, *names):
+    """Return the command for a cache tool: the AppDir's copy, else the host's. Raises ToolNotFoundError."""
+    for rel_path in bundled:
+        path = Path(app_dir) / rel_path
+        if path.is_file() and os.access(path, os.X_OK):
+            return str(path)
+    for name in names:
+        path = shutil.which(name)
+        if path:
+            return path
+    raise ToolNotFoundError(names[0])
+
+
+def _tool_env(app_dir, config):
+    """Environment for running tools that load AppDir libraries or modules."""
+    env = os.environ.copy()
+    libs = [str(Path(app_dir) / d) for d in get_library_dirs(config) if (Path(app_dir) / d).is_dir()]
+    env["LD_LIBRARY_PATH"] = ":".join(libs + [p for p in env.get("LD_LIBRARY_PATH", "").split(":") if p])
+    return env
+
+
+def _run(command, env=None):
+    return subprocess.run(command, check=True, env=env, capture_output=True, text=True)
+
+
+def compile_gsettings_schemas(context):
+    """Compile usr/share/glib-2.0/schemas into gschemas.compiled. Returns the AppRun exports."""
+    app_dir, _, triplet, env = context
+    schemas_dir = app_dir / "usr/share/glib-2.0/schemas"
+    if not any(schemas_dir.glob("*.gschema.xml")):
+        return None
+
+    tool = _find_tool(app_dir, [
+        f"usr/lib/{triplet}/glib-2.0/glib-compile-schemas", "usr/bin/glib-compile-schemas",
+    ], "glib-compile-schemas")
+
+    unshare_file(schemas_dir / "gschemas.compiled")
+    _run([tool, str(schemas_dir)], env)
+    return ['export GSETTINGS_SCHEMA_DIR="$APPDIR/usr/share/glib-2.0/schemas"']
+
+
+def query_gio_modules(context):
+    """Write giomodule.cache for usr/lib/<triplet>/gio/modules. Returns the AppRun exports."""
+    app_dir, _, triplet, env = context
+    modules_dir = app_dir / f"usr/lib/{triplet}/gio/modules"
+    if not any(modules_dir.glob("*.so")):
+        return None
+
+    tool = _find_tool(app_dir, [
+        f"usr/lib/{triplet}/glib-2.0/gio-querymodules", "usr/bin/gio-querymodules",
+    ], "gio-querymodules")
+
+    # -- giomodule.cache only names the module files, so it stays valid wherever the directory is.
+
+    unshare_file(modules_dir / "giomodule.cache")
+    _run([tool, str(modules_dir)], env)
+    # -- GIO_EXTRA_MODULES adds to the host's module directory, whose modules (dconf, gvfs) keep loading.
+
+    return [f'export GIO_EXTRA_MODULES="$APPDIR/usr/lib/{triplet}/gio/modules${{GIO_EXTRA_MODULES:+:$GIO_EXTRA_MODULES}}"']
+
+
+def query_pixbuf_loaders(context):
+    """Write a loaders.cache template for the gdk-pixbuf loaders. Returns the AppRun exports."""
+    app_dir, app_id, triplet, env = context
+    pixbuf_dir = app_dir / f"usr/lib/{triplet}/gdk-pixbuf-2.0"
+    loaders = sorted(pixbuf_dir.glob("*/loaders/*.so"))
+    if not loaders:
+        return None
+
+    tool = _find_tool(app_dir, [
+        f"usr/lib/{triplet}/gdk-pixbuf-2.0/gdk-pixbuf-query-loaders", "usr/bin/gdk-pixbuf-query-loaders",
+    ], "gdk-pixbuf-query-loaders")
+
+    # -- loaders.cache only holds absolute paths; AppRun renders the template for the current mount point.
+    # -- Its first line records the template and the mount point it was rendered for, so AppRun only
+    # -- renders it again when either changed.
+
+    output = _run([tool, *[str(p) for p in loaders]], env).stdout.replace(str(app_dir), appdir_placeholder)
+    stamp = hashlib.sha256(output.encode("utf-8")).hexdigest()[:16]
+    header = f"# nx-apphub {stamp} {appdir_placeholder}"
+
+    version_dir = loaders[0].parent.parent
+    template = version_dir / pixbuf_loaders_template
+    unshare_file(template)
+    template.write_text(f"{header}\n{output}", encoding="utf-8")
+
+    rel_dir = version_dir.relative_to(app_dir)
+    cache = f"${{XDG_RUNTIME_DIR:-${{XDG_CACHE_HOME:-$HOME/.cache}}}}/nx-apphub/{app_id}/loaders.cache"
+
+    return [
+        f'export GDK_PIXBUF_MODULEDIR="$APPDIR/{rel_dir}/loaders"',
+        f'NX_APPHUB_LOADERS_CACHE="{cache}"',
+        'NX_APPHUB_LOADERS_STAMP=""',
+        '[ -r "$NX_APPHUB_LOADERS_CACHE" ] && read -r NX_APPHUB_LOADERS_STAMP < "$NX_APPHUB_LOADERS_CACHE" || true',
+        f'if [ "$NX_APPHUB_LOADERS_STAMP" = "# nx-apphub {stamp} $APPDIR" ] \\',
+        '    || { mkdir -p "${NX_APPHUB_LOADERS_CACHE%/*}" 2>/dev/null \\',
+        f'    && sed "s|{appdir_placeholder}|$APPDIR|g" "$APPDIR/{rel_dir}/{pixbuf_loaders_template}" > "$NX_APPHUB_LOADERS_CACHE.$$" \\',
+        '    && mv -f "$NX_APPHUB_LOADERS_CACHE.$$" "$NX_APPHUB_LOADERS_CACHE"; }; then',
+        '    export GDK_PIXBUF_MODULE_FILE="$NX_APPHUB_LOADERS_CACHE"',
+        'fi',
+    ]
+
+
+def update_icon_caches(context):
+    """Write icon-theme.cache for every icon theme in the AppDir. Returns the AppRun exports."""
+    app_dir, _, _, env = context
+    themes = sorted(p for p in (app_dir / "usr/share/icons").glob("*") if p.is_dir() and any(p.iterdir()))
+    if not themes:
+        return None
+
+    tool = _find_tool(app_dir, [
+        "usr/bin/gtk-update-icon-cache", "usr/bin/gtk4-update-icon-cache",
+    ], "gtk-update-icon-cache", "gtk4-update-icon-cache")
+
+    # -- icon-theme.cache stores paths relative to the theme; XDG_DATA_DIRS already points there.
+
+    for theme in themes:
+        unshare_file(theme / "icon-theme.cache")
+        _run([tool, "-q", "-t", "-f", str(theme)], env)
+    return []
+
+
+def build_font_cache(context):
+    """Cache usr/share/fonts under a fixed path and add a fontconfig file that maps it back. Returns the AppRun exports."""
+    app_dir, _, _, env = context
+    fonts_dir = app_dir / "usr/share/fonts"
+    if not fonts_dir.is_dir() or not any(p.suffix.lower() in font_exts for p in fonts_dir.rglob("*") if p.is_file()):
+        return None
+
+    tool = _find_tool(app_dir, ["usr/bin/fc-cache"], "fc-cache")
+
+    cache_dir = app_dir / fontconfig_cache_dir
+    cache_dir.mkdir(parents=True, exist_ok=True)
+
+    with tempfile.NamedTemporaryFile("w", suffix=".conf", delete=False, encoding="utf-8") as f:
+        f.write(
+            '<?xml version="1.0"?>\n<!DOCTYPE fontconfig SYSTEM "urn:fontconfig:fonts.dtd">\n<fontconfig>\n'
+            f'  <dir>{fonts_dir}</dir>\n'
+            f'  <remap-dir as-path="{fontconfig_remap_path}">{fonts_dir}</remap-dir>\n'
+            f'  <cachedir>{cache_dir}</cachedir>\n'
+            '</fontconfig>\n'
+        )
+        build_conf = f.name
+
+    try:
+        _run([tool, "-f"], dict(env, FONTCONFIG_FILE=build_conf))
+    finally:
+        os.unlink(build_conf)
+
+    # -- At run time the host configuration is kept and the bundled fonts and cache are added to it.
+
+    fonts_rel = os.path.relpath(fonts_dir, (app_dir / fontconfig_file).parent)
+    cache_rel = os.path.relpath(cache_dir, (app_dir / fontconfig_file).parent)
+    conf_path = app_dir / fontconfig_file
+    conf_path.parent.mkdir(parents=True, exist_ok=True)
+    unshare_file(conf_path)
+    conf_path.write_text(
+        '<?xml version="1.0"?>\n<!DOCTYPE fontconfig SYSTEM "urn:fontconfig:fonts.dtd">\n<fontconfig>\n'
+        '  <include ignore_missing="yes">/etc/fonts/fonts.conf</include>\n'
+        f'  <dir prefix="relative">{fonts_rel}</dir>\n'
+        f'  <remap-dir prefix="relative" as-path="{fontconfig_remap_path}">{fonts_rel}</remap-dir>\n'
+        f'  <cachedir prefix="relative">{cache_rel}</cachedir>\n'
+        '</fontconfig>\n',
+        encoding="utf-8"
+    )
+    return [f'export FONTCONFIG_FILE="$APPDIR/{fontconfig_file}"']
+
+
+runtime_caches = [
+    ("GSettings schemas", compile_gsettings_schemas),
+    ("GIO modules", query_gio_modules),
+    ("gdk-pixbuf loaders", query_pixbuf_loaders),
+    ("icon themes", update_icon_caches),
+    ("fontconfig", build_font_cache),
+]
+
+
+def generate_runtime_caches(app_dir, config):
+    """
+    Generate the runtime caches of every subsystem found in the AppDir.
+
+    Each generator returns the AppRun lines that export its cache's location, or None when its
+    subsystem is not in the AppDir. A cache whose tool is missing or fails is skipped with a
+    message; the app then builds or scans it at run time as before.
+    """
+    app_dir = Path(app_dir)
+    context = CacheContext(
+        app_dir,
+        re.sub(r"[^A-Za-z0-9._-]", "_", config["buildinfo"]["name"]),
+        arch_map.get(get_architecture()),
+        _tool_env(app_dir, config)
+    )
+    exports = []
+    generated = []
+
+    for label, generate in runtime_caches:
+        try:
+            result = generate(context)
+        except ToolNotFoundError as e:
+            print_info(f"Skipping the {label} cache: {e}", prefix="ℹ️")
+            continue
+        except (subprocess.CalledProcessError, OSError) as e:
+            detail = e.stderr.strip() if isinstance(e, subprocess.CalledProcessError) and e.stderr else str(e)
+            print_warning(f"Warning: Could not generate the {label} cache: {detail}")
+            continue
+
+        if result is None:
+            continue
+
+        generated.append(label)
+        exports.extend(result)
+
+    if generated:
+        print_success(f"Generated runtime caches: {', '.join(generated)}.", prefix="🗂")
+        print_blank()
+
+    return exports
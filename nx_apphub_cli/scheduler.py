@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+# SPDX-License-Identifier: BSD-3-Clause
+# Copyright <2026> <Uri Herrera <uri_herrera@nxos.org>>
+
+import asyncio
+from collections import defaultdict
+from contextlib import asynccontextmanager
+
+from .exceptions import ConfigError
+from .mirrors import get_host
+
+# <---
+# --->
+# -- Central connection limits shared by all HTTP work in a build.
+# -- Slots are taken on the transfer engine's event loop; the counters may be read from any thread.
+
+default_max_jobs = 8
+default_max_per_host = 4
+
+max_jobs = default_max_jobs
+max_per_host = default_max_per_host
+
+slot_condition = None
+active_total = 0
+active_hosts = defaultdict(int)
+waiting_hedges = 0
+
+
+def configure_scheduler(jobs=None, per_host=None):
+    """Set the global cap (--jobs) and the per-host cap, which never exceeds it."""
+    global max_jobs, max_per_host
+
+    if jobs is not None and jobs < 1:
+        raise ConfigError("'--jobs' must be at least 1.")
+
+    max_jobs = jobs or default_max_jobs
+    max_per_host = min(per_host or default_max_per_host, max_jobs)
+
+
+def get_max_jobs():
+    """Return the global cap on concurrent HTTP requests."""
+    return max_jobs
+
+
+def has_free_slot(url):
+    """Return True if a request to the host behind a URL could start right now."""
+    return active_hosts.get(get_host(url), 0) < max_per_host and active_total < max_jobs
+
+
+@asynccontextmanager
+async def host_slot(url, hedge=False):
+    """
+    Hold a connection slot for the host behind a URL.
+
+    The host and global slots are taken together, so a request waiting on a busy host never
+    keeps a global slot from others. Hedged requests count against both caps like any other,
+    but take the next free global slot before queued requests: they exist to rescue a transfer
+    that already holds one.
+    """
+    global active_total, slot_condition, waiting_hedges
+    host = get_host(url)
+
+    if slot_condition is None:
+        slot_condition = asyncio.Condition()
+
+    async with slot_condition:
+        if hedge:
+            waiting_hedges += 1
+        try:
+            await slot_condition.wait_for(
+                lambda: active_hosts[host] < max_per_host
+                and active_total < max_jobs
+                and (hedge or not waiting_hedges)
+            )
+        finally:
+            if hedge:
+                waiting_hedges -= 1
+                slot_condition.notify_all()
+        active_hosts[host] += 1
+        active_total += 1
+
+    try:
+        yield
+    finally:
+        active_hosts[host] -= 1
+        active_total -= 1
+
+        async with slot_condition:
+            slot_condition.notify_all()
+
+
+def largest_first(plan):
+    """Order plan entries by descending Size so the longest transfers never start last."""
+    return sorted(plan, key=lambda entry: entry.get("size") or 0, reverse=True)
+
+
+def spill_to_free_host(candidates):
+    """
+    Move the first candidate serving the same file from a host with a free slot to the front.
+
+    Mirror ranking sends most packages to the same best host; once its slots are taken, an
+    equivalent mirror that can start now beats queueing behind it.
+    """
+    if not candidates or has_free_slot(candidates[0]["url"]):
+        return candidates
+
+    first = candidates[0]
+    for index, candidate in enumerate(candidates[1:], start=1):
+        if (
+            candidate.get("sha256")
+            and candidate.get("sha256") == first.get("sha256")
+            and has_free_slot(candidate["url"])
+        ):
+            return [candidate] + candidates[:index] + candidates[index + 1:]
+
+    return candidates
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+# SPDX-License-Identifier: BSD-3-Clause
+# Copyright <2026> <Uri Herrera <uri_herrera@nxos.org>>
+
+import os
+import shutil
+from pathlib import Path
+
+from elftools.common.exceptions import ELFError
+from elftools.elf.elffile import ELFFile
+
+from .appdir_lint import is_elf
+from .console import print_blank, print_info, print_success
+
+# <---
+# --->
+# -- Soname farm: one directory of relative symlinks to every shared object in the AppDir.
+# -- With it, RPATH (and LD_LIBRARY_PATH, when bundled) hold a single directory, so the loader
+# -- finds every library on its first lookup instead of probing each library directory in turn.
+
+farm_dir = Path("usr/lib/.sonames")
+
+
+def read_soname(path):
+    """Return the DT_SONAME of a shared object, or None if it has none."""
+    with open(path, "rb") as f:
+        elf = ELFFile(f)
+        if elf.header["e_type"] != "ET_DYN":
+            return None
+        dyn = elf.get_section_by_name(".dynamic")
+        if dyn is None:
+            return None
+        for tag in dyn.iter_tags():
+            if tag.entry.d_tag == "DT_SONAME":
+                return tag.soname
+    return None
+
+
+def _priority(rel_path, library_dirs):
+    """Sort key of a candidate: earliest library directory, then shallowest and alphabetical path."""
+    parent = rel_path.parent
+    rank = next((i for i, d in enumerate(library_dirs) if parent == d), len(library_dirs))
+    return rank, len(rel_path.parts), rel_path.as_posix()
+
+
+def find_shared_objects(app_dir, library_dirs):
+    """
+    Return {soname: AppDir-relative path} for every shared object with a DT_SONAME, and the collisions.
+
+    When several files carry the same soname, the one in the earliest library directory wins,
+    then the shallowest path, then the first in alphabetical order. Collisions are returned as
+    {soname: [paths that lost]}.
+    """
+    app_dir = Path(app_dir)
+    candidates = {}
+
+    for root, dirs, files in os.walk(app_dir):
+        rel_root = Path(root).relative_to(app_dir)
+        if rel_root == farm_dir:
+            dirs[:] = []
+            continue
+
+        for name in files:
+            if ".so" not in name:
+                continue
+            path = Path(root) / name
+            if path.is_symlink() or not path.is_file() or not is_elf(path):
+                continue
+            try:
+                soname = read_soname(path)
+            except (ELFError, OSError, ValueError):
+                continue
+            if soname and "/" not in soname:
+                candidates.setdefault(soname, []).append(rel_root / name)
+
+    chosen = {}
+    collisions = {}
+
+    for soname, paths in candidates.items():
+        paths.sort(key=lambda p: _priority(p, library_dirs))
+        chosen[soname] = paths[0]
+        if len(paths) > 1:
+            collisions[soname] = paths[1:]
+
+    return chosen, collisions
+
+
+def build_soname_farm(app_dir, library_dirs):
+    """Create usr/lib/.sonames with a relative symlink per soname. Returns the AppDir-relative paths linked."""
+    app_dir = Path(app_dir)
+    farm_path = app_dir / farm_dir
+
+    chosen, collisions = find_shared_objects(app_dir, library_dirs)
+
+    shutil.rmtree(farm_path, ignore_errors=True)
+    farm_path.mkdir(parents=True)
+
+    for soname, rel_path in sorted(chosen.items()):
+        os.symlink(os.path.relpath(app_dir / rel_path, farm_path), farm_path / soname)
+
+    print_success(f"Linked {len(chosen)} shared objects into /{farm_dir}.", prefix="🔗")
+
+    if collisions:
+        print_blank()
+        print_info(f"{len(collisions)} sonames are shipped more than once; using:", prefix="ℹ️")
+        for soname in sorted(collisions):
+            print_info(f"{soname} → /{chosen[soname]}", prefix="  •")
+
+    return set(chosen.values())
@@ -0,0 +1,218 @@
+#!/usr/bin/env python3
+# SPDX-License-Identifier: BSD-3-Clause
+# Copyright <2026> <Uri Herrera <uri_herrera@nxos.org>>
+
+import asyncio
+import atexit
+import time
+from collections import namedtuple
+from concurrent.futures import CancelledError
+from contextlib import asynccontextmanager
+from pathlib import Path
+from threading import Lock, Thread
+
+import aiohttp
+
+from .exceptions import TransferError
+from .scheduler import host_slot
+
+# <---
+# --->
+# -- Asyncio transfer engine shared by all HTTP work.
+# -- One event loop runs in a background thread with one pooled, keep-alive session; callers
+# -- on any thread submit coroutines to it and wait on the returned futures.
+
+default_timeout = 20
+
+# -- Idempotent GETs are retried on connection errors and on these statuses.
+
+retry_statuses = {429, 500, 502, 503, 504}
+max_retries = 3
+backoff_factor = 0.3
+
+chunk_size = 64 * 1024
+
+Reply = namedtuple("Reply", ["url", "status", "reason", "headers", "content", "elapsed"])
+
+engine_lock = Lock()
+engine_loop = None
+engine_session = None
+pending_futures = set()
+
+
+def _start_engine():
+    """Start the event loop thread and open the shared session. Caller must hold engine_lock."""
+    global engine_loop, engine_session
+
+    loop = asyncio.new_event_loop()
+    Thread(target=loop.run_forever, name="nx-apphub-transfer", daemon=True).start()
+
+    async def open_session():
+        connector = aiohttp.TCPConnector(limit=0, ttl_dns_cache=300, keepalive_timeout=60)
+        return aiohttp.ClientSession(connector=connector, trust_env=True)
+
+    engine_session = asyncio.run_coroutine_threadsafe(open_session(), loop).result()
+    engine_loop = loop
+    atexit.register(close_engine)
+
+
+def close_engine():
+    """Close the shared session and stop the event loop."""
+    global engine_loop, engine_session
+
+    with engine_lock:
+        if engine_loop is None:
+            return
+
+        try:
+            asyncio.run_coroutine_threadsafe(engine_session.close(), engine_loop).result(timeout=5)
+        except Exception:
+            pass
+
+        engine_loop.call_soon_threadsafe(engine_loop.stop)
+        engine_loop = None
+        engine_session = None
+
+
+def get_session():
+    """Return the shared client session. Only valid on the engine loop."""
+    return engine_session
+
+
+def submit(coro):
+    """Schedule a coroutine on the engine loop and return a concurrent.futures.Future."""
+    with engine_lock:
+        if engine_loop is None:
+            _start_engine()
+        future = asyncio.run_coroutine_threadsafe(coro, engine_loop)
+        pending_futures.add(future)
+
+    future.add_done_callback(pending_futures.discard)
+    return future
+
+
+def run(coro):
+    """Run a coroutine on the engine loop and wait for its result."""
+    future = submit(coro)
+    try:
+        return future.result()
+    except CancelledError as e:
+        raise TransferError("Cancelled") from e
+
+
+def cancel_all():
+    """Cancel every coroutine still running on the engine loop."""
+    for future in list(pending_futures):
+        future.cancel()
+
+
+def run_all(coros):
+    """Run coroutines concurrently on the engine loop; exceptions are returned in place of results."""
+    async def gather():
+        return await asyncio.gather(*coros, return_exceptions=True)
+
+    return run(gather())
+
+
+def _client_timeout(timeout):
+    """Mirror the requests semantics: the timeout bounds connecting and each read, not the whole transfer."""
+    return aiohttp.ClientTimeout(total=None, sock_connect=timeout, sock_read=timeout)
+
+
+def to_transfer_error(error):
+    """Translate an aiohttp or timeout exception into a TransferError."""
+    if isinstance(error, TransferError):
+        return error
+    if isinstance(error, aiohttp.ClientResponseError):
+        return TransferError(f"🧾 HTTP {error.status}", status=error.status, reason=error.message)
+    if isinstance(error, (aiohttp.ClientSSLError, aiohttp.ClientConnectorCertificateError)):
+        return TransferError("🔒 SSL error")
+    if isinstance(error, (asyncio.TimeoutError, aiohttp.ServerTimeoutError)):
+        return TransferError("⌛ Timeout")
+    if isinstance(error, aiohttp.ClientConnectorDNSError):
+        return TransferError("🌐 DNS resolution failed")
+    if isinstance(error, aiohttp.ClientConnectionError):
+        return TransferError("🔌 Connection failed")
+    return TransferError(f"⚠️ {error.__class__.__name__}")
+
+
+def check_status(reply):
+    """Raise a TransferError for a 4xx/5xx reply."""
+    if reply.status >= 400:
+        raise TransferError(f"🧾 HTTP {reply.status}", status=reply.status, reason=reply.reason)
+    return reply
+
+
+@asynccontextmanager
+async def open_stream(url, headers=None, timeout=default_timeout, hedge=False, on_start=None):
+    """
+    Open a GET request under a scheduler slot and yield (response, latency).
+
+    Connection errors and retryable statuses are retried with exponential backoff before
+    the body is handed out; the slot is released while waiting between attempts.
+    on_start, if given, is called once the slot is held and right before each attempt.
+    """
+    for attempt in range(max_retries + 1):
+        last = attempt == max_retries
+
+        async with host_slot(url, hedge=hedge):
+            if on_start:
+                on_start()
+
+            started = time.monotonic()
+            try:
+                response = await get_session().get(url, headers=headers, timeout=_client_timeout(timeout))
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                if last:
+                    raise to_transfer_error(e) from e
+                response = None
+
+            if response is not None and (response.status not in retry_statuses or last):
+                try:
+                    yield response, time.monotonic() - started
+                    return
+                except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                    raise to_transfer_error(e) from e
+                finally:
+                    response.release()
+
+            if response is not None:
+                response.release()
+
+        await asyncio.sleep(backoff_factor * 2 ** attempt)
+
+
+async def fetch_async(url, headers=None, timeout=default_timeout, hedge=False):
+    """Fetch a whole response body. HTTP errors are returned, not raised; see check_status."""
+    async with open_stream(url, headers=headers, timeout=timeout, hedge=hedge) as (response, latency):
+        content = await response.read()
+        return Reply(str(response.url), response.status, response.reason, response.headers, content, latency)
+
+
+def fetch(url, headers=None, timeout=default_timeout):
+    """Synchronous fetch_async for callers outside the engine loop."""
+    return run(fetch_async(url, headers=headers, timeout=timeout))
+
+
+async def download_to_async(url, destination, timeout=default_timeout):
+    """Stream a response body to a file, replacing it only once the transfer completed."""
+    destination = Path(destination)
+    part_path = destination.with_name(destination.name + ".part")
+
+    try:
+        async with open_stream(url, timeout=timeout) as (response, _):
+            check_status(response)
+            with open(part_path, "wb") as f:
+                async for chunk in response.content.iter_chunked(chunk_size):
+                    f.write(chunk)
+    except BaseException:
+        part_path.unlink(missing_ok=True)
+        raise
+
+    part_path.replace(destination)
+    return destination
+
+
+def download_to(url, destination, timeout=default_timeout):
+    """Synchronous download_to_async for callers outside the engine loop."""
+    return run(download_to_async(url, destination, timeout=timeout))
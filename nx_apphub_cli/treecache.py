@@ -0,0 +1,257 @@
+#!/usr/bin/env python3
+# SPDX-License-Identifier: BSD-3-Clause
+# Copyright <2026> <Uri Herrera <uri_herrera@nxos.org>>
+
+import errno
+import fcntl
+import json
+import os
+import shutil
+import time
+from pathlib import Path
+from threading import Lock, get_ident
+
+from .utils import evict_least_recently_used, parse_size
+
+# <---
+# --->
+# -- Extracted package trees, keyed by the SHA256 of their .deb and shared by every app and build.
+# -- A tree holds the package's files under root/ and a manifest.json listing them; AppDirs are
+# -- assembled from trees by reflink, hardlink or copy instead of unpacking the .deb again.
+
+cache_dir = Path.home() / ".cache/nx-apphub-cli"
+trees_dir = cache_dir / "trees"
+
+tree_format = 1
+default_tree_limit = "10G"
+
+# -- Trees abandoned by interrupted builds are dropped after a day.
+
+partial_max_age_seconds = 24 * 3600
+
+# -- ioctl that makes a file share the extents of another (Btrfs, XFS, bcachefs).
+
+FICLONE = 0x40049409
+
+tree_lock = Lock()
+
+
+def get_tree_limit():
+    """Return the tree cache size cap in bytes (NX_APPHUB_TREES_MAX_SIZE, default 10G)."""
+    return parse_size(os.environ.get("NX_APPHUB_TREES_MAX_SIZE", default_tree_limit))
+
+
+def get_tree_path(sha256):
+    """Return the cache location of the tree extracted from a .deb with the given SHA256."""
+    return trees_dir / sha256[:2] / sha256
+
+
+def new_tree_dir(sha256):
+    """Create and return a private directory to extract a tree into before it is published."""
+    path = trees_dir / "partial" / f"{sha256}.{os.getpid()}.{get_ident()}"
+    shutil.rmtree(path, ignore_errors=True)
+    (path / "root").mkdir(parents=True)
+    return path
+
+
+def discard_tree_dir(path):
+    """Remove an unpublished tree directory."""
+    if path is not None:
+        shutil.rmtree(path, ignore_errors=True)
+
+
+def publish_tree(path, sha256, entries):
+    """
+    Write the manifest of an extracted tree and move it into the cache. Returns (tree root, manifest).
+
+    Regular files are recorded with their size and mtime so a tree whose files were later
+    modified through a hardlink is detected and not reused. If another build published the
+    same tree first, that one is kept.
+    """
+    records = []
+    for rel_path, kind, size, mode, digest in entries:
+        mtime_ns = (path / "root" / rel_path).lstat().st_mtime_ns if kind == "file" else 0
+        records.append([rel_path, kind, size, mode, digest, mtime_ns])
+
+    manifest = {
+        "format": tree_format,
+        "sha256": sha256,
+        "size": sum(record[2] for record in records if record[1] == "file"),
+        "entries": records,
+    }
+
+    with open(path / "manifest.json", "w", encoding="utf-8") as f:
+        json.dump(manifest, f, separators=(",", ":"))
+
+    final = get_tree_path(sha256)
+    final.parent.mkdir(parents=True, exist_ok=True)
+
+    for _ in range(2):
+        try:
+            path.rename(final)
+            return final / "root", manifest
+        except OSError as e:
+            if e.errno not in (errno.EEXIST, errno.ENOTEMPTY):
+                raise
+
+        # -- lookup_tree drops an invalid tree in the way, so the second rename can take its place.
+
+        existing = lookup_tree(sha256)
+        if existing:
+            discard_tree_dir(path)
+            return existing
+
+    path.rename(final)
+    return final / "root", manifest
+
+
+def _drop_tree(path):
+    """Remove a published tree so no build can pick it up half-deleted."""
+    doomed = trees_dir / "partial" / f"{path.name}.drop.{os.getpid()}.{get_ident()}"
+    doomed.parent.mkdir(parents=True, exist_ok=True)
+    try:
+        path.rename(doomed)
+    except FileNotFoundError:
+        return
+    shutil.rmtree(doomed, ignore_errors=True)
+
+
+def lookup_tree(sha256, verify=False):
+    """
+    Return (tree root, manifest) for a SHA256 and mark the tree as recently used, or None.
+
+    With verify, every regular file is checked against its recorded size and mtime and a tree
+    that no longer matches is dropped.
+    """
+    if not sha256:
+        return None
+
+    path = get_tree_path(sha256)
+    manifest_path = path / "manifest.json"
+
+    try:
+        with open(manifest_path, encoding="utf-8") as f:
+            manifest = json.load(f)
+    except (FileNotFoundError, NotADirectoryError):
+        return None
+    except (OSError, ValueError):
+        _drop_tree(path)
+        return None
+
+    if manifest.get("format") != tree_format or manifest.get("sha256") != sha256:
+        _drop_tree(path)
+        return None
+
+    root = path / "root"
+
+    if verify:
+        for rel_path, kind, size, _, _, mtime_ns in manifest["entries"]:
+            if kind != "file":
+                continue
+            try:
+                st = (root / rel_path).lstat()
+            except FileNotFoundError:
+                st = None
+            if st is None or st.st_size != size or st.st_mtime_ns != mtime_ns:
+                _drop_tree(path)
+                return None
+
+    try:
+        os.utime(manifest_path)
+    except FileNotFoundError:
+        return None
+
+    return root, manifest
+
+
+class TreeLinker:
+    """
+    Place files from the tree cache into an AppDir.
+
+    Each file is reflinked when the filesystem supports it, otherwise hardlinked (unless
+    hardlinks are disabled) and, as a last resort, copied. A method that fails once is not
+    tried again for the rest of the build.
+    """
+
+    def __init__(self, hardlinks=True):
+        self.lock = Lock()
+        self.reflink = True
+        self.hardlink = hardlinks
+        self.counts = {"reflink": 0, "hardlink": 0, "copy": 0}
+
+    def _count(self, method):
+        with self.lock:
+            self.counts[method] += 1
+
+    def place(self, source, destination):
+        """Create destination with the content, mode and mtime of source."""
+        if self.reflink:
+            try:
+                with open(source, "rb") as src, open(destination, "wb") as dst:
+                    fcntl.ioctl(dst.fileno(), FICLONE, src.fileno())
+                shutil.copystat(source, destination)
+                self._count("reflink")
+                return
+            except OSError:
+                self.reflink = False
+                Path(destination).unlink(missing_ok=True)
+
+        if self.hardlink:
+            try:
+                os.link(source, destination)
+                self._count("hardlink")
+                return
+            except OSError as e:
+                if e.errno != errno.EMLINK:
+                    self.hardlink = False
+
+        shutil.copy2(source, destination)
+        self._count("copy")
+
+
+def unshare_file(path):
+    """
+    Give a hardlinked file its own copy before it is modified in place.
+
+    Files linked from the tree cache must never be written through, or every later build
+    would pick up the change.
+    """
+    path = Path(path)
+    try:
+        st = path.lstat()
+    except FileNotFoundError:
+        return
+
+    if st.st_nlink < 2 or not path.is_file() or path.is_symlink():
+        return
+
+    temp = path.with_name(f".{path.name}.{os.getpid()}.unshare")
+    shutil.copy2(path, temp)
+    os.replace(temp, path)
+
+
+def _tree_size(manifest_path):
+    with open(manifest_path, encoding="utf-8") as f:
+        return json.load(f).get("size", 0)
+
+
+def enforce_tree_limit(limit=None):
+    """Evict least recently used trees until the tree cache fits its size cap. Returns bytes freed."""
+    limit = get_tree_limit() if limit is None else limit
+
+    with tree_lock:
+        now = time.time()
+
+        for path in (trees_dir / "partial").glob("*"):
+            try:
+                if now - path.stat().st_mtime > partial_max_age_seconds:
+                    shutil.rmtree(path, ignore_errors=True)
+            except FileNotFoundError:
+                continue
+
+        return evict_least_recently_used(
+            (path for path in trees_dir.glob("*/*/manifest.json") if path.parent.parent.name != "partial"),
+            limit,
+            size=_tree_size,
+            evict=lambda manifest_path: _drop_tree(manifest_path.parent)
+        )
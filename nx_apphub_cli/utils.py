@@ -2,20 +2,20 @@
 # SPDX-License-Identifier: BSD-3-Clause
 # Copyright <2025> <Uri Herrera <uri_herrera@nxos.org>>
 
+import json
 import os
 import platform
 import re
 import shutil
-import signal
+import time
 from pathlib import Path
-from concurrent.futures import ThreadPoolExecutor, as_completed
-from threading import Lock, Event
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from threading import Lock, Event, get_ident
 
-import requests
 from rich.progress import Progress, SpinnerColumn, TextColumn, BarColumn, TaskProgressColumn, TimeRemainingColumn
 from rich.console import Console
 
-from .exceptions import ConfigError, DownloadError
+from .exceptions import ConfigError, DownloadError, ExtractionError, TransferError
 from .console import print_success, print_warning, print_info, print_blank
 
 _rich_console = Console()
@@ -106,6 +106,102 @@ def get_host_nitrux_version():
     return None
 
 
+def read_json_file(path, default=None):
+    """Read a JSON file, returning the default when it is missing or unreadable."""
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return default
+
+
+def write_json_file(path, data):
+    """Atomically write data as JSON so concurrent readers never see a partial file."""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(f".{path.name}.{os.getpid()}.{get_ident()}.tmp")
+
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=2, sort_keys=True)
+
+    os.replace(tmp_path, path)
+
+
+def write_bytes_atomic(path, data):
+    """Atomically replace a file with the given bytes."""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(f".{path.name}.{os.getpid()}.{get_ident()}.tmp")
+    tmp_path.write_bytes(data)
+    os.replace(tmp_path, path)
+
+
+def format_size(size_bytes):
+    """Format a size in bytes to a human-readable string."""
+    for unit in ["B", "KiB", "MiB", "GiB", "TiB"]:
+        if size_bytes < 1024:
+            return f"{size_bytes:.2f} {unit}"
+        size_bytes /= 1024
+    return f"{size_bytes:.2f} PiB"
+
+
+def parse_size(value):
+    """Parse a byte size such as '512M', '10G' or '1073741824' into bytes."""
+    units = {"": 1, "K": 1024, "M": 1024 ** 2, "G": 1024 ** 3, "T": 1024 ** 4}
+    match = re.fullmatch(r"\s*(\d+(?:\.\d+)?)\s*([KMGT]?)(?:i?B)?\s*", str(value), re.IGNORECASE)
+
+    if not match:
+        raise ConfigError(f"Invalid size: '{value}'. Use a number of bytes or a K/M/G/T suffix.")
+
+    return int(float(match.group(1)) * units[match.group(2).upper()])
+
+
+# -- Caches used this recently are never evicted, so concurrent builds keep what they are about to use.
+
+eviction_grace_seconds = 3600
+
+
+def evict_least_recently_used(paths, limit, size=None, evict=None, keep=None):
+    """
+    Evict the least recently used of paths until their total size fits limit. Returns bytes freed.
+
+    Recency is each path's mtime, which cache lookups refresh. size(path) returns the bytes an
+    entry holds (its file size by default), or None to leave it out; evict(path) removes it
+    (unlink by default). Entries used within the grace period, and keep, are never evicted.
+    """
+    now = time.time()
+    entries = []
+    total = 0
+
+    for path in paths:
+        try:
+            st = path.stat()
+            entry_size = st.st_size if size is None else size(path)
+        except (OSError, ValueError):
+            continue
+        if entry_size is None:
+            continue
+        entries.append((st.st_mtime, entry_size, path))
+        total += entry_size
+
+    freed = 0
+
+    for mtime, entry_size, path in sorted(entries):
+        if total - freed <= limit:
+            break
+        if now - mtime < eviction_grace_seconds:
+            break
+        if path == keep:
+            continue
+        try:
+            (evict or Path.unlink)(path)
+        except FileNotFoundError:
+            continue
+        freed += entry_size
+
+    return freed
+
+
 def cleanup_cache(package_name=None):
     """Remove the cache directory for a specific package or skip full cache cleanup."""
 
@@ -139,19 +235,16 @@ def get_appimagetool(quiet=True):
         arch = get_architecture()
         tool_url = f"https://github.com/AppImage/appimagetool/releases/latest/download/appimagetool-{arch}.AppImage"
 
-        try:
-            response = requests.get(tool_url, stream=True, timeout=20)
-            response.raise_for_status()
+        from .transfer import download_to
 
-            with open(appimagetool_path, "wb") as tool_file:
-                for chunk in response.iter_content(1024):
-                    tool_file.write(chunk)
+        try:
+            download_to(tool_url, appimagetool_path)
 
             appimagetool_path.chmod(0o755)
             if not quiet:
                 print_success(f"appimagetool downloaded and saved to {appimagetool_path}")
 
-        except requests.RequestException as e:
+        except TransferError as e:
             raise DownloadError(f"Error downloading appimagetool: {e}") from e
 
     return appimagetool_path
@@ -166,22 +259,18 @@ def get_go_appimagetool(quiet=True):
 
         arch = get_architecture()
 
+        from .transfer import check_status, download_to, fetch
+
         latest_url = "https://github.com/probonopd/go-appimage/releases/expanded_assets/continuous"
         try:
-            response = requests.get(latest_url, timeout=20)
-            response.raise_for_status()
+            response = check_status(fetch(latest_url))
 
             pattern = rf'href="([^"]*appimagetool-.*-{arch}\.AppImage)"'
-            match = re.search(pattern, response.text)
+            match = re.search(pattern, response.content.decode("utf-8", errors="replace"))
 
             if match:
                 download_url = f"https://github.com{match.group(1)}"
-                response = requests.get(download_url, stream=True, timeout=20)
-                response.raise_for_status()
-
-                with open(go_appimagetool_path, "wb") as tool_file:
-                    for chunk in response.iter_content(1024):
-                        tool_file.write(chunk)
+                download_to(download_url, go_appimagetool_path)
 
                 go_appimagetool_path.chmod(0o755)
                 if not quiet:
@@ -190,7 +279,7 @@ def get_go_appimagetool(quiet=True):
             else:
                 raise DownloadError(f"Could not find a matching go-appimagetool build for architecture: {arch}")
 
-        except requests.RequestException as e:
+        except TransferError as e:
             raise DownloadError(f"Error downloading Go-based appimagetool: {e}") from e
 
     return go_appimagetool_path
@@ -210,36 +299,34 @@ def get_uruntime(quiet=True):
 
         tool_url = f"https://github.com/VHSgunzo/uruntime/releases/latest/download/{uruntime_filename}"
 
-        try:
-            response = requests.get(tool_url, stream=True, timeout=20)
-            response.raise_for_status()
+        from .transfer import download_to
 
-            with open(uruntime_path, "wb") as f:
-                for chunk in response.iter_content(1024):
-                    f.write(chunk)
+        try:
+            download_to(tool_url, uruntime_path)
 
             uruntime_path.chmod(0o755)
             if not quiet:
                 print_success(f"uruntime downloaded and saved to {uruntime_path}")
 
-        except requests.RequestException as e:
+        except TransferError as e:
             raise DownloadError(f"Error downloading uruntime: {e}") from e
 
     return uruntime_path
 
 
-def concurrent_downloads(dependencies, base_repos, ppa_repos, cache_name):
-    from .downloader import get_latest_deb
-    from .extractor import extract_deb
+def get_repos_from_config(config):
+    """Return the (base_repos, ppa_repos) pair declared in buildinfo.distrorepo."""
+    distrorepo = config.get("buildinfo", {}).get("distrorepo", {})
 
-    if not dependencies:
-        print_info("No dependencies listed.", prefix="📦")
-        return
+    if isinstance(distrorepo, list):
+        return distrorepo, {}
+    if isinstance(distrorepo, dict):
+        return distrorepo.get("base", []), {ppa["id"]: ppa for ppa in distrorepo.get("ppas", [])}
+    return [], {}
 
-    print_blank()
-    print_info(f"Downloading {len(dependencies)} dependencies:", prefix="📥")
-    print_blank()
 
+def build_download_tasks(dependencies, base_repos, ppa_repos):
+    """Map each YAML dependency to the repositories it should be resolved against."""
     download_tasks = []
     for dep in dependencies:
         if isinstance(dep, dict):
@@ -257,6 +344,98 @@ def concurrent_downloads(dependencies, base_repos, ppa_repos, cache_name):
 
         download_tasks.append((pkg_name, repo_list))
 
+    return download_tasks
+
+
+def resolve_download_plan(dependencies, base_repos, ppa_repos, cache_name, lock_path=None, write_lock=False):
+    """
+    Return the download plan for all dependencies.
+
+    When lock_path points to a valid lockfile, its pinned plan is used and no index is fetched.
+    With write_lock, a freshly resolved plan is recorded to lock_path.
+    """
+    from .downloader import resolve_plan
+    from .lockfile import compute_inputs_digest, load_lockfile, write_lockfile
+
+    if not dependencies:
+        return []
+
+    download_tasks = build_download_tasks(dependencies, base_repos, ppa_repos)
+    inputs_digest = compute_inputs_digest(dependencies, base_repos, ppa_repos)
+
+    # -- Use the lockfile when valid; otherwise resolve every dependency up front so downloads only execute the plan.
+
+    plan = load_lockfile(lock_path, inputs_digest) if lock_path else None
+
+    if plan is not None:
+        print_blank()
+        print_info(f"Using pinned dependencies from: {lock_path}", prefix="🔒")
+        return plan
+
+    print_blank()
+    print_info(f"Resolving {len(download_tasks)} dependencies...", prefix="🔎")
+
+    try:
+        plan = resolve_plan(download_tasks)
+    except DownloadError as e:
+        cleanup_cache(cache_name)
+        raise DownloadError(f"Bundle build failed! {e}") from e
+
+    if lock_path and write_lock:
+        write_lockfile(lock_path, plan, inputs_digest)
+        print_blank()
+        print_info(f"Lockfile written: {lock_path}", prefix="🔒")
+
+    return plan
+
+
+def concurrent_downloads(dependencies, base_repos, ppa_repos, cache_name, lock_path=None, write_lock=False,
+                         conflict_policy="warn", link_trees=True, manifest_path=None, path_filter=None, plan=None):
+    """
+    Resolve and download all dependencies, extracting each package as it arrives.
+
+    The plan comes from resolve_download_plan unless an already resolved one is passed.
+
+    Paths shipped by more than one package go to the package listed first in deps. Differing
+    content is reported, or fails the build when conflict_policy is "error".
+
+    Packages already extracted by an earlier build are assembled from the tree cache. Pass
+    link_trees=False when later steps may modify packaged files in place, so they are never
+    hardlinked into the AppDir.
+
+    Every extracted package gets a file manifest in the build cache, merged into an AppDir
+    manifest that is also written to manifest_path when given. Paths excluded by path_filter
+    (see pathfilter.build_path_filter) are never written into the AppDir.
+    """
+    from .debstore import enforce_store_limit, lookup_deb
+    from .downloader import download_planned
+    from .extractor import ExtractionStage
+    from .scheduler import get_max_jobs, largest_first
+    from .transfer import cancel_all
+    from .treecache import enforce_tree_limit, lookup_tree
+
+    if not dependencies:
+        print_info("No dependencies listed.", prefix="📦")
+        return
+
+    download_tasks = build_download_tasks(dependencies, base_repos, ppa_repos)
+
+    if plan is None:
+        plan = resolve_download_plan(
+            dependencies, base_repos, ppa_repos, cache_name, lock_path=lock_path, write_lock=write_lock
+        )
+
+    total_size = sum(entry["size"] for entry in plan)
+    cached = [entry for entry in plan if lookup_tree(entry.get("sha256")) or lookup_deb(entry.get("sha256"))]
+    if cached:
+        total_size -= sum(entry["size"] for entry in cached)
+        print_blank()
+        print_info(f"{len(cached)} packages already in the shared package store or tree cache.", prefix="🗃️")
+
+    print_blank()
+    print_info(f"Downloading {len(plan)} packages ({format_size(total_size)}):", prefix="📥")
+    print_blank()
+
     try:
         with Progress(
             TextColumn("[bold blue]    ⏬ Fetching PKGs"),
@@ -264,54 +443,97 @@ def concurrent_downloads(dependencies, base_repos, ppa_repos, cache_name):
             TaskProgressColumn(),
             transient=False
         ) as progress:
-            task = progress.add_task("download", total=len(download_tasks))
+            task = progress.add_task("download", total=len(plan))
 
             from . import downloader
             downloader.set_console(progress.console)
 
-            with ThreadPoolExecutor(max_workers=3) as executor:
-                log_lock = Lock()
-                stop_event = Event()
+            # -- Largest packages are queued first so a big download never starts last; the scheduler enforces connection caps.
+            # -- Packages are extracted while they download or, once complete, on a separate extraction pool.
+
+            log_lock = Lock()
+            stop_event = Event()
+            priorities = {}
+            for rank, (pkg_name, _) in enumerate(download_tasks):
+                priorities.setdefault(pkg_name, rank)
+
+            stage = ExtractionStage(
+                cache_name,
+                priorities=priorities,
+                policy=conflict_policy,
+                hardlinks=link_trees,
+                path_filter=path_filter
+            )
 
+            with ThreadPoolExecutor(max_workers=get_max_jobs()) as executor:
                 future_to_pkg = {
-                    executor.submit(get_latest_deb, pkg_name, repo_list, cache_name, log_lock, stop_event=stop_event): pkg_name
-                    for pkg_name, repo_list in download_tasks
+                    executor.submit(download_planned, entry, cache_name, log_lock, stop_event=stop_event, extract=stage): entry["package"]
+                    for entry in largest_first(plan)
                 }
 
+                pending = set(future_to_pkg)
                 has_failed = False
                 first_exception = None
 
-                for future in as_completed(future_to_pkg):
-                    try:
-                        deb_path = future.result()
+                while pending:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+
+                    for future in done:
+                        try:
+                            future.result()
+
+                            if has_failed:
+                                continue
+
+                            extraction = stage.pop_future(future_to_pkg[future]) if future in future_to_pkg else None
+                            if extraction:
+                                pending.add(extraction)
+                                continue
 
-                        if has_failed:
-                            continue
+                            progress.update(task, advance=1)
 
-                        if deb_path:
-                            extract_deb(deb_path, cache_name)
+                        except Exception as e:
+                            if not has_failed:
+                                has_failed = True
+                                first_exception = e
 
-                        progress.update(task, advance=1)
+                                # -- Cancelling the in-flight transfers unblocks every worker, so the pool winds down on its own.
 
-                    except Exception as e:
-                        if not has_failed:
-                            has_failed = True
-                            first_exception = e
-                            stop_event.set()
-                            executor.shutdown(wait=False, cancel_futures=True)
+                                stop_event.set()
+                                executor.shutdown(wait=False, cancel_futures=True)
+                                cancel_all()
 
-                            os.kill(os.getpid(), signal.SIGINT)
+            stage.shutdown(cancel=has_failed)
+
+            if has_failed:
+                progress.stop()
+                cleanup_cache(cache_name)
+                raise DownloadError(f"Bundle build failed! {first_exception}") from first_exception
+
+        try:
+            stage.check_conflicts()
+        except ExtractionError as e:
+            cleanup_cache(cache_name)
+            raise DownloadError(f"Bundle build failed! {e}") from e
+
+        stage.write_manifests(plan, manifest_path)
+        if manifest_path:
+            print_blank()
+            print_info(f"Manifest written: {manifest_path}", prefix="🧾")
 
-                if has_failed:
-                    progress.stop()
-                    cleanup_cache(cache_name)
-                    raise DownloadError(f"Bundle build failed! {first_exception}") from first_exception
+        stage.report_skipped()
+        stage.report_timings()
+        enforce_store_limit()
+        enforce_tree_limit()
 
     except KeyboardInterrupt:
         try:
+            stop_event.set()
             executor.shutdown(wait=False, cancel_futures=True)
+            stage.shutdown(cancel=True)
         except NameError:
             pass
+        cancel_all()
 
         cleanup_cache(cache_name)
         raise
@@ -11,7 +11,7 @@ setup(
     version="1.2.1",
     packages=find_packages(),
     install_requires=[
-        "requests",
+        "aiohttp>=3.11",
         "pyyaml",
         "rich",
         "python-debian",
@@ -31,5 +31,5 @@ setup(
         "License :: OSI Approved :: BSD 3 Clause License",
         "Operating System :: POSIX :: Linux"
     ],
-    python_requires='>=3.6',
+    python_requires='>=3.9',
 )
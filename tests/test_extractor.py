@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+# SPDX-License-Identifier: BSD-3-Clause
+# Copyright <2025> <Uri Herrera <uri_herrera@nxos.org>>
+
+import io
+import os
+import tarfile
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from nx_apphub_cli.extractor import ExtractionStage, get_app_dir
+
+# <---
+# --->
+# -- Minimal .deb: an ar archive with debian-binary, an empty control.tar.gz and a data.tar.gz.
+
+
+def _tar_gz(files):
+    buffer = io.BytesIO()
+    with tarfile.open(fileobj=buffer, mode="w:gz") as tar:
+        for name, data in files.items():
+            info = tarfile.TarInfo(name)
+            info.size = len(data)
+            info.mode = 0o644
+            tar.addfile(info, io.BytesIO(data))
+    return buffer.getvalue()
+
+
+def _ar_member(name, data):
+    header = f"{name:<16}{0:<12}{0:<6}{0:<6}{100644:<8}{len(data):<10}`\n".encode("ascii")
+    return header + data + (b"\n" if len(data) % 2 else b"")
+
+
+def write_deb(path, files):
+    with open(path, "wb") as f:
+        f.write(b"!<arch>\n")
+        f.write(_ar_member("debian-binary", b"2.0\n"))
+        f.write(_ar_member("control.tar.gz", _tar_gz({})))
+        f.write(_ar_member("data.tar.gz", _tar_gz(files)))
+
+
+class ExtractionStageTest(unittest.TestCase):
+
+    def setUp(self):
+        self.home = tempfile.TemporaryDirectory()
+        self.addCleanup(self.home.cleanup)
+        patcher = mock.patch.dict(os.environ, {"HOME": self.home.name})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_submit_without_sha256(self):
+        deb_path = Path(self.home.name) / "hello_1.0_amd64.deb"
+        write_deb(deb_path, {"./usr/share/hello/hello.txt": b"hello\n"})
+
+        stage = ExtractionStage("hello")
+        try:
+            future = stage.submit(deb_path, "hello")
+            entries = future.result()
+        finally:
+            stage.shutdown()
+
+        target = get_app_dir("hello") / "usr/share/hello/hello.txt"
+        self.assertEqual(target.read_bytes(), b"hello\n")
+        self.assertEqual([entry[0] for entry in entries], ["usr/share/hello/hello.txt"])
+        self.assertEqual(stage.package_entries()["hello"], entries)
+        self.assertIs(stage.pop_future("hello"), future)
+
+
+if __name__ == "__main__":
+    unittest.main()